@@ -0,0 +1,119 @@
+"""
+Measures the cold-start latency of the `sdutils` CLI.
+
+Each command runs in a fresh interpreter, against a throwaway global configuration
+and mod project, so that no game install is needed.
+
+Usage:
+    python benchmarks/bench_startup.py --runs 20
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, List
+import subprocess
+import statistics
+import tempfile
+import json
+import time
+import sys
+import os
+
+import click
+
+
+REPO_ROOT = Path(__file__, "../..").resolve()
+
+COMMANDS = {
+    "help": ["--help"],
+    "infos": ["infos"],
+}
+
+
+def _make_sandbox(root: Path) -> Dict[str, str]:
+    """
+    Writes a global configuration and a minimal mod project under `root`.
+
+    Returns:
+        The environment to run the CLI with.
+    """
+    appdata = Path(root, "appdata")
+    project = Path(root, "project")
+
+    os.makedirs(appdata)
+    os.makedirs(project)
+
+    with open(Path(appdata, "sdutils.json"), "w") as writer:
+        json.dump({"PATH_7D2D": str(Path(root, "game")), "PATH_PREFABS": str(Path(root, "prefabs"))}, writer)
+
+    with open(Path(project, "sdutils.json"), "w") as writer:
+        json.dump({"name": "bench-mod", "include": ["ModInfo.xml"]}, writer)
+
+    env = dict(os.environ)
+    env["appdata"] = str(appdata)
+    env["PYTHONPATH"] = os.pathsep.join([str(REPO_ROOT), env.get("PYTHONPATH", "")])
+
+    return env
+
+
+def time_command(args: List[str], env: Dict[str, str], cwd: Path, runs: int) -> List[float]:
+    """
+    Runs `python -m sdutils.cli <args>` `runs` times, returning each wall time in seconds.
+    """
+    timings = list()
+
+    for _ in range(runs):
+
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "sdutils.cli", *args], env=env, cwd=cwd, capture_output=True, check=True)
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def run(runs: int) -> Dict[str, dict]:
+    """
+    Benchmarks every command of `COMMANDS`.
+
+    Returns:
+        The min, median and mean wall times of each command, in milliseconds.
+    """
+    results = dict()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+
+        env = _make_sandbox(Path(tmp_dir))
+        cwd = Path(tmp_dir, "project")
+
+        for name, args in COMMANDS.items():
+
+            timings = [t * 1000 for t in time_command(args, env, cwd, runs)]
+
+            results[name] = {
+                "min_ms": min(timings),
+                "median_ms": statistics.median(timings),
+                "mean_ms": statistics.mean(timings),
+            }
+
+    return results
+
+
+@click.command()
+@click.option("-n", "--runs", type=click.IntRange(min=1), default=20, show_default=True, help="Runs per command.")
+@click.option("-o", "--output", type=click.Path(dir_okay=False), help="Write the results to a JSON file.")
+def main(runs: int, output: str):
+    """
+    Benchmark the startup time of `sdutils --help` and `sdutils infos`
+    """
+    results = run(runs)
+
+    for name, result in results.items():
+        print(f"{name:<8} min {result['min_ms']:7.1f}ms | median {result['median_ms']:7.1f}ms | mean {result['mean_ms']:7.1f}ms")
+
+    if output:
+        with open(output, "w") as writer:
+            json.dump(results, writer, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Benchmark suite of the sdutils build pipeline, on synthetic mod projects.
+
+Every operation runs in a fresh interpreter, once cold (from a clean project
+and empty caches) then several times warm. Results are written as JSON, which
+can be compared between two commits.
+
+Usage:
+    python benchmarks/bench_suite.py run --output before.json
+    python benchmarks/bench_suite.py run --output after.json
+    python benchmarks/bench_suite.py compare before.json after.json
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, List
+from zipfile import ZipFile
+import subprocess
+import statistics
+import platform
+import tempfile
+import shutil
+import json
+import time
+import sys
+
+import click
+
+from generator import Workspace, WorkspaceSpec, generate_workspace
+import bench_startup
+
+
+REPO_ROOT = Path(__file__, "../..").resolve()
+
+# Python snippet installing the mod, `sdutils install` also kills the game processes
+_INSTALL_SCRIPT = "from sdutils.commands.build import ModBuilder; builder = ModBuilder(); builder.build(); builder.install_local()"
+
+OPERATIONS = {
+    "build": ["-m", "sdutils.cli", "build"],
+    "release": ["-m", "sdutils.cli", "release"],
+    "fetch-prefabs": ["-m", "sdutils.cli", "fetch-prefabs"],
+    "install": ["-c", _INSTALL_SCRIPT],
+}
+
+
+def _reset(workspace: Workspace) -> None:
+    """
+    Removes every output and cache of a workspace, for a cold run.
+    """
+    shutil.rmtree(Path(workspace.env["appdata"], "sdutils-cache"), ignore_errors=True)
+    shutil.rmtree(Path(workspace.root, "game", "Mods"), ignore_errors=True)
+
+    for mod in workspace.mods:
+        for name in ("build", "obj", "Prefabs"):
+            shutil.rmtree(Path(mod, name), ignore_errors=True)
+
+        for archive in mod.glob("*.zip"):
+            archive.unlink()
+
+
+def _time(args: List[str], workspace: Workspace) -> float:
+    env = dict(workspace.env)
+    env["PYTHONPATH"] = str(REPO_ROOT)
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *args], cwd=workspace.root_mod, env=env, capture_output=True, check=True)
+
+    return (time.perf_counter() - start) * 1000
+
+
+def _check_archive(workspace: Workspace) -> None:
+    """
+    Checks that the root mod archive holds its DLL, so that timings are not taken on
+    a workspace where the stub 'dotnet' built nothing.
+
+    Raises:
+        SystemExit: If the archive or its DLL is missing.
+    """
+    name = workspace.root_mod.name
+    path = Path(workspace.root_mod, f"{name}.zip")
+
+    if not path.exists():
+        raise SystemExit(f"Error: no archive built at '{path}'")
+
+    with ZipFile(path) as archive:
+        if not any(member.rpartition("/")[2] == f"{name}.dll" for member in archive.namelist()):
+            raise SystemExit(f"Error: '{path.name}' has no '{name}.dll' member, the stub 'dotnet' built nothing")
+
+
+def _summary(timings: List[float]) -> dict:
+    return {
+        "min_ms": min(timings),
+        "median_ms": statistics.median(timings),
+        "mean_ms": statistics.mean(timings),
+    }
+
+
+def run_suite(spec: WorkspaceSpec, runs: int, operations: List[str]) -> Dict[str, dict]:
+    """
+    Generates a workspace from `spec`, then times each operation cold and warm.
+    """
+    results = dict()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+
+        workspace = generate_workspace(Path(tmp_dir, "workspace"), spec)
+
+        for name in operations:
+
+            _reset(workspace)
+            cold = _time(OPERATIONS[name], workspace)
+
+            if name in ("build", "release"):
+                _check_archive(workspace)
+
+            warm = [_time(OPERATIONS[name], workspace) for _ in range(runs)]
+
+            results[name] = {"cold_ms": cold, "warm": _summary(warm)}
+
+        for name, args in bench_startup.COMMANDS.items():
+            env = dict(workspace.env)
+            env["PYTHONPATH"] = str(REPO_ROOT)
+            timings = [t * 1000 for t in bench_startup.time_command(args, env, workspace.root_mod, runs)]
+            results[f"startup-{name}"] = {"cold_ms": timings[0], "warm": _summary(timings)}
+
+    return results
+
+
+def _git_commit() -> str:
+    result = subprocess.run(["git", "-C", str(REPO_ROOT), "rev-parse", "HEAD"], capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+@click.group()
+def cli():
+    """
+    Benchmark suite of the sdutils build pipeline
+    """
+    pass
+
+
+@cli.command("run")
+@click.option("-n", "--runs", type=click.IntRange(min=1), default=5, show_default=True, help="Warm runs per operation.")
+@click.option("--files", type=int, default=WorkspaceSpec.files, show_default=True, help="Asset files per mod.")
+@click.option("--size-mb", type=float, default=WorkspaceSpec.total_size / 1024 / 1024, show_default=True, help="Total asset size per mod, in MB.")
+@click.option("--prefabs", type=int, default=WorkspaceSpec.prefabs, show_default=True, help="Prefabs in the library.")
+@click.option("--depth", type=int, default=WorkspaceSpec.depth, show_default=True, help="Depth of the dependency tree.")
+@click.option("--fanout", type=int, default=WorkspaceSpec.fanout, show_default=True, help="Dependencies per non-leaf mod.")
+@click.option("-op", "--operation", "operations", multiple=True, type=click.Choice(list(OPERATIONS)), help="Operations to run, all by default.")
+@click.option("-o", "--output", type=click.Path(dir_okay=False), help="Write the results to a JSON file.")
+def cmd_run(runs: int, files: int, size_mb: float, prefabs: int, depth: int, fanout: int, operations: List[str], output: str):
+    """
+    Generate a synthetic workspace and time build, release, install, fetch-prefabs and startup
+    """
+    spec = WorkspaceSpec(files=files, total_size=int(size_mb * 1024 * 1024), prefabs=prefabs, depth=depth, fanout=fanout)
+    results = run_suite(spec, runs, list(operations) or list(OPERATIONS))
+
+    for name, result in results.items():
+        print(f"{name:<16} cold {result['cold_ms']:9.1f}ms | warm median {result['warm']['median_ms']:9.1f}ms")
+
+    if output:
+        report = {
+            "meta": {
+                "commit": _git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "spec": spec.__dict__,
+                "runs": runs,
+            },
+            "results": results,
+        }
+
+        with open(output, "w") as writer:
+            json.dump(report, writer, indent=4)
+
+
+@cli.command("compare")
+@click.argument("before", type=click.Path(exists=True, dir_okay=False))
+@click.argument("after", type=click.Path(exists=True, dir_okay=False))
+def cmd_compare(before: str, after: str):
+    """
+    Compare two result files, operation by operation
+    """
+    with open(before, "rb") as reader:
+        results_before = json.load(reader)["results"]
+
+    with open(after, "rb") as reader:
+        results_after = json.load(reader)["results"]
+
+    for name in sorted(results_before.keys() & results_after.keys()):
+        for label, key in (("cold", None), ("warm", "median_ms")):
+
+            value_before = results_before[name]["cold_ms"] if key is None else results_before[name]["warm"][key]
+            value_after = results_after[name]["cold_ms"] if key is None else results_after[name]["warm"][key]
+            delta = (value_after - value_before) / value_before * 100 if value_before else 0
+
+            print(f"{name:<16} {label}  {value_before:9.1f}ms -> {value_after:9.1f}ms  ({delta:+.1f}%)")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,216 @@
+"""
+Generates synthetic 7D2D modding workspaces, to benchmark sdutils without any game install.
+
+A workspace holds a global configuration, a fake game folder, a prefab library,
+a stub `dotnet` executable and a tree of mod projects depending on each other.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List
+import random
+import json
+import stat
+import sys
+import os
+
+
+# Content of the stub 'dotnet', writing an empty DLL named after the project, its
+# first '.csproj' argument, into its 'build' folder, as the csproj template does
+_DOTNET_SH = """#!/bin/sh
+for arg in "$@"; do
+    case "$arg" in *.csproj) project="$arg"; break;; esac
+done
+mkdir -p "$(dirname "$project")/build"
+: > "$(dirname "$project")/build/$(basename "$project" .csproj).dll"
+"""
+
+_DOTNET_CMD = """@echo off
+for %%a in (%*) do if /i "%%~xa"==".csproj" if not defined project set "project=%%~fa"
+for %%p in ("%project%") do (
+    if not exist "%%~dppbuild" mkdir "%%~dppbuild"
+    type nul > "%%~dppbuild\\%%~np.dll"
+)
+"""
+
+_CSPROJ = """<?xml version="1.0" encoding="utf-8"?>
+<Project ToolsVersion="15.0" xmlns="http://schemas.microsoft.com/developer/msbuild/2003">
+    <PropertyGroup>
+        <AssemblyName>{name}</AssemblyName>
+        <OutputPath>.\\build</OutputPath>
+    </PropertyGroup>
+    <ItemGroup>
+        <Reference Include="Assembly-CSharp">
+            <HintPath>$(PATH_7D2D)\\7DaysToDie_Data\\Managed\\Assembly-CSharp.dll</HintPath>
+        </Reference>
+    </ItemGroup>
+    <ItemGroup>
+        <Compile Include=".\\Harmony\\**\\*.cs" />
+    </ItemGroup>
+</Project>
+"""
+
+# Name of the leaf mod every deepest-but-one mod depends on
+SHARED_MOD = "shared-mod"
+
+# Extensions of the files making a prefab
+PREFAB_EXTENSIONS = ["tts", "xml", "mesh", "ins", "jpg"]
+
+
+@dataclass
+class WorkspaceSpec:
+    """
+    Shape of a synthetic workspace.
+
+    Attributes:
+        files: Number of asset files per mod, spread over 'Config', 'Resources' and 'UIAtlases'.
+        total_size: Total size of the asset files of a mod, in bytes.
+        prefabs: Number of prefabs in the library, half of them used by the root mod.
+        depth: Depth of the dependency tree, 0 for a single mod.
+        fanout: Number of dependencies of each non-leaf mod.
+        seed: Seed of the generated content.
+    """
+    files: int = 200
+    total_size: int = 20 * 1024 * 1024
+    prefabs: int = 100
+    depth: int = 1
+    fanout: int = 2
+    seed: int = 7
+
+
+@dataclass
+class Workspace:
+    """
+    Paths of a generated workspace, and the environment to run sdutils in it.
+    """
+    root: Path
+    root_mod: Path
+    mods: List[Path] = field(default_factory=list)
+    env: Dict[str, str] = field(default_factory=dict)
+
+
+def _write_random(path: Path, size: int, rng: random.Random) -> None:
+    """
+    Writes a file of `size` bytes, half random and half repeated, so that it compresses like real assets.
+    """
+    os.makedirs(path.parent, exist_ok=True)
+    random_part = rng.randbytes(size // 2)
+
+    with open(path, "wb") as writer:
+        writer.write(random_part)
+        writer.write(b"\0" * (size - len(random_part)))
+
+
+def _write_stub_dotnet(bin_dir: Path) -> None:
+    os.makedirs(bin_dir, exist_ok=True)
+
+    if sys.platform == "win32":
+        Path(bin_dir, "dotnet.cmd").write_text(_DOTNET_CMD)
+        return
+
+    path = Path(bin_dir, "dotnet")
+    path.write_text(_DOTNET_SH)
+    path.chmod(path.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def _write_prefabs(library: Path, spec: WorkspaceSpec, rng: random.Random) -> List[str]:
+    """
+    Writes the prefab library, returning the prefab names.
+    """
+    names = [f"poi_{index:05d}" for index in range(spec.prefabs)]
+
+    for name in names:
+        for extension in PREFAB_EXTENSIONS:
+            _write_random(Path(library, "POIs", f"{name}.{extension}"), rng.randint(512, 16 * 1024), rng)
+
+    return names
+
+
+def _write_mod(path: Path, name: str, dependencies: List[str], prefabs: List[str], spec: WorkspaceSpec, rng: random.Random) -> None:
+    """
+    Writes a mod project: 'sdutils.json', 'ModInfo.xml', a C# project and its assets.
+    """
+    os.makedirs(path, exist_ok=True)
+    folders = ["Config", "Resources", "UIAtlases/ItemIconAtlas"]
+    file_size = max(1, spec.total_size // max(1, spec.files))
+
+    for index in range(spec.files):
+        folder = folders[index % len(folders)]
+        extension = "xml" if folder == "Config" else "png" if folder.startswith("UI") else "unity3d"
+        _write_random(Path(path, folder, f"asset_{index:05d}.{extension}"), file_size, rng)
+
+    Path(path, "ModInfo.xml").write_text(f'<xml><Name value="{name}" /></xml>\n')
+    Path(path, f"{name}.csproj").write_text(_CSPROJ.format(name=name))
+    os.makedirs(Path(path, "Harmony"), exist_ok=True)
+    Path(path, "Harmony", "ModApi.cs").write_text("public class ModApi {}\n")
+
+    build_infos = {
+        "name": name,
+        "csproj": f"{name}.csproj",
+        "include": ["ModInfo.xml", "Config", "UIAtlases", "Resources"],
+        "prefabs": [f"POIs/{prefab}" for prefab in prefabs],
+        "dependencies": [f"../{dep}" for dep in dependencies],
+        "clear_saves": [],
+        "game_path": None,
+    }
+
+    with open(Path(path, "sdutils.json"), "w") as writer:
+        json.dump(build_infos, writer, indent=4)
+
+
+def generate_workspace(root: Path, spec: WorkspaceSpec) -> Workspace:
+    """
+    Generates a workspace under `root`, which must not exist yet.
+
+    The dependency tree is a `fanout`-ary tree of `depth` levels below the root mod.
+    Every mod of the last-but-one level also depends on a single shared leaf,
+    so that the deduplication of shared dependencies is exercised.
+    """
+    rng = random.Random(spec.seed)
+    root = Path(root).resolve()
+
+    appdata = Path(root, "appdata")
+    game = Path(root, "game")
+    library = Path(root, "prefabs")
+    bin_dir = Path(root, "bin")
+
+    os.makedirs(appdata)
+    os.makedirs(Path(game, "Mods"))
+    _write_random(Path(game, "7DaysToDie_Data", "Managed", "Assembly-CSharp.dll"), 1024, rng)
+    _write_stub_dotnet(bin_dir)
+
+    prefab_names = _write_prefabs(library, spec, rng)
+
+    with open(Path(appdata, "sdutils.json"), "w") as writer:
+        json.dump({"PATH_7D2D": str(game), "PATH_7D2D_USER": str(Path(root, "user")), "PATH_PREFABS": str(library)}, writer, indent=4)
+
+    mods = list()
+
+    def add_mod(name: str, level: int) -> None:
+        dependencies = list()
+
+        if level < spec.depth:
+            dependencies = [f"{name}-{index}" for index in range(spec.fanout)]
+
+            for dep in dependencies:
+                add_mod(dep, level + 1)
+
+            if level + 1 == spec.depth:
+                if not Path(root, "mods", SHARED_MOD).exists():
+                    add_mod(SHARED_MOD, spec.depth)
+
+                dependencies.append(SHARED_MOD)
+
+        prefabs = prefab_names[: len(prefab_names) // 2] if level == 0 else list()
+        _write_mod(Path(root, "mods", name), name, dependencies, prefabs, spec, rng)
+        mods.append(Path(root, "mods", name))
+
+    add_mod("root-mod", 0)
+
+    env = dict(os.environ)
+    env["appdata"] = str(appdata)
+    env["PATH"] = os.pathsep.join([str(bin_dir), env.get("PATH", "")])
+    env["PATH_7D2D"] = str(game)
+
+    return Workspace(root=root, root_mod=Path(root, "mods", "root-mod"), mods=mods, env=env)
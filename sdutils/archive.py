@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from dataclasses import dataclass
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED, ZIP_LZMA, ZIP_STORED
+from pathlib import Path
+from typing import BinaryIO, Iterable, Optional, Tuple
+import tempfile
+import zipfile
+import shutil
+import struct
+import time
+import copy
+import zlib
+import os
+
+from . import compression
+from .compression import CompressionReport, Method
+
+
+# Bit flags of the zip general purpose field, see APPNOTE.TXT section 4.4.4
+_FLAG_ENCRYPTED = 0x01
+_FLAG_LZMA_EOS = 0x02
+_FLAG_DATA_DESCRIPTOR = 0x08
+
+# Size of the fixed part of a local file header
+_LOCAL_HEADER_SIZE = 30
+
+# Date, permissions and creator system of every member, so that archives only depend
+# on the content and names of their members: 1980-01-01 being the earliest zip date
+MEMBER_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+MEMBER_ATTRIBUTES = 0o100644 << 16
+MEMBER_SYSTEM = 3
+
+# Compressed members kept in memory up to this size, then spilled to a temporary file
+_SPOOL_SIZE = 8 * 1024 * 1024
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class _CompressedMember:
+    """
+    A member compressed by a worker thread, waiting to be written into the archive.
+    Stored members have no `data`: they are streamed from their source when written.
+    """
+    zinfo: ZipInfo
+    src: Path
+    method: Method
+    data: Optional[BinaryIO]
+    cpu: float
+
+
+class ArchiveWriter:
+    """
+    Writes a mod archive member by member, straight from the source files.
+
+    The archive is first written next to its destination, then moved in place
+    once complete, so that an interrupted build never leaves a truncated zip.
+
+    Archives are reproducible: members get a fixed date and permissions, so that
+    the same members added in the same order give the same bytes.
+
+    Files are compressed on worker threads, each with its own method, see
+    `compression.CompressionPolicy`, then written in order.
+
+    Example:
+        with ArchiveWriter(Path("my-mod.zip")) as archive:
+            archive.add_file("ModInfo.xml", Path("src/ModInfo.xml"))
+            archive.add_files([("Resources/atlas.png", Path("src/atlas.png"), Method("store"))])
+            archive.add_bytes("version.txt", b"...")
+    """
+
+    def __init__(self, path: Path, jobs: int = None):
+        """
+        Args:
+            path: Path of the archive.
+            jobs: Number of threads compressing members, the number of CPUs by default.
+        """
+        self.path = path
+        self.tmp_path = path.with_name(f"{path.name}.tmp")
+        self.jobs = jobs or os.cpu_count() or 1
+        self.zip_file: ZipFile = None
+        self.files_count = 0
+        self.bytes_count = 0
+        self.report = CompressionReport()
+
+    def __enter__(self) -> ArchiveWriter:
+        self.zip_file = ZipFile(self.tmp_path, "w", ZIP_DEFLATED)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.zip_file.close()
+
+        if exc_type is None:
+            os.replace(self.tmp_path, self.path)
+        else:
+            self.tmp_path.unlink(missing_ok=True)
+
+    def add_file(self, name: str, src: Path, method: Method = compression.DEFAULT_METHOD) -> None:
+        """
+        Streams the file `src` into the archive under the member name `name`.
+        """
+        self.add_files([(name, src, method)])
+
+    def add_files(self, members: Iterable[Tuple[str, Path, Method]]) -> None:
+        """
+        Compresses files on the worker threads, and writes them into the archive in the
+        given order. A few members only are compressed ahead of the one being written.
+
+        Args:
+            members: Member names, with their source file and compression method.
+        """
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+
+            pending = deque()
+
+            for name, src, method in members:
+                pending.append(executor.submit(_compress_member, name, src, method))
+
+                if len(pending) >= 2 * self.jobs:
+                    self._write_member(pending.popleft().result())
+
+            while pending:
+                self._write_member(pending.popleft().result())
+
+    def _write_member(self, member: _CompressedMember) -> None:
+        zinfo = member.zinfo
+
+        if member.data is None:
+            with open(member.src, "rb") as reader, self.zip_file.open(zinfo, "w") as writer:
+                shutil.copyfileobj(reader, writer, _CHUNK_SIZE)
+
+        else:
+            with member.data:
+                self._write_raw_member(zinfo, member.data)
+
+        self.files_count += 1
+        self.bytes_count += zinfo.file_size
+        self.report.add(member.method, zinfo.file_size, zinfo.compress_size, member.cpu)
+
+    def add_bytes(self, name: str, data: bytes) -> None:
+        """
+        Writes an in-memory member into the archive.
+        """
+        self.zip_file.writestr(_member_info(name), data)
+        self.files_count += 1
+        self.bytes_count += len(data)
+
+    def add_archive(self, src: Path, prefix: str, exclude: Iterable[str] = ()) -> None:
+        """
+        Copies every member of the archive `src` under the folder `prefix`.
+
+        Members are copied as raw compressed bytes, without being decompressed
+        nor compressed again. Directory entries and the member names listed in
+        `exclude` are skipped.
+        """
+        exclude = set(exclude)
+
+        with ZipFile(src, "r") as source, open(src, "rb") as reader:
+            for info in source.infolist():
+
+                if info.is_dir() or info.filename in exclude:
+                    continue
+
+                self._copy_raw_member(reader, info, f"{prefix}/{info.filename}")
+
+    def _copy_raw_member(self, reader, info: ZipInfo, name: str) -> None:
+        """
+        Writes a member of another archive under a new name, passing its
+        compressed data through. CRC and sizes are taken from the source entry.
+        """
+        if info.flag_bits & _FLAG_ENCRYPTED:
+            raise ValueError(f"Can't copy encrypted member: '{info.filename}'")
+
+        reader.seek(info.header_offset)
+        header = reader.read(_LOCAL_HEADER_SIZE)
+        name_length, extra_length = struct.unpack("<HH", header[26:30])
+        reader.seek(info.header_offset + _LOCAL_HEADER_SIZE + name_length + extra_length)
+
+        zinfo = copy.copy(info)
+        zinfo.filename = name
+        zinfo.orig_filename = name
+        zinfo.date_time = MEMBER_DATE_TIME
+        zinfo.external_attr = MEMBER_ATTRIBUTES
+        zinfo.create_system = MEMBER_SYSTEM
+        zinfo.flag_bits &= ~_FLAG_DATA_DESCRIPTOR
+        zinfo.extra = zipfile._strip_extra(info.extra, (1,))
+
+        self._write_raw_member(zinfo, reader)
+
+        self.files_count += 1
+        self.bytes_count += zinfo.compress_size
+
+    def _write_raw_member(self, zinfo: ZipInfo, reader) -> None:
+        """
+        Writes a member whose data is already compressed, reading `zinfo.compress_size`
+        bytes from `reader`. CRC and sizes must be set in `zinfo`.
+        """
+        zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT or zinfo.compress_size > zipfile.ZIP64_LIMIT
+        zip_file = self.zip_file
+
+        zip_file.fp.seek(zip_file.start_dir)
+        zinfo.header_offset = zip_file.fp.tell()
+        zip_file._writecheck(zinfo)
+        zip_file._didModify = True
+
+        zip_file.fp.write(zinfo.FileHeader(zip64))
+        _copy_bytes(reader, zip_file.fp, zinfo.compress_size)
+
+        zip_file.start_dir = zip_file.fp.tell()
+        zip_file.filelist.append(zinfo)
+        zip_file.NameToInfo[zinfo.filename] = zinfo
+
+
+def _member_info(name: str) -> ZipInfo:
+    """
+    Returns the header of a new deflated member, with the fixed date and permissions.
+    """
+    zinfo = ZipInfo(name, MEMBER_DATE_TIME)
+    zinfo.external_attr = MEMBER_ATTRIBUTES
+    zinfo.create_system = MEMBER_SYSTEM
+    zinfo.compress_type = ZIP_DEFLATED
+
+    return zinfo
+
+
+def _compress_member(name: str, src: Path, method: Method) -> _CompressedMember:
+    """
+    Compresses a file with its method, resolving 'auto' from its entropy. Runs on a
+    worker thread: zlib and lzma release the GIL while compressing.
+    """
+    start = time.thread_time()
+    method = compression.resolve(method, src)
+
+    zinfo = _member_info(name)
+    zinfo.compress_type = method.compress_type
+    zinfo.file_size = src.stat().st_size
+
+    if method.compress_type == ZIP_STORED:
+        return _CompressedMember(zinfo, src, method, None, time.thread_time() - start)
+
+    if method.compress_type == ZIP_LZMA:
+        zinfo.flag_bits |= _FLAG_LZMA_EOS
+
+    compressor = zipfile._get_compressor(method.compress_type, method.level)
+    data = tempfile.SpooledTemporaryFile(_SPOOL_SIZE)
+    crc = size = 0
+
+    with open(src, "rb") as reader:
+        while chunk := reader.read(_CHUNK_SIZE):
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            data.write(compressor.compress(chunk))
+
+    data.write(compressor.flush())
+
+    zinfo.CRC = crc
+    zinfo.file_size = size
+    zinfo.compress_size = data.tell()
+    data.seek(0)
+
+    return _CompressedMember(zinfo, src, method, data, time.thread_time() - start)
+
+
+def _copy_bytes(reader, writer, size: int, chunk_size: int = 1024 * 1024) -> None:
+    """
+    Copies exactly `size` bytes from `reader` to `writer`, by chunks.
+    """
+    while size > 0:
+        chunk = reader.read(min(size, chunk_size))
+
+        if not chunk:
+            raise EOFError("Truncated zip member")
+
+        writer.write(chunk)
+        size -= len(chunk)
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+import threading
+import hashlib
+import json
+import time
+import os
+
+from .config import USER_CACHE_DIR, get_user_config
+from . import copying
+
+
+# Folder of the artifact cache: its index, and the artifacts stored by content hash
+ARTIFACTS_DIR = Path(USER_CACHE_DIR, "artifacts")
+
+# Bump when the archive layout or the key inputs change, older keys then miss
+ARTIFACT_VERSION = 1
+
+# Bump when the index layout changes, older indexes are then dropped
+INDEX_VERSION = 1
+
+
+@dataclass
+class StoredObject:
+    """
+    An artifact of the cache, stored once whatever the number of keys pointing to it.
+
+    Attributes:
+        size: Size of the artifact, in bytes.
+        used: Last time the artifact was stored or fetched, as a Unix timestamp.
+    """
+    size: int
+    used: float
+
+
+def fingerprint_files(entries: Dict[str, Path]) -> str:
+    """
+    Hash of a set of files: the name, size and mtime of each, in name order.
+    """
+    digest = hashlib.sha256()
+
+    for name, path in sorted(entries.items()):
+        try:
+            stat = path.stat()
+            digest.update(f"{name}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+        except OSError:
+            digest.update(f"{name}|missing\n".encode())
+
+    return digest.hexdigest()
+
+
+def make_key(**inputs) -> str:
+    """
+    Returns the cache key of an artifact built from the given JSON serializable inputs.
+    """
+    datas = json.dumps({"version": ARTIFACT_VERSION, **inputs}, sort_keys=True, default=str)
+    return hashlib.sha256(datas.encode()).hexdigest()
+
+
+def _hash_file(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as reader:
+        while chunk := reader.read(chunk_size):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """
+    Local content-addressed cache of built archives.
+
+    Keys are computed from everything an archive is built from (see `make_key`), and
+    point to the SHA256 of the archive content, so that identical archives built from
+    different inputs are stored once. Once the stored artifacts exceed `max_size`, the
+    least recently used ones are evicted.
+
+    Use `get_cache` to share the instance within a run.
+    """
+
+    def __init__(self, root: Path = ARTIFACTS_DIR, max_size: int = 2 * 1024**3):
+        self.root = root
+        self.max_size = max_size
+        self.path = Path(root, "index.json")
+        self.keys: Dict[str, str] = dict()
+        self.objects: Dict[str, StoredObject] = dict()
+        self.lock = threading.Lock()
+        self._loaded_mtime: Optional[int] = None
+
+    def object_path(self, sha: str) -> Path:
+        return Path(self.root, "objects", sha[:2], f"{sha}.zip")
+
+    def _load(self) -> None:
+        """
+        Reads the index, unless already read and not modified since by another process.
+        """
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except OSError:
+            return
+
+        if mtime == self._loaded_mtime:
+            return
+
+        try:
+            with open(self.path, "rb") as reader:
+                datas: dict = json.load(reader)
+
+        except (OSError, ValueError):
+            return
+
+        self._loaded_mtime = mtime
+
+        if datas.get("version") != INDEX_VERSION:
+            return
+
+        self.keys = datas["keys"]
+        self.objects = {sha: StoredObject(**entry) for sha, entry in datas["objects"].items()}
+
+    def _save(self) -> None:
+        datas = {
+            "version": INDEX_VERSION,
+            "keys": self.keys,
+            "objects": {sha: {"size": o.size, "used": o.used} for sha, o in self.objects.items()},
+        }
+
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+
+        with open(tmp_path, "w") as writer:
+            json.dump(datas, writer)
+
+        os.replace(tmp_path, self.path)
+        self._loaded_mtime = self.path.stat().st_mtime_ns
+
+    def fetch(self, key: str, dst: Path) -> bool:
+        """
+        Copies the artifact of `key` to `dst`, as a reflink where supported.
+
+        Returns:
+            True on a cache hit, False if there is no artifact for `key`.
+        """
+        with self.lock:
+            self._load()
+
+            sha = self.keys.get(key)
+
+            if sha is None or sha not in self.objects or not self.object_path(sha).exists():
+                return False
+
+            self.objects[sha].used = time.time()
+            self._save()
+
+        copying.copy_file(self.object_path(sha), dst, preserve_mtime=False, replace=True)
+        return True
+
+    def put(self, key: str, src: Path) -> str:
+        """
+        Stores the file `src` as the artifact of `key`, then evicts the least recently
+        used artifacts beyond the size cap.
+
+        Returns:
+            The SHA256 of the artifact.
+        """
+        sha = _hash_file(src)
+        path = self.object_path(sha)
+
+        if not path.exists():
+            os.makedirs(path.parent, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            copying.copy_file(src, tmp_path, preserve_mtime=False)
+            os.replace(tmp_path, path)
+
+        with self.lock:
+            self._load()
+
+            self.keys[key] = sha
+            self.objects[sha] = StoredObject(path.stat().st_size, time.time())
+            self._evict()
+            self._save()
+
+        return sha
+
+    def _evict(self) -> None:
+        """
+        Deletes the least recently used artifacts until the cache fits in `max_size`,
+        always keeping the most recent one.
+        """
+        size = sum(o.size for o in self.objects.values())
+        evicted = set()
+
+        for sha, stored in sorted(self.objects.items(), key=lambda item: item[1].used):
+            if size <= self.max_size or len(evicted) == len(self.objects) - 1:
+                break
+
+            self.object_path(sha).unlink(missing_ok=True)
+            evicted.add(sha)
+            size -= stored.size
+
+        for sha in evicted:
+            del self.objects[sha]
+
+        self.keys = {key: sha for key, sha in self.keys.items() if sha not in evicted}
+
+
+_cache: Optional[ArtifactCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ArtifactCache:
+    """
+    Returns the artifact cache, its size cap being `ARTIFACT_CACHE_MB` of the user configuration.
+    """
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = ArtifactCache()
+
+        _cache.max_size = get_user_config().ARTIFACT_CACHE_MB * 1024**2
+
+        return _cache
@@ -0,0 +1,457 @@
+"""
+Searchable catalogue of a prefab library, in a SQLite database.
+
+The catalogue holds the properties of every prefab, read from its '.xml' file: tags,
+themes, difficulty tier, dimensions, zoning, biomes and townships. It is kept up to
+date from the listing of `prefabs.PrefabIndex`: only the folders listed again by the
+index are looked at, and only the '.xml' files whose size or mtime changed are parsed again.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Collection, Dict, List, Optional, Tuple
+import xml.etree.ElementTree as ET
+import threading
+import hashlib
+import sqlite3
+import json
+import os
+
+from .config import USER_CACHE_DIR
+from . import prefabs
+
+
+# Bump when the schema or the parsing changes, older catalogues are then rebuilt
+CATALOGUE_VERSION = 2
+
+# Properties holding comma separated lists, by the name of their search filter
+TERM_PROPERTIES = {
+    "tag": "Tags",
+    "theme": "ThemeTags",
+    "zoning": "Zoning",
+    "biome": "AllowedBiomes",
+    "township": "AllowedTownships",
+}
+
+_SCHEMA = """
+CREATE TABLE prefabs (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    tier INTEGER,
+    width INTEGER,
+    height INTEGER,
+    length INTEGER
+);
+CREATE TABLE properties (path TEXT NOT NULL, name TEXT NOT NULL, value TEXT NOT NULL);
+CREATE TABLE terms (path TEXT NOT NULL, kind TEXT NOT NULL, value TEXT NOT NULL);
+CREATE INDEX prefabs_dir ON prefabs (dir);
+CREATE INDEX properties_path ON properties (path);
+CREATE INDEX terms_path ON terms (path);
+CREATE INDEX terms_value ON terms (kind, value);
+"""
+
+
+@dataclass
+class Prefab:
+    """
+    A prefab of the catalogue.
+
+    Attributes:
+        path: Path of the prefab relative to the library, without extension.
+        tier: Difficulty tier, if set.
+        width, height, length: Dimensions from 'PrefabSize', if set.
+        terms: Values of the list properties, by filter name, such as 'tag' or 'zoning'.
+    """
+    path: str
+    tier: Optional[int] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    length: Optional[int] = None
+    terms: Dict[str, List[str]] = field(default_factory=dict)
+
+    @property
+    def name(self) -> str:
+        return self.path.rpartition("/")[2]
+
+    @property
+    def dimensions(self) -> str:
+        return f"{self.width}x{self.height}x{self.length}" if self.width is not None else "-"
+
+
+def _parse_range(value) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Parses a tier filter, such as 3, '3' or '2-4', into inclusive bounds.
+    """
+    low, dash, high = str(value).partition("-")
+
+    if not dash:
+        high = low
+
+    try:
+        return int(low) if low.strip() else None, int(high) if high.strip() else None
+    except ValueError:
+        raise SystemExit(f"Error: invalid tier range '{value}'")
+
+
+def _parse_size(value: str) -> Tuple[int, int]:
+    """
+    Parses a size filter 'WIDTHxLENGTH', such as '40x40'.
+    """
+    try:
+        width, length = str(value).lower().split("x")
+        return int(width), int(length)
+    except ValueError:
+        raise SystemExit(f"Error: invalid size '{value}', expected WIDTHxLENGTH")
+
+
+@dataclass
+class PrefabQuery:
+    """
+    Filters of a prefab search, all of them applying. Saved queries of the 'prefabs'
+    list of 'sdutils.json' are objects with the same keys.
+
+    Attributes:
+        name: Glob pattern of the prefab name, case-insensitive.
+        dir: Folder of the library the prefabs are searched in.
+        tag, theme, zoning, biome, township: Values the list properties must all hold.
+        tier: Difficulty tier, or inclusive range of tiers, such as '2-4'.
+        min_size, max_size: Bounds of the footprint, as 'WIDTHxLENGTH'.
+        properties: Exact values of any other property, by property name.
+        limit: Maximum number of prefabs found.
+    """
+    name: Optional[str] = None
+    dir: Optional[str] = None
+    tag: List[str] = field(default_factory=list)
+    theme: List[str] = field(default_factory=list)
+    zoning: List[str] = field(default_factory=list)
+    biome: List[str] = field(default_factory=list)
+    township: List[str] = field(default_factory=list)
+    tier: Optional[str] = None
+    min_size: Optional[str] = None
+    max_size: Optional[str] = None
+    properties: Dict[str, str] = field(default_factory=dict)
+    limit: Optional[int] = None
+
+    @staticmethod
+    def from_dict(datas: dict) -> PrefabQuery:
+        """
+        Reads a saved query, single values being accepted for list filters.
+
+        Raises:
+            SystemExit: If the query has an unknown key.
+        """
+        try:
+            query = PrefabQuery(**datas)
+        except TypeError:
+            raise SystemExit(f"Error: invalid prefab query {datas}")
+
+        for kind in TERM_PROPERTIES:
+            if isinstance(getattr(query, kind), str):
+                setattr(query, kind, [getattr(query, kind)])
+
+        return query
+
+    def to_dict(self) -> dict:
+        """
+        Returns the query as a 'prefabs' entry of 'sdutils.json', without its unset filters.
+        """
+        return {key: value for key, value in self.__dict__.items() if value not in (None, [], {})}
+
+    def sql(self) -> Tuple[str, List]:
+        """
+        Returns the SQL selecting the paths of the matching prefabs, with its parameters.
+        """
+        clauses, params = list(), list()
+
+        if self.name:
+            like = self.name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append("name LIKE ? ESCAPE '\\'")
+            params.append(like.replace("*", "%").replace("?", "_"))
+
+        if self.dir:
+            clauses.append("path LIKE ? ESCAPE '\\'")
+            params.append(self.dir.strip("/").replace("%", "\\%").replace("_", "\\_") + "/%")
+
+        for kind in TERM_PROPERTIES:
+            for value in getattr(self, kind):
+                clauses.append("path IN (SELECT path FROM terms WHERE kind = ? AND value = ?)")
+                params += [kind, value.strip().lower()]
+
+        if self.tier is not None:
+            low, high = _parse_range(self.tier)
+
+            if low is not None:
+                clauses.append("tier >= ?")
+                params.append(low)
+
+            if high is not None:
+                clauses.append("tier <= ?")
+                params.append(high)
+
+        if self.min_size:
+            width, length = _parse_size(self.min_size)
+            clauses.append("width >= ? AND length >= ?")
+            params += [width, length]
+
+        if self.max_size:
+            width, length = _parse_size(self.max_size)
+            clauses.append("width <= ? AND length <= ?")
+            params += [width, length]
+
+        for name, value in self.properties.items():
+            clauses.append("path IN (SELECT path FROM properties WHERE name = ? AND value = ?)")
+            params += [name, str(value)]
+
+        sql = "SELECT path FROM prefabs"
+
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+
+        sql += " ORDER BY path"
+
+        if self.limit:
+            sql += " LIMIT ?"
+            params.append(self.limit)
+
+        return sql, params
+
+
+def _parse_prefab(path: Path) -> Optional[Dict[str, str]]:
+    """
+    Reads the properties of a prefab '.xml' file, or None if it can't be parsed.
+    """
+    try:
+        root = ET.parse(path).getroot()
+    except (OSError, ET.ParseError):
+        return None
+
+    return {e.get("name"): e.get("value", "") for e in root.findall("property") if e.get("name")}
+
+
+def _int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value.strip())
+    except (AttributeError, ValueError):
+        return None
+
+
+class PrefabCatalogue:
+    """
+    SQLite catalogue of the prefabs of a library folder, such as `PATH_PREFABS`.
+
+    A prefab is a '.xml' file of the library next to a '.tts' file of the same name.
+    The catalogue is synced with the library index once per index refresh, so that
+    repeated searches within a run don't look at the library again.
+
+    Use `get_catalogue` to share instances within a run.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root).resolve()
+        digest = hashlib.sha1(str(self.root).encode()).hexdigest()[:12]
+        self.path = Path(USER_CACHE_DIR, f"prefabs-{digest}.sqlite")
+        self.index = prefabs.get_index(self.root)
+        self.lock = threading.Lock()
+        self._synced_dirs = None
+        self._synced_listings: Dict[str, prefabs.DirListing] = dict()
+
+        os.makedirs(self.path.parent, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != CATALOGUE_VERSION:
+            self._create()
+
+    def _create(self) -> None:
+        with self.connection:
+            for table in ("prefabs", "properties", "terms"):
+                self.connection.execute(f"DROP TABLE IF EXISTS {table}")
+
+            self.connection.executescript(_SCHEMA)
+            self.connection.execute(f"PRAGMA user_version = {CATALOGUE_VERSION}")
+
+    @staticmethod
+    def _dir_prefabs(dir_name: str, listing: prefabs.DirListing) -> Dict[str, Tuple[int, int]]:
+        """
+        Lists the prefabs of a folder of the index, with the size and mtime of their '.xml'.
+        """
+        stems = {file.rpartition(".")[0].lower() for file in listing.files if file.lower().endswith(".tts")}
+        found = dict()
+
+        for file, stat in listing.files.items():
+            stem, _, extension = file.rpartition(".")
+
+            if extension.lower() == "xml" and stem.lower() in stems:
+                found[prefabs._join(dir_name, stem)] = tuple(stat)
+
+        return found
+
+    def refresh(self) -> Tuple[int, int]:
+        """
+        Brings the catalogue up to date with the library, unless already done since the
+        last index refresh.
+
+        Only the folders the index listed again since the last sync are compared with
+        the catalogue, the others keeping their rows: the first sync of a run compares
+        every folder, without reading any file. Within these folders, only the '.xml'
+        files whose size or mtime changed are parsed again. As the index, the catalogue
+        sees a file saved in place once its folder changes.
+
+        Returns:
+            The number of prefabs parsed, and the number removed.
+        """
+        with self.lock:
+            if not self.index.refreshed:
+                self.index.refresh()
+
+            dirs = self.index.dirs
+
+            if self._synced_dirs is dirs:
+                return 0, 0
+
+            if self._synced_listings:
+                synced_dirs = set(self._synced_listings)
+            else:
+                synced_dirs = {dir_name for dir_name, in self.connection.execute("SELECT DISTINCT dir FROM prefabs")}
+
+            changed_dirs = [name for name, listing in dirs.items() if self._synced_listings.get(name) is not listing]
+            parsed = removed = 0
+
+            with self.connection:
+                for dir_name in synced_dirs - dirs.keys():
+                    removed += self._delete(self._dir_paths(dir_name))
+
+                for dir_name in changed_dirs:
+                    found = self._dir_prefabs(dir_name, dirs[dir_name])
+                    known = self._dir_paths(dir_name)
+
+                    changed = [path for path, stat in found.items() if known.get(path) != stat]
+                    removed += self._delete([path for path in known if path not in found])
+                    self._delete(changed)
+
+                    for path in changed:
+                        self._insert(path, dir_name, *found[path])
+
+                    parsed += len(changed)
+
+            self._synced_dirs = dirs
+            self._synced_listings = dict(dirs)
+
+            return parsed, removed
+
+    def _dir_paths(self, dir_name: str) -> Dict[str, Tuple[int, int]]:
+        """
+        Returns the prefabs of a folder in the catalogue, with the size and mtime of their '.xml' when parsed.
+        """
+        rows = self.connection.execute("SELECT path, size, mtime FROM prefabs WHERE dir = ?", (dir_name,))
+        return {path: (size, mtime) for path, size, mtime in rows}
+
+    def _delete(self, paths: Collection[str]) -> int:
+        for path in paths:
+            for table in ("prefabs", "properties", "terms"):
+                self.connection.execute(f"DELETE FROM {table} WHERE path = ?", (path,))
+
+        return len(paths)
+
+    def _insert(self, path: str, dir_name: str, size: int, mtime: int) -> None:
+        properties = _parse_prefab(Path(self.root, f"{path}.xml"))
+
+        if properties is None:
+            print(f"WRN: can't parse prefab '{path}.xml'")
+            properties = dict()
+
+        dimensions = [_int(value) for value in properties.get("PrefabSize", "").split(",")]
+        width, height, length = dimensions if len(dimensions) == 3 else (None, None, None)
+
+        self.connection.execute(
+            "INSERT INTO prefabs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, dir_name, path.rpartition("/")[2], size, mtime, _int(properties.get("DifficultyTier")), width, height, length),
+        )
+        self.connection.executemany(
+            "INSERT INTO properties VALUES (?, ?, ?)",
+            [(path, name, value) for name, value in properties.items()],
+        )
+
+        for kind, name in TERM_PROPERTIES.items():
+            values = {value.strip().lower() for value in properties.get(name, "").split(",") if value.strip()}
+            self.connection.executemany("INSERT INTO terms VALUES (?, ?, ?)", [(path, kind, value) for value in values])
+
+    def search(self, query: PrefabQuery) -> List[Prefab]:
+        """
+        Returns the prefabs matching every filter of `query`, sorted by path.
+        """
+        self.refresh()
+
+        with self.lock:
+            sql, params = query.sql()
+            paths = [path for path, in self.connection.execute(sql, params)]
+
+            if not paths:
+                return list()
+
+            rows = self.connection.execute(
+                "SELECT path, tier, width, height, length FROM prefabs WHERE path IN (SELECT value FROM json_each(?))",
+                (json.dumps(paths),),
+            )
+            found = {row[0]: Prefab(*row) for row in rows}
+
+            terms = self.connection.execute(
+                "SELECT path, kind, value FROM terms WHERE path IN (SELECT value FROM json_each(?)) ORDER BY value",
+                (json.dumps(paths),),
+            )
+
+            for path, kind, value in terms:
+                found[path].terms.setdefault(kind, list()).append(value)
+
+        return [found[path] for path in paths]
+
+    def properties(self, path: str) -> Dict[str, str]:
+        """
+        Returns every property of a prefab, by name.
+        """
+        self.refresh()
+
+        with self.lock:
+            return dict(self.connection.execute("SELECT name, value FROM properties WHERE path = ?", (path,)))
+
+    def files(self, query: PrefabQuery) -> Dict[str, str]:
+        """
+        Resolves a saved query of the 'prefabs' list into the files of the matching prefabs.
+
+        Returns:
+            A mapping of file names, for the destination 'Prefabs' folder, to paths
+            relative to the library, as `PrefabIndex.match` does.
+        """
+        matches = dict()
+
+        for prefab in self.search(query):
+            dir_name, _, name = prefab.path.rpartition("/")
+            listing = self.index.dirs.get(dir_name)
+
+            if listing is None:
+                continue
+
+            for file in prefabs._prefixed(listing.files, f"{name}."):
+                matches[file] = f"{dir_name}/{file}" if dir_name else file
+
+        return matches
+
+
+_catalogues: Dict[Path, PrefabCatalogue] = dict()
+_catalogues_lock = threading.Lock()
+
+
+def get_catalogue(root: Path) -> PrefabCatalogue:
+    """
+    Returns the memoized catalogue of a prefab library, opened on first access.
+    """
+    root = Path(root).resolve()
+
+    with _catalogues_lock:
+        if root not in _catalogues:
+            _catalogues[root] = PrefabCatalogue(root)
+
+        return _catalogues[root]
@@ -1,15 +1,12 @@
+from importlib import import_module
+from pathlib import Path
+import inspect
+import sys
+import re
+
 import click
 
-from .commands.new import cmd_new
-from .commands.build import (
-    cmd_infos,
-    cmd_build,
-    cmd_release,
-    cmd_install,
-    cmd_shut_down,
-    cmd_start_local,
-    cmd_fetch_prefabs,
-)
+from .client import forward, should_forward
 
 # Application branding logo in ASCII art
 ascii_logo = r"""
@@ -22,16 +19,119 @@ ascii_logo = r"""
 """
 
 
-class CustomHelp(click.Group):
+def _read_help(import_path: str) -> str:
+    """
+    Reads the docstring of a command function from the source of its module, without importing it.
+    """
+    module_name, attribute = import_path.rsplit(".", 1)
+    path = Path(__file__).parent.joinpath(*module_name.lstrip(".").split(".")).with_suffix(".py")
+    pattern = rf'^def {attribute}\(.*?\)(?: -> [^:]+)?:\s*("""|\'\'\')(.*?)\1'
+    match = re.search(pattern, path.read_text(encoding="utf-8"), re.MULTILINE | re.DOTALL)
+
+    return inspect.cleandoc(match.group(2)) if match else ""
+
+
+class LazyGroup(click.Group):
+    """
+    Click group whose subcommands are registered by import path.
+
+    A command module is only imported when the command is invoked, so that `--help`
+    and light commands don't pay for the imports of the heavy ones. The help line of
+    a command not imported yet is read from the docstring in its source.
+    """
+    def __init__(self, *args, lazy_commands: dict = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands or dict()
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | self.lazy_commands.keys())
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name in self.lazy_commands and cmd_name not in self.commands:
+            import_path = self.lazy_commands[cmd_name]
+            module_name, attribute = import_path.rsplit(".", 1)
+            self.add_command(getattr(import_module(module_name, __package__), attribute), cmd_name)
+
+        return super().get_command(ctx, cmd_name)
+
+    def format_commands(self, ctx, formatter):
+        names = self.list_commands(ctx)
+
+        if not names:
+            return
+
+        limit = formatter.width - 6 - max(len(name) for name in names)
+        rows = list()
+
+        for name in names:
+            if name in self.lazy_commands and name not in self.commands:
+                rows.append((name, click.utils.make_default_short_help(_read_help(self.lazy_commands[name]), limit)))
+            else:
+                rows.append((name, self.commands[name].get_short_help_str(limit)))
+
+        with formatter.section("Commands"):
+            formatter.write_dl(rows)
+
+
+class CustomHelp(LazyGroup):
     """
     Overwrites the default Click Help formatter to inject the ASCII art logo
     at the top of the help message.
+
+    Commands supported by the daemon are forwarded to it when it runs.
     """
     def get_help(self, ctx):
         return f"{ascii_logo}\n{super().get_help(ctx)}"
 
+    def main(self, args=None, *main_args, **kwargs):
+        if args is None:
+            args = sys.argv[1:]
 
-@click.group(cls=CustomHelp, context_settings={"max_content_width": 120})
+        if should_forward(list(args)):
+            code = forward(list(args))
+
+            if code is not None:
+                sys.exit(code)
+
+        return super().main(args, *main_args, **kwargs)
+
+
+# --- Command Registration ---
+
+# fmt: off
+LAZY_COMMANDS = {
+    # From new.py: Handles project creation
+    "new": ".commands.new.cmd_new",
+
+    # From build.py: Handles build, packaging, and lifecycle management
+    "build": ".commands.build.cmd_build",
+    "release": ".commands.build.cmd_release",
+    "fetch-prefabs": ".commands.build.cmd_fetch_prefabs",
+    "start": ".commands.build.cmd_start_local",
+    "shut-down": ".commands.build.cmd_shut_down",
+    "install": ".commands.build.cmd_install",
+    "infos": ".commands.build.cmd_infos",
+    "watch": ".commands.build.cmd_watch",
+
+    # From server.py: Handles dedicated server instances
+    "server": ".commands.server.cmd_server",
+
+    # From logs.py: Handles the analysis of the game output logs
+    "logs": ".commands.logs.cmd_logs",
+
+    # From prefabs.py: Handles the search of the prefab library
+    "prefabs": ".commands.prefabs.cmd_prefabs",
+
+    # From save.py: Handles save snapshots
+    "save": ".commands.save.cmd_save",
+
+    # From daemon.py: Handles the background process keeping caches warm
+    "daemon": ".commands.daemon.cmd_daemon",
+}
+# fmt: on
+
+
+@click.group(cls=CustomHelp, lazy_commands=LAZY_COMMANDS, context_settings={"max_content_width": 120})
 def cli():
     """
     7D2D Utils: A set of automated commands to manage 7 Days to Die modding projects.
@@ -42,20 +142,5 @@ def cli():
     pass
 
 
-# --- Command Registration ---
-
-# From new.py: Handles project creation
-cli.add_command(cmd_new)
-
-# From build.py: Handles build, packaging, and lifecycle management
-cli.add_command(cmd_build)
-cli.add_command(cmd_release)
-cli.add_command(cmd_fetch_prefabs)
-cli.add_command(cmd_start_local)
-cli.add_command(cmd_shut_down)
-cli.add_command(cmd_install)
-cli.add_command(cmd_infos)
-
-
 if __name__ == "__main__":
-    cli()
\ No newline at end of file
+    cli()
@@ -0,0 +1,146 @@
+"""
+Thin client of the sdutils daemon.
+
+This module is the entry point of the `sdutils` script. When a daemon runs, the
+commands it supports are forwarded to it before any heavy module, such as click,
+is imported. Otherwise, or when `NO_DAEMON_ENV` is set, the CLI runs in-process.
+"""
+from __future__ import annotations
+
+import socket
+import json
+import sys
+import os
+
+
+# File publishing the address, access token and pid of the running daemon, in `config.USER_CACHE_DIR`.
+# Neither `config` nor `pathlib` are imported, as this module is on the path of every command.
+DAEMON_INFO_PATH = os.path.join(os.environ["appdata"], "sdutils-cache", "daemon.json")
+
+# Environment variable disabling the forwarding of commands to the daemon
+NO_DAEMON_ENV = "SDUTILS_NO_DAEMON"
+
+# Commands forwarded to the daemon when it runs
+DAEMON_COMMANDS = {"build", "release", "install", "start", "fetch-prefabs", "infos"}
+
+
+def _send(connection: socket.socket, message: dict) -> None:
+    connection.sendall((json.dumps(message) + "\n").encode())
+
+
+def _read_message(reader) -> dict | None:
+    line = reader.readline()
+    return json.loads(line) if line else None
+
+
+def _connect() -> tuple | None:
+    """
+    Connects to the running daemon.
+
+    Returns:
+        The connected socket and the access token, or None if no daemon is running.
+    """
+    try:
+        with open(DAEMON_INFO_PATH, "rb") as reader:
+            infos: dict = json.load(reader)
+
+    except (OSError, ValueError):
+        return None
+
+    try:
+        if "unix" in infos:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+            try:
+                connection.connect(infos["unix"])
+            except OSError:
+                connection.close()
+                raise
+        else:
+            connection = socket.create_connection(tuple(infos["tcp"]))
+
+    except OSError:
+        return None
+
+    return connection, infos["token"]
+
+
+def request(op: str, **fields) -> int | None:
+    """
+    Sends a request to the running daemon, printing the outputs it streams back.
+
+    Returns:
+        The exit code sent by the daemon, or None if no daemon is running or if it
+        can't run the request.
+    """
+    connected = _connect()
+
+    if connected is None:
+        return None
+
+    connection, token = connected
+
+    with connection, connection.makefile("r", encoding="utf-8") as reader:
+
+        _send(connection, {"token": token, "op": op, **fields})
+
+        while True:
+
+            message = _read_message(reader)
+
+            if message is None:
+                print("WRN: connection to the daemon lost", file=sys.stderr)
+                return 1
+
+            if "out" in message:
+                sys.stdout.write(message["out"])
+                sys.stdout.flush()
+
+            if "err" in message:
+                sys.stderr.write(message["err"])
+                sys.stderr.flush()
+
+            if "fallback" in message:
+                print(f"WRN: {message['fallback']}, running in-process", file=sys.stderr)
+                return None
+
+            if "exit" in message:
+                return message["exit"]
+
+
+def forward(argv: list[str]) -> int | None:
+    """
+    Runs a command line through the daemon, from the current working directory and
+    with the environment variables of this process.
+
+    Returns:
+        The exit code of the command, or None if it must run in-process.
+    """
+    return request("run", cwd=os.getcwd(), argv=argv, env=dict(os.environ))
+
+
+def should_forward(argv: list[str]) -> bool:
+    """
+    Tells if a command line is run by the daemon, when one is running.
+    """
+    return bool(argv) and argv[0] in DAEMON_COMMANDS and not os.environ.get(NO_DAEMON_ENV)
+
+
+def main() -> None:
+    """
+    Entry point of the `sdutils` script.
+    """
+    argv = sys.argv[1:]
+
+    if should_forward(argv):
+        code = forward(argv)
+
+        if code is not None:
+            sys.exit(code)
+
+    # already tried above
+    os.environ[NO_DAEMON_ENV] = "1"
+
+    from .cli import cli
+
+    cli()
@@ -1,29 +1,79 @@
 from __future__ import annotations
 
-from zipfile import ZipFile
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterable, List, Tuple
 import subprocess
 import shutil
 import time
 import hashlib
 import json
-import glob
+import sys
 import os
 
 import click
 
-from .. import utils
+from .. import artifacts, catalogue, config, copying, dotnet, git, includes, install, patches, prefabs, server
 from ..config import USER_CONFIG
-
-
-def _return_code(command: str, quiet: bool = False) -> int:
+from ..archive import ArchiveWriter
+from ..catalogue import PrefabQuery
+from ..compression import CompressionPolicy
+from ..dependencies import DependencyGraph
+from ..manifest import BuildManifest, SyncReport
+from ..pipeline import Pipeline
+from ..profiling import Span, current_span, profile_option, span, traced
+from ..saves import SaveStore, save_dir
+from ..trash import Trash
+
+
+def _return_code(command: str | List[str], quiet: bool = False) -> int:
     """
     Executes a system command and returns the exit status code.
+
+    When the standard output is not a real file, as when running in the daemon,
+    the command output is captured and printed through it.
     """
+    try:
+        sys.stdout.fileno()
+    except (AttributeError, OSError, ValueError):
+        result = subprocess.run(command, capture_output=True, text=True)
+
+        if not quiet:
+            print(result.stdout, end="")
+            print(result.stderr, end="", file=sys.stderr)
+
+        return result.returncode
+
     return subprocess.run(command, capture_output=quiet).returncode
 
 
+# Parsed 'sdutils.json' files, by project folder
+_build_infos: Dict[Path, dict] = dict()
+
+
+def invalidate_caches(changes: Iterable[Path] = None) -> None:
+    """
+    Invalidates everything memoized about the changed paths: parsed 'sdutils.json' files,
+    include resolutions, prefab indexes, C# projects and Git states, or all of it.
+    """
+    paths = [None] if changes is None else [Path(path) for path in changes]
+
+    for path in paths:
+
+        if path is None:
+            _build_infos.clear()
+        else:
+            _build_infos.pop(path.parent, None)
+            _build_infos.pop(path, None)
+
+        if path is None or path == config.USER_CONFIG_PATH:
+            config.reload_user_config()
+
+        includes.invalidate(path)
+        prefabs.invalidate(path)
+        dotnet.invalidate(path)
+        git.invalidate(path)
+
+
 class SaveCleaningData:
     """
     Data structure holding parameters for world/save data cleanup.
@@ -34,6 +84,17 @@ class SaveCleaningData:
         self.hard = hard
 
 
+class SaveRestoringData:
+    """
+    Data structure holding parameters for a save restored from a snapshot.
+    """
+    def __init__(self, world: str, save: str, snapshot: str = None, link: bool = False):
+        self.world = world
+        self.save = save
+        self.snapshot = snapshot
+        self.link = link
+
+
 class ModBuilder:
     """
     Main orchestrator for 7D2D mod development workflows.
@@ -56,6 +117,7 @@ class ModBuilder:
 
         dependencies = build_infos.get("dependencies", list())
         include = build_infos.get("include", list())
+        exclude = build_infos.get("exclude", list())
         csproj = build_infos.get("csproj")
 
         # fmt: off
@@ -63,24 +125,34 @@ class ModBuilder:
         self.build_infos = build_infos
         self.mod_name = build_infos["name"]
         self.game_path = Path(build_infos.get("game_path") or USER_CONFIG.PATH_7D2D)
+        self.server_infos = build_infos.get("server") or dict()
         self.mod_path = Path(self.game_path, "Mods", self.mod_name)
         self.prefabs = build_infos.get("prefabs")
 
         self.include = [path for path in include]
+        self.exclude = [path for path in exclude]
         self.dependencies = [Path(root, path).resolve() for path in dependencies]
 
         self.zip_archive = Path(root, f"{self.mod_name}.zip").resolve()
         self.build_dir = Path(root, "build").resolve()
         self.save_cleaning_datas = [SaveCleaningData(**data) for data in self.build_infos.get("clear_saves", list())]
-        self.commit_hash = utils.get_commit_hash(self.root_dir)
+        self.save_restoring_datas = [SaveRestoringData(**data) for data in self.build_infos.get("restore_saves", list())]
+        self.compression = CompressionPolicy(build_infos.get("compression"))
+        self.git = git.get_repository(self.root_dir)
+        self.commit_hash = self.git.commit_hash
         # fmt: on
 
         self.csproj = None
         self.build_cmd = None
+        self.trash = None
+        self.server_path = None
+
+        if build_infos.get("dedi_path") or USER_CONFIG.PATH_7D2D_SERVER:
+            self.server_path = Path(build_infos.get("dedi_path") or USER_CONFIG.PATH_7D2D_SERVER)
 
         if csproj is not None:
             self.csproj = Path(self.root_dir, csproj).resolve()
-            self.build_cmd = f'dotnet build --no-incremental "{self.csproj}"'
+            self.build_cmd = dotnet.build_command(self.csproj, USER_CONFIG.DOTNET_BUILD_SERVER)
 
     def _read_build_infos(self, dir: Path) -> dict:
         """
@@ -89,6 +161,11 @@ class ModBuilder:
         Raises:
             SystemExit: If the configuration file is missing.
         """
+        key = Path(dir).resolve()
+
+        if key in _build_infos:
+            return _build_infos[key]
+
         build_infos = Path(dir, "sdutils.json")
 
         if not build_infos.exists():
@@ -97,122 +174,298 @@ class ModBuilder:
         with open(Path(dir, build_infos), "rb") as reader:
             datas: dict = json.load(reader)
 
+        _build_infos[key] = datas
         return datas
 
-    def _include_file(self, path: Path, move: bool = False):
+    def _resolve_includes(self) -> Dict[str, Path]:
         """
-        Copies or moves a single file to the build directory.
+        Resolves the 'include' list into the files to place in the build directory.
+
+        Returns:
+            A mapping of POSIX paths relative to the build directory to source files.
+            Directories are flattened to their files, under their own name.
         """
-        dst = Path(self.build_dir, path.relative_to(self.root_dir))
+        return includes.get_resolver(self.root_dir, self.include, self.exclude).resolve()
 
-        if not dst.parent.exists():
-            os.makedirs(dst.parent)
+    @traced("resolve prefabs")
+    def _resolve_prefabs(self) -> Dict[str, Path]:
+        """
+        Resolves the 'prefabs' list into the files to place in the 'Prefabs' folder,
+        through the persistent index of the prefab library. Saved queries, the object
+        entries of the list, are resolved through the prefab catalogue.
 
-        if move is True:
-            shutil.move(path, dst)
-        else:
-            shutil.copy(path, dst)
+        Returns:
+            A mapping of POSIX paths relative to the build directory to source files.
+        """
+        entries = dict()
+
+        if not self.prefabs:
+            return entries
+
+        index = prefabs.get_index(Path(USER_CONFIG.PATH_PREFABS))
+
+        for element in self.prefabs:
 
-    def _include_dir(self, dir_path: Path):
+            if isinstance(element, dict):
+                matches = catalogue.get_catalogue(index.root).files(PrefabQuery.from_dict(element))
+                element = json.dumps(element)
+            else:
+                matches = index.match(element)
+
+            if not matches:
+                print(f"WRN: no prefab found for '{element}'")
+
+            for name, file in matches.items():
+                entries[f"Prefabs/{name}"] = Path(index.root, file)
+
+        return entries
+
+    @traced("resolve includes")
+    def _resolve_entries(self) -> Dict[str, Path]:
         """
-        Recursively copies a directory to the build directory.
+        Resolves every file making the build directory, includes and fetched prefabs.
+
+        As with a full build, fetched prefabs replace the included 'Prefabs' folder.
         """
-        dst = Path(self.build_dir, dir_path.name)
-        shutil.copytree(dir_path, dst)
+        entries = self._resolve_includes()
 
-    def _include_glob(self, include: str, move: bool = False):
+        if self.prefabs:
+            entries = {k: v for k, v in entries.items() if not k.startswith("Prefabs/")}
+            entries.update(self._resolve_prefabs())
+
+        return entries
+
+    def _remove_build_file(self, name: str):
         """
-        Resolves a glob pattern and includes matching files or directories
-        into the build folder.
+        Deletes a file of the build directory, then prunes its empty parent folders.
         """
-        for element in glob.glob(include, recursive=True, root_dir=self.root_dir):
+        path = Path(self.build_dir, name)
+        path.unlink(missing_ok=True)
 
-            path = Path(self.root_dir, element)
+        for parent in path.parents:
 
-            if not path.exists:
-                print(f"WARNING path not found: '{path}'")
+            if parent == self.build_dir or not parent.is_relative_to(self.build_dir):
+                break
 
-            if path.is_dir():
-                self._include_dir(path)
-            else:
-                self._include_file(path, move)
+            try:
+                parent.rmdir()
+            except OSError:
+                break
 
-    def _add_includes(self):
+    @traced("stage")
+    def _sync_build_dir(self) -> SyncReport:
         """
-        Processes the 'include' list from configuration to populate the build directory.
+        Brings the build directory up to date with the sources, using the build manifest.
+
+        Only new or modified files are copied, and files which are no longer part
+        of the include set are deleted. Files not tracked by the manifest, such as
+        the compiled DLL, are left untouched.
         """
-        for include in self.include:
-            self._include_glob(include)
+        manifest = BuildManifest.load(self.build_dir)
+        entries = self._resolve_entries()
+        report = SyncReport()
+        to_copy = dict()
+
+        for name, src in entries.items():
+
+            stat = src.stat()
+
+            if manifest.is_up_to_date(name, src, stat):
+                report.skipped += 1
+                continue
+
+            to_copy[name] = (src, stat)
+
+        report.bytes = copying.copy_files(
+            [(src, Path(self.build_dir, name)) for name, (src, _) in to_copy.items()], preserve_mtime=False
+        )
+        report.copied = len(to_copy)
+
+        for name, (src, stat) in to_copy.items():
+            manifest.record(name, src, stat)
+
+        for name in manifest.entries.keys() - entries.keys():
+            self._remove_build_file(name)
+            del manifest.entries[name]
+            report.removed += 1
+
+        manifest.save()
+        current_span().files = report.copied
+        current_span().bytes = report.bytes
 
-    def _clear_save(self, cleaning_datas: SaveCleaningData):
+        return report
+
+    def _compiler_outputs(self, entries: Dict[str, Path]) -> Dict[str, Path]:
+        """
+        Lists the files written into the build directory by the C# compiler: the
+        output assembly, and its debug symbols and dependency file next to it.
+
+        Outputs shadowed by an entry resolved from the sources are left out, as are
+        those written outside of the build directory.
+        """
+        if self.build_cmd is None:
+            return dict()
+
+        project = dotnet.get_project(self.csproj, {"PATH_7D2D": str(self.game_path)})
+        assembly = project.output_assembly()
+        build_dir = self.build_dir.resolve()
+        outputs = dict()
+
+        for path in (assembly, assembly.with_suffix(".pdb"), assembly.with_suffix(".deps.json")):
+
+            if not path.is_file() or not path.is_relative_to(build_dir):
+                continue
+
+            name = path.relative_to(build_dir).as_posix()
+
+            if name not in entries:
+                outputs[name] = path
+
+        return outputs
+
+    @traced("archive")
+    def _write_archive(self, entries: Dict[str, Path]):
+        """
+        Streams the given entries and the version file into the mod archive, each
+        compressed with its method of the 'compression' policy, on several threads.
+        """
+        with ArchiveWriter(self.zip_archive) as archive:
+
+            archive.add_bytes("version.txt", self.commit_hash.__str__().encode())
+            archive.add_files((name, src, self.compression.method(name)) for name, src in sorted(entries.items()))
+
+        current_span().files = archive.files_count
+        current_span().bytes = archive.bytes_count
+
+        print(f"compress '{self.mod_name}': {archive.report}")
+
+    def _clear_save(self, cleaning_datas: SaveCleaningData, trash: Trash):
         """
         Clears specific save data (Regions, Meshes, etc.) to ensure a fresh
-        environment for testing. Performs a full directory delete if 'hard' is True.
+        environment for testing. Discards the full directory if 'hard' is True.
         """
         world_name = cleaning_datas.world
         save_name = cleaning_datas.save
 
         save_dir = Path(USER_CONFIG.PATH_7D2D_USER, f"Saves/{world_name}/{save_name}")
 
-        shutil.rmtree(Path(save_dir, "Region"), ignore_errors=True)
-        shutil.rmtree(Path(save_dir, "DynamicMeshes"), ignore_errors=True)
-        shutil.rmtree(Path(save_dir, "decoration.7dt"), ignore_errors=True)
-
         if cleaning_datas.hard:
-            shutil.rmtree(save_dir, ignore_errors=True)
+            trash.discard(save_dir)
+            return
+
+        trash.discard(Path(save_dir, "Region"))
+        trash.discard(Path(save_dir, "DynamicMeshes"))
+        trash.discard(Path(save_dir, "decoration.7dt"))
 
+    @traced("clear saves")
     def _clear_saves(self):
         """
         Iterates through all configured save cleaning tasks.
+
+        Cleared data is moved to a trash folder right away, then deleted concurrently
+        in the background. Use `wait_saves_cleared` once done with everything else.
         """
+        if not self.save_cleaning_datas:
+            return
+
+        if self.trash is None:
+            self.trash = Trash(Path(USER_CONFIG.PATH_7D2D_USER))
+
         for world_clear_data in self.save_cleaning_datas:
-            self._clear_save(world_clear_data)
+            self._clear_save(world_clear_data, self.trash)
 
-    def _compile_csproj(self, quiet: bool = False) -> bool:
+        current_span().files = self.trash.report.discarded
+
+    @traced("restore saves")
+    def _restore_saves(self):
         """
-        Triggers dotnet build for the C# project if defined in config.
+        Restores the configured saves from their snapshots, writing only the files which
+        changed since. Removed files go through the same trash as the cleared saves.
         """
-        if self.build_cmd is None:
-            return True
+        if not self.save_restoring_datas:
+            return
+
+        if self.trash is None:
+            self.trash = Trash(Path(USER_CONFIG.PATH_7D2D_USER))
+
+        store = SaveStore()
+        written = 0
+
+        for restoring_datas in self.save_restoring_datas:
+            snapshot = store.get(restoring_datas.world, restoring_datas.save, restoring_datas.snapshot)
+            dst_dir = save_dir(USER_CONFIG.PATH_7D2D_USER, restoring_datas.world, restoring_datas.save)
 
-        return _return_code(self.build_cmd, quiet) == 0
+            report = store.restore(snapshot, dst_dir, self.trash, restoring_datas.link)
+            written += report.written + report.linked
 
-    def _build_dependencies(self) -> List[ModBuilder]:
+            print(f"restore save '{snapshot.world}/{snapshot.save}/{snapshot.name}': {report}")
+
+        current_span().files = written
+
+    def wait_saves_cleared(self):
         """
-        Recursively triggers the build process for all listed mod dependencies.
+        Waits for the background deletion of the cleared saves, then prints what it freed.
         """
-        zip_archives = []
+        if self.trash is None:
+            return
 
-        for dep in self.dependencies:
+        report = self.trash.wait()
+        self.trash = None
 
-            build_infos = Path(dep, "sdutils.json")
+        print(f"clear saves '{self.mod_name}': {report}")
 
-            if not build_infos.exists():
-                raise SystemExit(f"Can't find '{build_infos}'")
+    @traced("compile")
+    def _compile_csproj(self, quiet: bool = False) -> bool:
+        """
+        Triggers dotnet build for the C# project if defined in config.
 
-            builder = ModBuilder(dep)
+        The compilation is skipped when the project file, its sources and the
+        referenced game assemblies are unchanged since the last successful one,
+        and its output DLL is still present.
+        """
+        if self.build_cmd is None:
+            return True
 
-            print(
-                f"build {builder.commit_hash[:8]} '{builder.mod_name}' {self._pending_modifications_count(builder.root_dir)}"
-            )
+        project = dotnet.get_project(self.csproj, {"PATH_7D2D": str(self.game_path)})
+        cache = dotnet.CompileCache(project)
+        fingerprint = project.fingerprint()
 
-            builder.build(quiet=True)
+        if cache.is_up_to_date(fingerprint):
+            print(f"compile '{self.mod_name}': up to date")
+            return True
 
-            zip_archives.append(builder)
+        cache.clear()
 
-        return zip_archives
+        if _return_code(self.build_cmd, quiet) != 0:
+            return False
 
-    def _pending_modifications_count(self, repo_path: Path) -> int:
+        cache.save(fingerprint)
+        return True
+
+    def _build_dependency(self, builder: ModBuilder, parent: Span = None):
         """
-        Returns the number of uncommitted changes (staged and unstaged) in the repository.
+        Builds a single dependency quietly, printing its version and pending changes.
         """
-        result = subprocess.check_output(
-            "git diff --name-status --staged && git diff --name-status",
-            cwd=repo_path,
-            shell=True,
+        print(
+            f"build {builder.commit_hash.__str__()[:8]} '{builder.mod_name}' {self._pending_modifications_count(builder.root_dir)}"
         )
 
-        return len(result.decode().split("\n")) - 1
+        with span(f"dependency {builder.mod_name}", parent):
+            builder.build(quiet=True, validate=False)
+
+    def _build_dependencies(self, jobs: int = 1) -> List[ModBuilder]:
+        """
+        Builds every transitive mod dependency once, in topological order,
+        running independent ones concurrently on `jobs` workers.
+        """
+        with span("dependencies") as parent:
+            return DependencyGraph(self).run(lambda builder: self._build_dependency(builder, parent), jobs)
+
+    def _pending_modifications_count(self, repo_path: Path) -> int:
+        """
+        Returns the number of uncommitted changes (staged and unstaged) in the repository.
+        """
+        return git.get_repository(repo_path).pending_modifications
 
     def _write_version_file(self):
         """
@@ -232,64 +485,256 @@ class ModBuilder:
 
         return hashlib.sha256("".join(hashes).encode()).hexdigest()
 
-    def build(self, clean: bool = False, quiet: bool = False):
+    def _patch_files(self) -> Dict[str, Path]:
+        """
+        Lists the XML patches of the mod, by path relative to its 'Config' folder.
+        """
+        return {
+            name[len("Config/"):]: src for name, src in self._resolve_includes().items()
+            if name.startswith("Config/") and name.endswith(".xml")
+        }
+
+    @traced("validate patches")
+    def _validate_patches(self, strict: bool = False, preview: Path = None):
+        """
+        Checks the XPath patches of the mod against the vanilla game configuration,
+        after the ones of its dependencies, in load order. See `patches.validate`.
+
+        Args:
+            strict: Fails if a patch command can't be applied.
+            preview: Folder receiving the merged configuration files, if set.
+
+        Raises:
+            SystemExit: In strict mode, if a patch command can't be applied.
+        """
+        config_dir = Path(self.game_path, "Data", "Config")
+
+        try:
+            dependencies = DependencyGraph(self).dependencies
+        except SystemExit as e:
+            print(f"WRN: patches of the dependencies not applied: {e}")
+            dependencies = list()
+
+        mods = [(builder.mod_name, builder._patch_files()) for builder in dependencies]
+        mods.append((self.mod_name, self._patch_files()))
+
+        if not any(files for _, files in mods):
+            return
+
+        if not config_dir.is_dir():
+            print(f"WRN: vanilla config not found at '{config_dir}', patches not validated")
+            return
+
+        report = patches.validate(config_dir, mods, str(self.root_dir), preview)
+
+        for issue in report.issues:
+            print(f"WRN: {issue}")
+
+        print(f"validate '{self.mod_name}': {report}")
+        current_span().files = report.files
+
+        if strict and report.issues:
+            raise SystemExit(f"invalid patches: {self.mod_name}")
+
+    def _artifact_key(self, entries: Dict[str, Path]) -> str:
+        """
+        Key of the mod archive in the artifact cache, from the commit hash and working tree
+        fingerprint, the name, size and mtime of every archived file, and the inputs of the
+        C# compilation.
+        """
+        toolchain = None
+
+        if self.build_cmd is not None:
+            project = dotnet.get_project(self.csproj, {"PATH_7D2D": str(self.game_path)})
+            toolchain = [project.fingerprint(), self.build_cmd]
+
+        return artifacts.make_key(
+            kind="mod",
+            name=self.mod_name,
+            tree=self.git.fingerprint(),
+            files=artifacts.fingerprint_files(entries),
+            toolchain=toolchain,
+            compression=self.build_infos.get("compression"),
+        )
+
+    def build(
+        self,
+        clean: bool = False,
+        quiet: bool = False,
+        full: bool = False,
+        stage: bool = False,
+        validate: bool = True,
+        preview: Path = None,
+    ):
         """
         Core build pipeline: compiles code, collects assets, and generates
          a redistributable ZIP archive.
+
+        Archive members are streamed straight from their sources. The 'build'
+        staging directory is only populated when `stage` is set, incrementally
+        from its manifest. A full build wipes the build directory beforehand.
+        Unless `validate` is unset, the XPath patches are then checked against
+        the vanilla configuration, and merged into `preview` if set.
+
+        Archives are stored in the artifact cache: unless staging or building
+        from scratch, an archive built from the same inputs is fetched from it.
         """
-        if self.zip_archive.exists():
-            os.remove(self.zip_archive)
+        with span(f"build {self.mod_name}"):
 
-        if self.build_dir.exists():
-            shutil.rmtree(self.build_dir)
+            if self.zip_archive.exists():
+                os.remove(self.zip_archive)
 
-        os.makedirs(self.build_dir)
+            if full and self.build_dir.exists():
+                shutil.rmtree(self.build_dir)
 
-        if not self._compile_csproj(quiet):
-            raise SystemExit(f"build failed: {self.mod_name}")
+            entries = self._resolve_entries()
+            key = self._artifact_key(entries)
+            cache = artifacts.get_cache()
 
-        self._add_includes()
-        self._write_version_file()
-        self.fetch_prefabs(self.build_dir)
+            if not (stage or full) and cache.fetch(key, self.zip_archive):
+                print(f"build '{self.mod_name}': cached")
 
-        shutil.make_archive(
-            base_name=Path(self.root_dir, self.mod_name),
-            format="zip",
-            root_dir=self.build_dir,
-        )
+            else:
+                if not self._compile_csproj(quiet):
+                    raise SystemExit(f"build failed: {self.mod_name}")
+
+                if stage:
+                    print(f"sync '{self.mod_name}': {self._sync_build_dir()}")
+                    self._write_version_file()
+
+                entries.update(self._compiler_outputs(entries))
+
+                self._write_archive(entries)
+                cache.put(key, self.zip_archive)
+
+            if validate:
+                self._validate_patches(preview=preview)
 
-        if clean:
-            shutil.rmtree(self.build_dir)
+            if clean:
+                shutil.rmtree(self.build_dir, ignore_errors=True)
 
-    def _install(self, path: Path):
+    @traced("install")
+    def _install(self, path: Path, link: bool = False):
         """
-        Unpacks the built mod ZIP into a target destination directory.
+        Installs the built mod into a target destination directory.
+
+        By default, only the archive members which changed since the last install
+        are extracted, and stale files are removed. In link mode, the destination
+        points to the staged build directory instead, see `build(stage=True)`.
         """
-        if path.exists():
-            shutil.rmtree(path)
+        if link:
+            report = install.link_tree(self.build_dir, path)
+        else:
+            report = install.sync_archive(self.zip_archive, path)
 
-        with ZipFile(self.zip_archive, "r") as zip_file:
-            zip_file.extractall(path)
+        current_span().files = report.written
+        current_span().bytes = report.bytes
 
-    def install_local(self):
+        print(f"install '{self.mod_name}': {report}")
+
+    def install_local(self, link: bool = False):
         """
         Installs the mod into the local game 'Mods' folder.
         """
-        self._install(self.mod_path)
+        self._install(self.mod_path, link)
 
-    def install_server(self):
+    def install_server(self, link: bool = False):
         """
         Installs the mod into the dedicated server 'Mods' folder.
         """
-        if USER_CONFIG.PATH_7D2D_SERVER is None:
+        if self.server_path is None:
             raise ValueError("PATH_7D2D_SERVER is not defined.")
 
-        path = Path(USER_CONFIG.PATH_7D2D_SERVER, "Mods", self.mod_name)
-        self._install(path)
+        path = Path(self.server_path, "Mods", self.mod_name)
+        self._install(path, link)
+
+    def _watch_roots(self) -> List[Tuple[Path, bool]]:
+        """
+        Lists the directories watched by `watch`: the project tree, the folders of the
+        C# project and of the projects it references when outside of it, the folders of
+        its imported files, and the folders holding the configured prefabs.
+        """
+        roots = [(self.root_dir, True)]
+
+        if self.csproj is not None:
+            project = dotnet.get_project(self.csproj, {"PATH_7D2D": str(self.game_path)})
+
+            for csproj in [self.csproj, *project.project_references()]:
+                if not csproj.is_relative_to(self.root_dir):
+                    roots.append((csproj.parent, True))
+
+            roots.extend((path.parent, False) for path in project.imports() if not path.is_relative_to(self.root_dir))
+
+        if self.prefabs:
+            roots.append((Path(USER_CONFIG.PATH_PREFABS), False))
+            prefab_dirs = {src.parent for src in self._resolve_prefabs().values()}
+            roots.extend((path, False) for path in sorted(prefab_dirs))
+
+        return roots
+
+    def _hot_reload(self, compile: bool, link: bool) -> str:
+        """
+        Runs one watch cycle: optional compile, incremental staging, then install.
+
+        Returns:
+            A short summary of what was done.
+        """
+        if compile and not self._compile_csproj(quiet=True):
+            return "compile failed"
+
+        summary = f"sync: {self._sync_build_dir()}"
+
+        if not link:
+            report = install.sync_tree(self.build_dir, self.mod_path)
+            summary += f" | install: {report}"
+
+        return summary
+
+    def watch(self, link: bool = False, debounce: float = 0.2, poll: bool = False):
+        """
+        Watches the project sources and prefabs, hot rebuilding and reinstalling on change.
+
+        XML, asset and prefab changes go through the incremental staging and install,
+        only changes of '.cs', '.csproj' and MSBuild '.props' and '.targets' files trigger a new
+        compilation.
+        In link mode, the installed mod is the staged build directory itself.
+        """
+        self.build(quiet=True, stage=True)
+
+        if link:
+            self.install_local(link)
+        else:
+            report = install.sync_tree(self.build_dir, self.mod_path)
+            print(f"install '{self.mod_name}': {report}")
+
+        # imported here, as the watchers load ctypes which is only needed by this command
+        from ..watch import create_watcher
+
+        watcher = create_watcher(self._watch_roots(), poll)
+        print(f"watching '{self.mod_name}' with {type(watcher).__name__}, press Ctrl+C to stop")
+
+        try:
+            while True:
 
-    def start_local(self):
+                changes = watcher.wait(debounce)
+                start = time.time()
+                invalidate_caches(changes)
+
+                compile = any(path.suffix in (".cs", ".csproj", ".props", ".targets") for path in changes)
+                summary = self._hot_reload(compile, link)
+
+                print(f"[{time.strftime('%H:%M:%S')}] {len(changes)} change(s), {summary} in {(time.time() - start) * 1000:.0f}ms")
+
+        except KeyboardInterrupt:
+            pass
+
+        finally:
+            watcher.close()
+
+    @traced("launch")
+    def _launch_local(self):
         """
-        Launches the local game client (without EAC) and cleans up saves.
+        Launches the local game client (without EAC), without waiting for it.
         """
         subprocess.Popen(
             cwd=self.game_path,
@@ -297,25 +742,119 @@ class ModBuilder:
             args=["--noeac"],
         )
 
-        self._clear_saves()
+    def run_start(self, server: bool = False):
+        """
+        Closes the running game, builds and installs the mod, then launches the game, and
+        the dedicated server with `server`, as a task graph printing its critical path.
 
-    def start_server(self):
+        The game is closed and the saves are cleared while the mod compiles, the client
+        and server installs run concurrently, and each one launches as soon as installed.
+        Saves are only moved to the trash before the launch, so that the game never sees
+        them, their deletion runs in the background, see `wait_saves_cleared`.
+        """
+        pipeline = Pipeline("start")
+        pipeline.add("shut down", self.shut_down)
+        pipeline.add("build", self.build)
+        pipeline.add("clear saves", self._clear_saves, after=["shut down"])
+        pipeline.add("restore saves", self._restore_saves, after=["clear saves"])
+        pipeline.add("install", self.install_local, after=["shut down", "build"])
+        pipeline.add("start", self._launch_local, after=["install", "restore saves"])
+
+        if server:
+            pipeline.add("install server", self.install_server, after=["shut down", "build"])
+            pipeline.add("start server", lambda: self.start_server(wait=False), after=["install server"])
+
+        try:
+            pipeline.run()
+        finally:
+            self.wait_saves_cleared()
+
+        print(pipeline.summary())
+
+    def run_install(self, link: bool = False):
         """
-        Launches the local dedicated server instance.
+        Closes the running game while the mod builds, then installs it, see `install_local`.
         """
-        server_directory = USER_CONFIG.PATH_7D2D_SERVER
+        pipeline = Pipeline("install")
+        pipeline.add("shut down", self.shut_down)
+        pipeline.add("build", lambda: self.build(stage=link))
+        pipeline.add("install", lambda: self.install_local(link), after=["shut down", "build"])
+        pipeline.run()
+
+        print(pipeline.summary())
+
+    def start_server(
+        self,
+        instances: int = 1,
+        port: int = None,
+        timeout: float = 300,
+        follow: bool = False,
+        verbose: bool = False,
+        wait: bool = True,
+    ) -> List[server.ServerStart]:
+        """
+        Launches local dedicated server instances, then follows their logs until they are
+        ready, recording their time-to-ready. See `server.ServerSupervisor`.
+
+        The readiness and fatal error log patterns can be overridden by the 'ready' and
+        'fatal' lists of the 'server' object of 'sdutils.json'.
+
+        Args:
+            instances: Number of instances, each with its own ports and user data folder.
+            port: 'ServerPort' of the first instance, the one of the server configuration by default.
+            timeout: Time given to the instances to get ready, in seconds.
+            follow: Keeps printing the logs once the instances are ready, until they exit.
+            verbose: Prints the logs while the instances start.
+            wait: Follows the logs until the instances are ready, otherwise returns once launched.
 
-        if server_directory is None:
+        Raises:
+            SystemExit: If an instance failed to get ready.
+        """
+        if self.server_path is None:
             raise ValueError("PATH_7D2D_SERVER is not defined.")
 
-        subprocess.Popen(
-            cwd=server_directory,
-            executable=Path(server_directory, "startdedicated.bat"),
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            args=[],
+        def on_line(instance: server.ServerInstance, line: str):
+            if verbose or follow and instance.start.status == "ready":
+                print(f"[{instance.name}] {line}" if instances > 1 else line)
+
+        supervisor = server.ServerSupervisor(
+            self.server_path,
+            ready=self.server_infos.get("ready") or server.READY_PATTERNS,
+            fatal=self.server_infos.get("fatal") or server.FATAL_PATTERNS,
+            on_line=on_line,
         )
 
+        if not wait:
+            for instance in supervisor.launch(instances, port):
+                print(f"server {instance.name} (port {instance.port}): launched, log in '{instance.log_path}'")
+
+            return [instance.start for instance in supervisor.instances]
+
+        with span("server start") as server_span:
+            supervisor.launch(instances, port)
+            starts = supervisor.wait(timeout)
+            server_span.files = len(starts)
+
+        for start in starts:
+            start.mod = self.mod_name
+            start.commit = self.commit_hash.__str__()
+
+            for error in start.errors:
+                print(f"WRN: [{start.instance}] {error}")
+
+            print(f"server {start}")
+
+        server.record(starts)
+
+        if any(start.status != "ready" for start in starts):
+            supervisor.stop()
+            raise SystemExit(f"server failed: {self.mod_name}")
+
+        if follow:
+            supervisor.follow()
+
+        return starts
+
     def shut_down(self):
         """
         Forcefully closes any running game or server processes.
@@ -323,10 +862,12 @@ class ModBuilder:
         subprocess.run("taskkill /F /IM 7DaysToDie.exe", capture_output=True)
         subprocess.run("taskkill /F /IM 7DaysToDieServer.exe", capture_output=True)
 
+    @traced("fetch prefabs")
     def fetch_prefabs(self, root: Path = None):
         """
         Copies required prefab files from the game data folder to the project folder.
-        Uses glob matching based on the configuration list.
+        Prefabs are resolved through the prefab library index, and only the files
+        which changed since the last fetch are copied.
         """
         if not self.prefabs:
             return
@@ -334,69 +875,74 @@ class ModBuilder:
         if root is None:
             root = self.root_dir
 
-        dst_prefabs = Path(root, "Prefabs").resolve()
-
-        if dst_prefabs.exists():
-            shutil.rmtree(dst_prefabs)
-
-        for element in self.prefabs:
-
-            prefabs = glob.glob(f"{element}*", root_dir=USER_CONFIG.PATH_PREFABS)
-
-            if not prefabs:
-                print(f"WRN: no prefab found for '{element}'")
-
-            for path in prefabs:
-
-                src = Path(USER_CONFIG.PATH_PREFABS, path)
-                dst = Path(dst_prefabs, src.name)
-
-                if not dst.parent.exists():
-                    os.makedirs(dst.parent)
+        files = {name[len("Prefabs/"):]: src for name, src in self._resolve_prefabs().items()}
+        copied, unchanged, removed, copied_bytes = prefabs.sync_files(files, Path(root, "Prefabs").resolve())
 
-                if src.is_file():
-                    shutil.copyfile(src, dst)
+        current_span().files = copied
+        current_span().bytes = copied_bytes
 
-                else:
-                    shutil.copytree(src, dst, dirs_exist_ok=True)
+        print(f"fetch '{self.mod_name}': {copied} copied, {unchanged} unchanged, {removed} removed")
 
-    def release(self) -> Path:
+    def release(self, jobs: int = 1) -> Path:
         """
         Bundles the mod and all its dependencies into a single timestamped
         release archive with a combined version hash.
+
+        The members of each mod archive are copied as they are, still compressed,
+        only the combined version file of the main mod is written anew.
+
+        Release archives are stored in the artifact cache, keyed by the artifact keys
+        of the mod and its dependencies: when none changed, the release is fetched
+        from it without building anything.
+
+        Args:
+            jobs: Maximum number of dependencies built concurrently.
         """
         start = time.time()
-        self.build()
 
-        shutil.rmtree(self.build_dir, ignore_errors=True)
-        os.makedirs(self.build_dir)
+        with span("release key"):
+            builders = [*DependencyGraph(self).dependencies, self]
+            key = artifacts.make_key(
+                kind="release",
+                mods=[(builder.mod_name, builder._artifact_key(builder._resolve_entries())) for builder in builders],
+            )
 
-        dependencies = self._build_dependencies()
+        combined_hash = self._combine_commit_hashes(builders[:-1])
+        release_archive = Path(self.root_dir, f"{self.mod_name}-release-{combined_hash[:8]}.zip")
+        cache = artifacts.get_cache()
 
-        for builder in dependencies + [self]:
+        if cache.fetch(key, release_archive):
+            self._validate_patches(strict=True)
+            print(f"build {combined_hash[:8]} done in {time.time() - start:.1f}s (cached)")
+            return release_archive
 
-            dst = Path(self.build_dir, builder.zip_archive.stem)
+        self.build(validate=False)
+        self._validate_patches(strict=True)
 
-            with ZipFile(builder.zip_archive, "r") as zip_file:
-                zip_file.extractall(dst)
+        dependencies = self._build_dependencies(jobs)
 
-        with open(Path(self.build_dir, self.mod_name, "version.txt"), "w") as writer:
+        version = f"version={combined_hash}\n"
+        version += f"{self.mod_name}={self.commit_hash.__str__()}\n"
 
-            combined_hash = self._combine_commit_hashes(dependencies)
+        for dep in dependencies:
+            version += f"{dep.mod_name}={dep.commit_hash.__str__()}\n"
 
-            writer.write(f"version={combined_hash}\n")
-            writer.write(f"{self.mod_name}={self.commit_hash.__str__()}\n")
+        with span("release archive") as release_span, ArchiveWriter(release_archive) as archive:
 
-            for dep in dependencies:
-                writer.write(f"{dep.mod_name}={dep.commit_hash.__str__()}\n")
+            for builder in dependencies:
+                archive.add_archive(builder.zip_archive, builder.zip_archive.stem)
 
-        shutil.make_archive(
-            f"{self.mod_name}-release-{combined_hash[:8]}", "zip", self.build_dir
-        )
+            archive.add_archive(self.zip_archive, self.zip_archive.stem, exclude=["version.txt"])
+            archive.add_bytes(f"{self.mod_name}/version.txt", version.encode())
+
+            release_span.files = archive.files_count
+            release_span.bytes = archive.bytes_count
+
+        cache.put(key, release_archive)
 
         print(f"build {combined_hash[:8]} done in {time.time() - start:.1f}s")
 
-        return self.zip_archive
+        return release_archive
 
     def show_infos(self) -> None:
         """
@@ -417,33 +963,31 @@ class ModBuilder:
 
 # fmt: off
 @click.command("build")
+@profile_option
 @click.option("-c", "--clean", is_flag=True, help="Clean the build directory, once done.")
 @click.option("-q", "--quiet", is_flag=True, help="Hide dotnet outputs.")
-def cmd_build(clean: bool, quiet: bool):
+@click.option("-f", "--full", is_flag=True, help="Wipe the build directory before building.")
+@click.option("-s", "--stage", is_flag=True, help="Keep a copy of the archive content in the build directory.")
+@click.option("-p", "--preview", type=click.Path(file_okay=False, path_type=Path), help="Write the vanilla configuration merged with the patches into this folder.")
+def cmd_build(clean: bool, quiet: bool, full: bool, stage: bool, preview: Path):
     """
     Compile the project in the current working directory and create a zip archive ready for testing
     """
-    ModBuilder().build(clean, quiet)
+    ModBuilder().build(clean, quiet, full, stage, preview=preview)
 
 
 @click.command("start")
+@profile_option
 @click.option("-s", "--server", is_flag=True)
 def cmd_start_local(server: bool):
     """
     Compile the project, then start a local game
     """
-    builder = ModBuilder()
-    builder.shut_down()
-    builder.build()
-    builder.install_local()
-    builder.start_local()
-
-    if server:
-        builder.install_server()
-        builder.start_server()
+    ModBuilder().run_start(server)
 
 
 @click.command("shut-down")
+@profile_option
 def cmd_shut_down():
     """
     Hard closes all instances of 7DaysToDie.exe and 7DaysToDieServer.exe
@@ -452,14 +996,17 @@ def cmd_shut_down():
 
 
 @click.command("release")
-def cmd_release():
+@profile_option
+@click.option("-j", "--jobs", type=click.IntRange(min=1), default=os.cpu_count(), show_default=True, help="Number of dependencies built concurrently.")
+def cmd_release(jobs: int):
     """
     Compile the project and create the release zip archive
     """
-    ModBuilder().release()
+    ModBuilder().release(jobs)
 
 
 @click.command("fetch-prefabs")
+@profile_option
 def cmd_fetch_prefabs():
     """
     Copy all prefabs specified in `sdutils.json/prefabs` into the folder `Prefab` of the current working directory
@@ -468,17 +1015,29 @@ def cmd_fetch_prefabs():
 
 
 @click.command("install")
-def cmd_install():
+@profile_option
+@click.option("-l", "--link", is_flag=True, help="Link the build directory into the Mods folder instead of copying.")
+def cmd_install(link: bool):
     """
     Build the project then install the mod in the 7 days Mods folder
     """
-    builder = ModBuilder()
-    builder.shut_down()
-    builder.build()
-    builder.install_local()
+    ModBuilder().run_install(link)
+
+
+@click.command("watch")
+@profile_option
+@click.option("-l", "--link", is_flag=True, help="Link the build directory into the Mods folder instead of copying.")
+@click.option("-d", "--debounce", type=click.IntRange(min=0), default=200, show_default=True, help="Quiet delay before rebuilding, in milliseconds.")
+@click.option("-p", "--poll", is_flag=True, help="Poll the file system instead of using inotify.")
+def cmd_watch(link: bool, debounce: int, poll: bool):
+    """
+    Build and install the project, then rebuild and reinstall it on every file change
+    """
+    ModBuilder().watch(link, debounce / 1000, poll)
 
 
 @click.command("infos")
+@profile_option
 def cmd_infos():
     """
     Show dumped infos of the current sdutils.json file
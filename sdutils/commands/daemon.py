@@ -0,0 +1,94 @@
+from pathlib import Path
+import subprocess
+import time
+import sys
+import os
+
+import click
+
+from .. import client, daemon
+from ..profiling import profile_option
+
+
+@click.group("daemon")
+def cmd_daemon():
+    """
+    Run sdutils as a daemon keeping caches warm between commands.
+
+    While the daemon runs, 'build', 'release', 'install', 'start', 'fetch-prefabs'
+    and 'infos' are forwarded to it. Set SDUTILS_NO_DAEMON=1 to run them in-process.
+    """
+    pass
+
+
+@cmd_daemon.command("run")
+@profile_option
+def cmd_daemon_run():
+    """
+    Run the daemon in the foreground, until Ctrl+C or 'daemon stop'.
+    """
+    if client.request("ping") is not None:
+        raise SystemExit("Error: a daemon is already running")
+
+    daemon.Daemon().serve()
+
+
+@cmd_daemon.command("start")
+@profile_option
+def cmd_daemon_start():
+    """
+    Start the daemon in the background.
+    """
+    if client.request("ping") is not None:
+        print("daemon already running")
+        return
+
+    log_path = Path(daemon.USER_CACHE_DIR, "daemon.log")
+    os.makedirs(log_path.parent, exist_ok=True)
+
+    if sys.platform == "win32":
+        flags = {"creationflags": subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        flags = {"start_new_session": True}
+
+    with open(log_path, "a") as log:
+        subprocess.Popen(
+            [sys.executable, "-m", "sdutils.cli", "daemon", "run"],
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=log,
+            **flags,
+        )
+
+    deadline = time.monotonic() + 10
+
+    while time.monotonic() < deadline:
+
+        if client.request("ping") is not None:
+            print("daemon started")
+            return
+
+        time.sleep(0.05)
+
+    raise SystemExit(f"Error: the daemon did not start, see '{log_path}'")
+
+
+@cmd_daemon.command("stop")
+@profile_option
+def cmd_daemon_stop():
+    """
+    Stop the running daemon.
+    """
+    if client.request("stop") is None:
+        print("no daemon running")
+    else:
+        print("daemon stopped")
+
+
+@cmd_daemon.command("status")
+@profile_option
+def cmd_daemon_status():
+    """
+    Tell if a daemon is running.
+    """
+    print("daemon running" if client.request("ping") is not None else "no daemon running")
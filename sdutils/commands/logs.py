@@ -0,0 +1,125 @@
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import click
+
+from .. import server
+from ..config import USER_CONFIG
+from ..dependencies import DependencyGraph
+from ..logs import LogAnalyzer, LogCheckpoints, LogEntry, LogReport, find_logs
+from ..profiling import profile_option, span
+from ..utils import format_bytes
+from .build import ModBuilder
+
+
+def _project_mods() -> Tuple[Dict[str, List[str]], Path]:
+    """
+    Returns the mods of the project in the current working directory and of its
+    dependencies, with their C# assembly names, along with the game path to use.
+    """
+    if not Path("sdutils.json").exists():
+        return dict(), Path(USER_CONFIG.PATH_7D2D) if USER_CONFIG.PATH_7D2D else None
+
+    builder = ModBuilder()
+
+    try:
+        builders = [builder, *DependencyGraph(builder).dependencies]
+    except SystemExit as e:
+        print(f"WRN: dependencies not resolved: {e}")
+        builders = [builder]
+
+    mods = {b.mod_name: [b.csproj.stem] if b.csproj is not None else list() for b in builders}
+
+    return mods, builder.game_path
+
+
+def _print_entry(entry: LogEntry, traces: bool) -> None:
+    count = f" x{entry.count}" if entry.count > 1 else ""
+    print(f"  {entry.level}{count} [{entry.category}] {entry.message}")
+
+    if traces:
+        for line in entry.stack:
+            print(f"      {line.strip()}")
+
+
+def _print_report(report: LogReport, project: Dict[str, List[str]], mods: Tuple[str], warnings: bool, traces: bool):
+    state = report.state
+    print(f"{report.path}: {format_bytes(report.end - report.start) or '0B'} read from offset {report.start}")
+
+    if state.load_order:
+        print()
+        print(f"{'mod':<40} {'load':>8} {'init':>8}")
+
+        for name in state.load_order:
+            if mods and name not in mods:
+                continue
+
+            timing = state.timings.get(name)
+            marker = "*" if name in project else " "
+            load, init = (f"{timing.load:.2f}s", f"{timing.init:.2f}s") if timing else ("-", "-")
+            print(f"{marker}{name:<39} {load:>8} {init:>8}")
+
+    for mod, entries in report.by_mod().items():
+        if mods and mod not in mods:
+            continue
+
+        errors = [e for e in entries if e.level != "WRN"]
+        listed = [e for e in entries if e.level != "WRN" or warnings or e.category == "xml"]
+        warning_count = sum(e.count for e in entries if e.level == "WRN")
+
+        print()
+        print(f"[{mod or 'unattributed'}] {sum(e.count for e in errors)} error(s), {warning_count} warning(s)")
+
+        for entry in listed:
+            _print_entry(entry, traces)
+
+
+# fmt: off
+@click.command("logs")
+@profile_option
+@click.argument("paths", nargs=-1, type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("-s", "--server", "servers", is_flag=True, help="Analyze the logs of the dedicated server instances.")
+@click.option("-a", "--all", "from_start", is_flag=True, help="Analyze the logs from their start, rather than from the last checkpoint.")
+@click.option("-m", "--mod", "mods", multiple=True, help="Only report this mod, can be repeated.")
+@click.option("-w", "--warnings", is_flag=True, help="List every warning, rather than only the XML patch ones.")
+@click.option("-t", "--traces", is_flag=True, help="Print the stack traces of the errors.")
+def cmd_logs(paths: Tuple[Path], servers: bool, from_start: bool, mods: Tuple[str], warnings: bool, traces: bool):
+    """
+    Report the errors of the game output logs grouped by mod, and the loading time of each mod.
+
+    Without PATHS, the latest output log of the game is analyzed, or the logs of the server instances with --server.
+    Each log is analyzed from where the previous run stopped, unless --all.
+    """
+    project, game_path = _project_mods()
+
+    if not paths:
+        if servers:
+            paths = [path for path in find_logs(*server.SERVERS_DIR.glob("*")) if path.name == "output_log.txt"]
+        else:
+            user_logs = Path(USER_CONFIG.PATH_7D2D_USER, "logs") if USER_CONFIG.PATH_7D2D_USER else None
+            game_logs = Path(game_path, "7DaysToDie_Data") if game_path else None
+            paths = find_logs(user_logs, game_logs)[:1]
+
+    if not paths:
+        raise SystemExit("Error: no output log found")
+
+    analyzer = LogAnalyzer(project)
+    checkpoints = LogCheckpoints()
+
+    for index, path in enumerate(paths):
+        start, state = (0, None) if from_start else checkpoints.get(path)
+
+        with span("scan") as scan_span:
+            report = analyzer.analyze(path, start, state)
+            scan_span.files = 1
+            scan_span.bytes = report.end - report.start
+
+        checkpoints.set(report)
+
+        if index:
+            print()
+
+        _print_report(report, project, mods, warnings, traces)
+
+    checkpoints.save()
+# fmt: on
@@ -1,13 +1,17 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
 from pathlib import Path
-from re import Match
+from re import Pattern
 import subprocess
-import shutil
+import functools
+import csv
 import os
 import re
 
 import click
 
+from ..profiling import profile_option
+
 
 MOD_NAME_PROP = "@MODNAME"
 
@@ -53,37 +57,104 @@ def _format_kebab(value: str) -> str:
     return "-".join(words)
 
 
-def _render_placeholder(match: Match, value: str) -> str:
+# Format flags of placeholders, such as '@MODNAME!pascal'
+FORMATTERS: Dict[str, Callable[[str], str]] = {
+    "!pascal": _format_pascal,
+    "!camel": _format_camel,
+    "!snake": _format_snake,
+    "!kebab": _format_kebab,
+}
+
+# Folders of a new project, relative to the project folder, with placeholders
+PROJECT_DIRS = [
+    "Config",
+    "Harmony",
+    "Ignore",
+    "Prefabs",
+    "Resources",
+    "Scripts",
+    "UIAtlases/ItemIconAtlas",
+]
+
+# Files of a new project: names in the templates folder, to their destination with placeholders
+PROJECT_FILES = {
+    "ModInfo.xml": "ModInfo.xml",
+    "ModConfig.xml": "ModConfig.xml",
+    ".csproj": f"{MOD_NAME_PROP}!kebab.csproj",
+    "gitignore.template": ".gitignore",
+    "ModApi.cs": "Harmony/ModApi.cs",
+    "sdutils.json": "sdutils.json",
+}
+
+TEMPLATES_DIR = Path(__file__, "../../templates").resolve()
+
+
+@functools.lru_cache(maxsize=None)
+def _placeholders_pattern(keys: Tuple[str, ...]) -> Pattern:
+    """
+    Compiles a single pattern matching every placeholder of `keys`, with its optional format flag.
+    Longer keys come first, so that a key is not matched as the prefix of another one.
+    """
+    alternatives = "|".join(re.escape(key) for key in sorted(keys, key=len, reverse=True))
+    return re.compile(f"({alternatives})(!\\w+)?")
+
+
+class Template:
     """
-    Determines the correct formatting for a placeholder match based on
-    the optional format flag (e.g., @MODNAME!pascal).
+    A template compiled for a set of placeholders.
 
-    Args:
-        match: The regex match object containing groups for the key and format.
-        value: The raw value to be formatted (the mod name).
+    The content is split once into literal chunks and placeholder slots, each slot
+    holding its key and formatter, so that rendering is a single join.
 
-    Returns:
-        The formatted string.
+    Raises:
+        ValueError: If a placeholder has an unknown format flag.
     """
-    format = match.groups()[1]
 
-    if format is None:
-        return value
+    def __init__(self, content: str, keys: Tuple[str, ...]):
+        self.chunks: List[str | Tuple[str, Callable[[str], str] | None]] = list()
+        position = 0
+
+        for match in _placeholders_pattern(keys).finditer(content):
+
+            key, format = match.groups()
+
+            if format is not None and format not in FORMATTERS:
+                raise ValueError(f"Invalid format: '{format}'")
+
+            self.chunks.append(content[position : match.start()])
+            self.chunks.append((key, FORMATTERS.get(format)))
+            position = match.end()
+
+        self.chunks.append(content[position:])
+
+    def render(self, datas: dict) -> str:
+        parts = list()
 
-    match format:
-        case "!pascal":
-            return _format_pascal(value)
+        for chunk in self.chunks:
 
-        case "!camel":
-            return _format_camel(value)
+            if isinstance(chunk, str):
+                parts.append(chunk)
+                continue
 
-        case "!snake":
-            return _format_snake(value)
+            key, formatter = chunk
+            value = datas[key]
+            parts.append(value if formatter is None else formatter(value))
 
-        case "!kebab":
-            return _format_kebab(value)
+        return "".join(parts)
 
-    raise ValueError(f"Invalid format: '{format}'")
+
+@functools.lru_cache(maxsize=None)
+def _compile_template(content: str, keys: Tuple[str, ...]) -> Template:
+    return Template(content, keys)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_template(path: Path, keys: Tuple[str, ...]) -> Template:
+    """
+    Reads and compiles a template file, once per run and set of placeholders.
+    """
+    with open(path, "r") as reader:
+        return Template(reader.read(), keys)
 
 
 def _render_placeholders(content: str, datas: dict) -> str:
@@ -91,76 +162,112 @@ def _render_placeholders(content: str, datas: dict) -> str:
     Parses a string and replaces all occurrences of registered placeholders
     with their corresponding formatted values.
     """
-    for key, value in datas.items():
+    return _compile_template(content, tuple(datas)).render(datas)
+
+
+def _scaffold_project(path: Path, datas: dict) -> None:
+    """
+    Creates a project folder from the templates, rendering placeholders in
+    file contents and in file and folder names, then initializes a Git repository.
+    """
+    keys = tuple(datas)
+
+    for dir_name in PROJECT_DIRS:
+        os.makedirs(Path(path, _render_placeholders(dir_name, datas)))
+
+    for template_name, file_name in PROJECT_FILES.items():
 
-        content = re.sub(
-            pattern=f"({key})(!\\w+)?",
-            repl=lambda match: _render_placeholder(match, value),
-            string=content,
-        )
+        template = _load_template(Path(TEMPLATES_DIR, template_name), keys)
+        target = Path(path, _render_placeholders(file_name, datas))
 
-    return content
+        os.makedirs(target.parent, exist_ok=True)
 
+        with open(target, "w") as writer:
+            writer.write(template.render(datas))
 
-def _render_template(filename: Path, datas: dict):
+    # Git Initialization
+    try:
+        subprocess.run(["git", "init", str(path)], capture_output=True)
+    except FileNotFoundError:
+        print(f"WRN: error while initializing git repository '{path}'")
+
+
+def _placeholder_key(column: str) -> str:
+    """
+    Turns a manifest column name into a placeholder key (e.g., 'author name' -> '@AUTHOR_NAME').
     """
-    Opens a file, processes its template placeholders, and overwrites it
-    with the rendered content.
+    return "@" + re.sub(r"\W+", "_", column.strip()).upper()
+
+
+def _read_manifest(path: Path) -> List[Tuple[Path, dict]]:
+    """
+    Reads a CSV manifest of projects to create, as exported from a spreadsheet.
+
+    The 'name' column holds the mod names, an optional 'path' column the project
+    folders, defaulting to the mod names. Any other column is made available to the
+    templates as a placeholder, such as '@AUTHOR' for a column 'author'.
+
+    Raises:
+        SystemExit: If the manifest has no 'name' column, or a row has no name.
     """
-    with open(filename, "r") as reader:
-        content = reader.read()
+    with open(path, newline="", encoding="utf-8-sig") as reader:
+        rows = list(csv.DictReader(reader))
 
-    content = _render_placeholders(content, datas)
+    if rows and "name" not in rows[0]:
+        raise SystemExit(f"Error: missing column 'name' in manifest '{path}'")
 
-    with open(filename, "w") as writer:
-        writer.write(content)
+    projects = list()
+
+    for index, row in enumerate(rows, start=2):
+
+        mod_name = (row.pop("name") or "").strip()
+        folder = (row.pop("path", None) or mod_name).strip()
+
+        if not mod_name:
+            raise SystemExit(f"Error: missing mod name at line {index} of manifest '{path}'")
+
+        datas = {_placeholder_key(column): value or "" for column, value in row.items() if column}
+        datas[MOD_NAME_PROP] = mod_name
+
+        projects.append((Path(path.parent, folder), datas))
+
+    return projects
 
 
 @click.command("new")
-@click.argument("mod-name")
-def cmd_new(mod_name: str):
+@profile_option
+@click.argument("mod-name", required=False)
+@click.option("--manifest", type=click.Path(exists=True, dir_okay=False, path_type=Path), help="CSV file of the projects to create, one per row.")
+@click.option("-j", "--jobs", type=click.IntRange(min=1), default=os.cpu_count() or 1, help="Number of projects created concurrently with '--manifest'.")
+def cmd_new(mod_name: str, manifest: Path, jobs: int):
     """
     Creates a new 7D2D Modding project from templates.
 
     This command generates a standard folder structure, copies template files
     (ModInfo, C# project, Gitignore), renders placeholders with the chosen
     mod name, and initializes a Git repository.
-    """
-    PLACEHOLDERS = {MOD_NAME_PROP: mod_name}
 
-    templates_dir = Path(__file__, "../../templates").resolve()
+    With '--manifest', a project is created for each row of a CSV file instead,
+    with a 'name' column, an optional 'path' column and extra placeholders.
+    """
+    if (mod_name is None) == (manifest is None):
+        raise click.UsageError("Expected either a mod name or '--manifest'")
 
-    if Path(mod_name).exists():
-        raise SystemExit(f"Error: A folder with name '{mod_name}' already exists")
+    if mod_name is not None:
+        projects = [(Path(mod_name), {MOD_NAME_PROP: mod_name})]
+    else:
+        projects = _read_manifest(manifest)
 
-    csproj = f"{_format_kebab(mod_name)}.csproj"
+    existing = [str(path) for path, _ in projects if path.exists()]
 
-    # Directory Structure Creation
-    os.makedirs(mod_name)
-    os.makedirs(Path(mod_name, "Config"))
-    os.makedirs(Path(mod_name, "Harmony"))
-    os.makedirs(Path(mod_name, "Ignore"))
-    os.makedirs(Path(mod_name, "Prefabs"))
-    os.makedirs(Path(mod_name, "Resources"))
-    os.makedirs(Path(mod_name, "Scripts"))
-    os.makedirs(Path(mod_name, "UIAtlases/ItemIconAtlas"))
+    if existing:
+        raise SystemExit(f"Error: A folder with name '{', '.join(existing)}' already exists")
 
-    # Copying Templates
-    shutil.copy(Path(templates_dir, "ModInfo.xml"), Path(mod_name, "ModInfo.xml"))
-    shutil.copy(Path(templates_dir, "ModConfig.xml"), Path(mod_name, "ModConfig.xml"))
-    shutil.copy(Path(templates_dir, ".csproj"), Path(mod_name, csproj))
-    shutil.copy(Path(templates_dir, "gitignore.template"), Path(mod_name, ".gitignore"))
-    shutil.copy(Path(templates_dir, "ModApi.cs"), Path(mod_name, "Harmony/ModApi.cs"))
-    shutil.copy(Path(templates_dir, "sdutils.json"), Path(mod_name, "sdutils.json"))
+    if len(projects) == 1:
+        _scaffold_project(*projects[0])
+        return
 
-    # Template Rendering
-    _render_template(Path(mod_name, csproj), PLACEHOLDERS)
-    _render_template(Path(mod_name, "ModInfo.xml"), PLACEHOLDERS)
-    _render_template(Path(mod_name, "Harmony/ModApi.cs"), PLACEHOLDERS)
-    _render_template(Path(mod_name, "sdutils.json"), PLACEHOLDERS)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        list(executor.map(lambda project: _scaffold_project(*project), projects))
 
-    # Git Initialization
-    try:
-        subprocess.run(f"git init {Path(mod_name)}", capture_output=True)
-    except FileNotFoundError:
-        print("WRN: error while initializing git repository")
\ No newline at end of file
+    print(f"created {len(projects)} projects")
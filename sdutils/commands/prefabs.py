@@ -0,0 +1,112 @@
+from pathlib import Path
+from typing import Tuple
+import json
+
+import click
+
+from ..catalogue import PrefabCatalogue, PrefabQuery, get_catalogue
+from ..config import USER_CONFIG
+from ..profiling import profile_option, span
+
+
+def _get_catalogue() -> PrefabCatalogue:
+    """
+    Returns the catalogue of `PATH_PREFABS`, brought up to date with the library.
+    """
+    if not USER_CONFIG.PATH_PREFABS:
+        raise SystemExit("Error: PATH_PREFABS is not set in the user configuration")
+
+    catalogue = get_catalogue(Path(USER_CONFIG.PATH_PREFABS))
+
+    with span("catalogue") as catalogue_span:
+        parsed, removed = catalogue.refresh()
+        catalogue_span.files = parsed
+
+    if parsed or removed:
+        print(f"catalogue: {parsed} prefab(s) parsed, {removed} removed")
+
+    return catalogue
+
+
+@click.group("prefabs")
+def cmd_prefabs():
+    """
+    Search the prefab library by properties, such as tags, tier or size.
+
+    The properties of the prefabs of PATH_PREFABS are indexed in a local catalogue, only changed prefabs being read again.
+    """
+    pass
+
+
+# fmt: off
+@cmd_prefabs.command("search")
+@profile_option
+@click.argument("name", required=False)
+@click.option("-t", "--tag", multiple=True, help="Tag the prefabs must have, can be repeated.")
+@click.option("--theme", multiple=True, help="Theme tag the prefabs must have, can be repeated.")
+@click.option("-z", "--zoning", multiple=True, help="Zone the prefabs must be allowed in, can be repeated.")
+@click.option("-b", "--biome", multiple=True, help="Biome the prefabs must be allowed in, can be repeated.")
+@click.option("--township", multiple=True, help="Township the prefabs must be allowed in, can be repeated.")
+@click.option("--tier", help="Difficulty tier, or range of tiers such as 2-4.")
+@click.option("--min-size", help="Minimum footprint, as WIDTHxLENGTH.")
+@click.option("--max-size", help="Maximum footprint, as WIDTHxLENGTH.")
+@click.option("-p", "--property", "properties", multiple=True, help="Exact value of any other property, as NAME=VALUE, can be repeated.")
+@click.option("-d", "--dir", help="Folder of the library to search in.")
+@click.option("-n", "--limit", type=click.IntRange(min=0), default=50, show_default=True, help="Maximum number of prefabs listed, 0 for all.")
+@click.option("--json", "as_json", is_flag=True, help="Print the query as an entry of `sdutils.json/prefabs`, rather than searching.")
+def cmd_prefabs_search(name: str, tag: Tuple[str], theme: Tuple[str], zoning: Tuple[str], biome: Tuple[str], township: Tuple[str],
+                       tier: str, min_size: str, max_size: str, properties: Tuple[str], dir: str, limit: int, as_json: bool):
+    """
+    List the prefabs matching every given filter, NAME being a glob pattern such as 'house_*'.
+
+    Saved in the 'prefabs' list of sdutils.json, as printed by --json, a query fetches the prefabs it matches at build time.
+    """
+    if any("=" not in p for p in properties):
+        raise SystemExit("Error: properties must be given as NAME=VALUE")
+
+    query = PrefabQuery(
+        name=name,
+        dir=dir,
+        tag=list(tag),
+        theme=list(theme),
+        zoning=list(zoning),
+        biome=list(biome),
+        township=list(township),
+        tier=tier,
+        min_size=min_size,
+        max_size=max_size,
+        properties=dict(p.split("=", 1) for p in properties),
+    )
+
+    if as_json:
+        print(json.dumps(query.to_dict(), indent=4))
+        return
+
+    query.limit = limit or None
+    found = _get_catalogue().search(query)
+
+    for prefab in found:
+        tier = prefab.tier if prefab.tier is not None else "-"
+        tags = ",".join(prefab.terms.get("tag", list()))
+        zoning = ",".join(prefab.terms.get("zoning", list()))
+        print(f"{prefab.path:<48} T{tier:<2} {prefab.dimensions:<12} {zoning:<24} {tags}")
+
+    print(f"{len(found)} prefab(s) found" + (", limit reached" if limit and len(found) == limit else ""))
+
+
+@cmd_prefabs.command("show")
+@profile_option
+@click.argument("path")
+def cmd_prefabs_show(path: str):
+    """
+    Print every property of the prefab PATH, relative to PATH_PREFABS and without extension.
+    """
+    path = path.replace("\\", "/").strip("/").removesuffix(".xml")
+    properties = _get_catalogue().properties(path)
+
+    if not properties:
+        raise SystemExit(f"Error: no prefab '{path}' in the catalogue")
+
+    for name, value in sorted(properties.items()):
+        print(f"{name:<32} {value}")
+# fmt: on
@@ -0,0 +1,110 @@
+from pathlib import Path
+
+import click
+
+from ..config import USER_CONFIG
+from ..profiling import profile_option
+from ..saves import SaveStore, save_dir
+from ..trash import Trash
+from ..utils import format_bytes
+
+
+@click.group("save")
+def cmd_save():
+    """
+    Snapshot saves and restore them, rather than generating the world again on every test run.
+
+    Snapshots live in a content-addressed store: a file shared by several snapshots is stored once.
+    """
+    pass
+
+
+@cmd_save.command("snapshot")
+@profile_option
+@click.argument("world")
+@click.argument("save")
+@click.option("-n", "--name", help="Name of the snapshot, its creation date by default.")
+def cmd_save_snapshot(world: str, save: str, name: str):
+    """
+    Snapshot the save SAVE of the world WORLD.
+    """
+    snapshot, stored = SaveStore().snapshot(save_dir(USER_CONFIG.PATH_7D2D_USER, world, save), world, save, name)
+
+    print(f"snapshot {snapshot}: {format_bytes(stored) or '0B'} stored")
+
+
+@cmd_save.command("restore")
+@profile_option
+@click.argument("world")
+@click.argument("save")
+@click.option("-n", "--name", help="Name of the snapshot, the latest one by default.")
+@click.option("-l", "--link", is_flag=True, help="Hardlink the files to the store rather than copying them.")
+def cmd_save_restore(world: str, save: str, name: str, link: bool):
+    """
+    Restore a snapshot of the save SAVE of the world WORLD.
+    """
+    store = SaveStore()
+    snapshot = store.get(world, save, name)
+    trash = Trash(Path(USER_CONFIG.PATH_7D2D_USER))
+
+    report = store.restore(snapshot, save_dir(USER_CONFIG.PATH_7D2D_USER, world, save), trash, link)
+
+    print(f"restore {snapshot.world}/{snapshot.save}/{snapshot.name}: {report}")
+    trash.wait()
+
+
+@cmd_save.command("list")
+@profile_option
+@click.argument("world", required=False)
+@click.argument("save", required=False)
+def cmd_save_list(world: str, save: str):
+    """
+    List the snapshots, of a world or a save only if given.
+    """
+    for snapshot in SaveStore().list(world, save):
+        print(snapshot)
+
+
+@cmd_save.command("prune")
+@profile_option
+@click.argument("world", required=False)
+@click.argument("save", required=False)
+@click.option("-k", "--keep", type=click.IntRange(min=0), default=1, show_default=True, help="Number of snapshots kept per save.")
+def cmd_save_prune(world: str, save: str, keep: int):
+    """
+    Delete the older snapshots of every save, of a world or a save only if given, then free their content.
+    """
+    store = SaveStore()
+
+    for snapshot in store.prune(keep, world, save):
+        print(f"deleted {snapshot}")
+
+    count, freed = store.collect()
+
+    print(f"prune: {count} objects, {format_bytes(freed) or '0B'} freed")
+
+
+@cmd_save.command("size")
+@profile_option
+def cmd_save_size():
+    """
+    Show the space used by the snapshots, and the space pruning each of them would free.
+    """
+    store = SaveStore()
+    snapshots = store.list()
+    logical = 0
+
+    for snapshot in snapshots:
+        logical += snapshot.size
+        print(f"{snapshot}: {format_bytes(store.exclusive_size(snapshot, snapshots)) or '0B'} exclusive")
+
+    count, size = store.usage()
+
+    print()
+    print(f"store ........ : {store.root}")
+    print(f"objects ...... : {count}")
+    print(f"on disk ...... : {format_bytes(size) or '0B'}")
+    print(f"snapshotted .. : {format_bytes(logical) or '0B'}")
+
+    if size:
+        print(f"dedup ratio .. : {logical / size:.2f}x")
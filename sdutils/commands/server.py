@@ -0,0 +1,68 @@
+from datetime import datetime
+from statistics import median
+
+import click
+
+from .. import server
+from ..profiling import profile_option
+from .build import ModBuilder
+
+
+@click.group("server")
+def cmd_server():
+    """
+    Start local dedicated servers, and measure the time they take to get ready.
+    """
+    pass
+
+
+# fmt: off
+@cmd_server.command("start")
+@profile_option
+@click.option("-n", "--instances", type=click.IntRange(min=1), default=1, show_default=True, help="Number of server instances.")
+@click.option("-p", "--port", type=click.IntRange(min=1, max=65535), help="ServerPort of the first instance, the next ones being 10 ports apart. Defaults to the one of serverconfig.xml.")
+@click.option("-t", "--timeout", type=click.IntRange(min=1), default=300, show_default=True, help="Time given to the instances to get ready, in seconds.")
+@click.option("-f", "--follow", is_flag=True, help="Keep printing the logs once ready, until the servers exit.")
+@click.option("-v", "--verbose", is_flag=True, help="Print the logs while the servers start.")
+@click.option("--no-build", is_flag=True, help="Start the servers with the installed mod as it is.")
+def cmd_server_start(instances: int, port: int, timeout: int, follow: bool, verbose: bool, no_build: bool):
+    """
+    Build the project, install it on the dedicated server, then start server instances and wait until they are ready
+    """
+    builder = ModBuilder()
+
+    if not no_build:
+        builder.build()
+        builder.install_server()
+
+    builder.start_server(instances, port, timeout, follow, verbose)
+# fmt: on
+
+
+@cmd_server.command("stop")
+@profile_option
+def cmd_server_stop():
+    """
+    Stop the server instances started by 'server start'.
+    """
+    print(f"{server.stop_instances()} server instance(s) stopped")
+
+
+@cmd_server.command("history")
+@profile_option
+@click.option("-n", "--limit", type=click.IntRange(min=1), default=20, show_default=True, help="Number of starts shown.")
+def cmd_server_history(limit: int):
+    """
+    Show the recorded server starts, with their time-to-ready.
+    """
+    starts = server.history(limit)
+
+    for start in starts:
+        date = datetime.fromtimestamp(start.started).strftime("%Y-%m-%d %H:%M:%S")
+        print(f"{date} {start.mod or '-'} {(start.commit or '-')[:8]} {start}")
+
+    ready = [start.seconds for start in starts if start.status == "ready"]
+
+    if ready:
+        print()
+        print(f"time-to-ready: median {median(ready):.1f}s, min {min(ready):.1f}s, max {max(ready):.1f}s over {len(ready)} starts")
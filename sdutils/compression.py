@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from zipfile import ZIP_DEFLATED, ZIP_LZMA, ZIP_STORED
+import math
+
+from .includes import Exclusion
+from .utils import format_bytes
+
+
+# Samples read by the 'auto' method to estimate the entropy of a file, spread over it
+ENTROPY_SAMPLES = 4
+ENTROPY_SAMPLE_SIZE = 16 * 1024
+
+# Entropy above which a file is stored as it is, in bits per byte: already compressed
+# data, such as PNG, JPG or asset bundles, is close to 8
+ENTROPY_THRESHOLD = 7.8
+
+
+@dataclass(frozen=True)
+class Method:
+    """
+    Compression method of archive members: 'store', 'deflate' with an optional level
+    from 0 to 9, 'lzma', or 'auto', which stores incompressible files and deflates others.
+    """
+    name: str
+    level: Optional[int] = None
+
+    @staticmethod
+    def parse(value: str) -> Method:
+        """
+        Parses a method as written in 'sdutils.json', such as 'store', 'deflate 9' or 'auto'.
+
+        Raises:
+            ValueError: If the method is unknown.
+        """
+        parts = str(value).lower().split()
+
+        if len(parts) == 1 and parts[0] in ("store", "deflate", "lzma", "auto"):
+            return Method(parts[0])
+
+        if len(parts) == 2 and parts[0] == "deflate" and parts[1].isdigit() and 0 <= int(parts[1]) <= 9:
+            return Method("deflate", int(parts[1]))
+
+        raise ValueError(f"unknown compression method '{value}'")
+
+    @property
+    def compress_type(self) -> int:
+        return {"store": ZIP_STORED, "lzma": ZIP_LZMA}.get(self.name, ZIP_DEFLATED)
+
+    def __str__(self) -> str:
+        return self.name if self.level is None else f"{self.name} {self.level}"
+
+
+# Method of the members matched by no pattern
+DEFAULT_METHOD = Method("deflate")
+
+
+def entropy(path: Path) -> float:
+    """
+    Estimates the entropy of a file in bits per byte, from a few samples spread over it.
+    """
+    size = path.stat().st_size
+    counts = Counter()
+
+    with open(path, "rb") as reader:
+        for index in range(ENTROPY_SAMPLES):
+            reader.seek(size * index // ENTROPY_SAMPLES)
+            counts.update(reader.read(ENTROPY_SAMPLE_SIZE))
+
+    total = sum(counts.values())
+
+    return -sum(count / total * math.log2(count / total) for count in counts.values()) if total else 0.0
+
+
+def resolve(method: Method, path: Path) -> Method:
+    """
+    Returns the method to compress the file `path` with: `method`, unless 'auto'.
+    """
+    if method.name != "auto":
+        return method
+
+    return Method("store") if entropy(path) >= ENTROPY_THRESHOLD else DEFAULT_METHOD
+
+
+class CompressionPolicy:
+    """
+    The 'compression' object of 'sdutils.json', mapping glob patterns to methods:
+
+        "compression": {
+            "*.unity3d": "store",
+            "Prefabs/**/*.tts": "auto",
+            "Config": "deflate 9",
+            "*": "deflate"
+        }
+
+    Patterns follow the 'exclude' syntax: a pattern without slash matches the name of
+    a member or of one of its folders, others match the whole member path. The first
+    matching pattern applies, 'deflate' being used when none matches.
+    """
+
+    def __init__(self, rules: Dict[str, str] = None):
+        """
+        Raises:
+            SystemExit: If a method is unknown.
+        """
+        self.rules: List[Tuple[Exclusion, Method]] = list()
+
+        for pattern, value in (rules or dict()).items():
+            try:
+                self.rules.append((Exclusion(pattern), Method.parse(value)))
+            except ValueError as e:
+                raise SystemExit(f"Error: invalid 'compression' of '{pattern}': {e}")
+
+    def method(self, name: str) -> Method:
+        """
+        Returns the method of the archive member `name`, a POSIX path.
+        """
+        parts = name.split("/")
+
+        for exclusion, method in self.rules:
+            for index in range(1, len(parts) + 1):
+                if exclusion.matches(parts[:index], index < len(parts)):
+                    return method
+
+        return DEFAULT_METHOD
+
+
+@dataclass
+class MethodTotals:
+    """
+    Totals of the members compressed with one method.
+
+    Attributes:
+        files: Number of members.
+        size: Uncompressed size, in bytes.
+        compressed: Compressed size, in bytes.
+    """
+    files: int = 0
+    size: int = 0
+    compressed: int = 0
+
+
+@dataclass
+class CompressionReport:
+    """
+    Bytes saved by the compression of archive members, against the CPU time it took.
+
+    Attributes:
+        methods: Totals by method, after resolving 'auto'.
+        cpu: CPU time spent reading, sampling and compressing members, in seconds.
+    """
+    methods: Dict[str, MethodTotals] = field(default_factory=dict)
+    cpu: float = 0.0
+
+    def add(self, method: Method, size: int, compressed: int, cpu: float) -> None:
+        totals = self.methods.setdefault(str(method), MethodTotals())
+        totals.files += 1
+        totals.size += size
+        totals.compressed += compressed
+        self.cpu += cpu
+
+    @property
+    def saved(self) -> int:
+        return sum(totals.size - totals.compressed for totals in self.methods.values())
+
+    def __str__(self) -> str:
+        methods = ", ".join(
+            f"{name} {totals.files} ({format_bytes(totals.size) or '0B'} > {format_bytes(totals.compressed) or '0B'})"
+            for name, totals in sorted(self.methods.items())
+        )
+
+        return f"{format_bytes(self.saved) or '0B'} saved for {self.cpu:.2f}s CPU: {methods}"
@@ -9,6 +9,9 @@ import os
 # Global path for the user configuration file located in the Roaming AppData folder
 USER_CONFIG_PATH = Path(os.environ["appdata"], "sdutils.json")
 
+# Global folder of the persistent caches and indexes shared by all projects
+USER_CACHE_DIR = Path(os.environ["appdata"], "sdutils-cache")
+
 
 @dataclass
 class Config:
@@ -20,11 +23,15 @@ class Config:
         PATH_7D2D_USER: Path to the local user data (Saves, GeneratedWorlds, etc.).
         PATH_7D2D_SERVER: Path to the dedicated server installation (if any).
         PATH_PREFABS: Path to the folder containing custom or vanilla prefabs.
+        DOTNET_BUILD_SERVER: Keep the dotnet build server alive between builds, as dotnet does by default.
+        ARTIFACT_CACHE_MB: Size cap of the cache of built archives, in megabytes.
     """
     PATH_7D2D: str | None = None
     PATH_7D2D_USER: str | None = None
     PATH_7D2D_SERVER: str | None = None
     PATH_PREFABS: str | None = None
+    DOTNET_BUILD_SERVER: bool = True
+    ARTIFACT_CACHE_MB: int = 2048
 
 
 def _save_config(config: Config, path: Path) -> None:
@@ -62,9 +69,43 @@ def _load_config(path: Path) -> Config:
     return Config(**data)
 
 
-# Global singleton instance of the user configuration
-try:
-    USER_CONFIG = _load_config(USER_CONFIG_PATH)
-except Exception as e:
-    print(f"Failed loading config at '{USER_CONFIG_PATH}'")
-    raise e
+_user_config: Config | None = None
+
+
+def get_user_config() -> Config:
+    """
+    Returns the global user configuration, loading it on first access.
+    """
+    global _user_config
+
+    if _user_config is None:
+        try:
+            _user_config = _load_config(USER_CONFIG_PATH)
+        except Exception as e:
+            print(f"Failed loading config at '{USER_CONFIG_PATH}'")
+            raise e
+
+    return _user_config
+
+
+def reload_user_config() -> None:
+    """
+    Reads the global user configuration again, updating the loaded instance in place
+    so that modules holding a reference to `USER_CONFIG` see the new values.
+    """
+    if _user_config is None:
+        return
+
+    _user_config.__dict__.update(Config().__dict__)
+    _user_config.__dict__.update(_load_config(USER_CONFIG_PATH).__dict__)
+
+
+def __getattr__(name: str):
+    """
+    Resolves the global singleton `USER_CONFIG` lazily, so that importing this
+    module does not read nor write the configuration file.
+    """
+    if name == "USER_CONFIG":
+        return get_user_config()
+
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Sequence, Set, Tuple
+import threading
+import shutil
+import errno
+import os
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# Below this number of files to copy, the thread pool is not worth its startup
+PARALLEL_COPY_THRESHOLD = 32
+
+# Copies of small files are bound by syscall latency rather than by the CPU or
+# the disk bandwidth, so more workers than cores keep the I/O queue busy
+DEFAULT_COPY_JOBS = min(32, (os.cpu_count() or 1) * 4)
+
+# ioctl cloning a whole file on copy-on-write filesystems (btrfs, XFS, bcachefs)
+_FICLONE = 0x40049409
+
+# Size of the ranges handed to `copy_file_range` and `sendfile`
+_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Errors meaning that a kernel-side copy method is not available for a pair of files
+_UNSUPPORTED_ERRNOS = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.ENOTTY, errno.EOPNOTSUPP, errno.EBADF}
+
+# Pairs of source and destination devices between which a method failed as unsupported,
+# so that it is not tried again
+_unsupported: Dict[str, Set[Tuple[int, int]]] = {"reflink": set(), "copy_file_range": set(), "sendfile": set()}
+_unsupported_lock = threading.Lock()
+
+
+def _mark_unsupported(method: str, devices: Tuple[int, int]) -> None:
+    with _unsupported_lock:
+        _unsupported[method].add(devices)
+
+
+def _reflink(reader, writer, devices: Tuple[int, int]) -> bool:
+    if fcntl is None or devices in _unsupported["reflink"]:
+        return False
+
+    try:
+        fcntl.ioctl(writer.fileno(), _FICLONE, reader.fileno())
+        return True
+
+    except OSError as e:
+        if e.errno not in _UNSUPPORTED_ERRNOS:
+            raise
+
+        _mark_unsupported("reflink", devices)
+        return False
+
+
+def _copy_range(reader, writer, size: int, devices: Tuple[int, int]) -> bool:
+    """
+    Copies `size` bytes between two open files without a round trip through
+    user space, with `copy_file_range`, else `sendfile`.
+
+    A method copying nothing at all is taken as unsupported, as some filesystems
+    report that way. Once part of the file is copied, running out of data means
+    that the source shrank.
+
+    Returns:
+        False if neither method is available, with nothing written.
+
+    Raises:
+        OSError: If the source ends before `size` bytes are copied.
+    """
+    for method in ("copy_file_range", "sendfile"):
+
+        function = getattr(os, method, None)
+
+        if function is None or devices in _unsupported[method]:
+            continue
+
+        offset = 0
+
+        try:
+            while offset < size:
+
+                if method == "copy_file_range":
+                    sent = function(reader.fileno(), writer.fileno(), min(_CHUNK_SIZE, size - offset))
+                else:
+                    sent = function(writer.fileno(), reader.fileno(), offset, min(_CHUNK_SIZE, size - offset))
+
+                if sent == 0:
+                    break
+
+                offset += sent
+
+            if offset == size:
+                return True
+
+            if offset > 0:
+                raise OSError(errno.EIO, f"Source truncated while copied: {offset} of {size} bytes")
+
+        except OSError as e:
+            if offset > 0 or e.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+
+        _mark_unsupported(method, devices)
+
+    return False
+
+
+def copy_file(src: Path, dst: Path, preserve_mtime: bool = True, replace: bool = False) -> int:
+    """
+    Copies the content of the file `src` to `dst`, whose folder must exist.
+
+    The copy is done by the kernel when possible: a reflink on copy-on-write
+    filesystems, else `copy_file_range` or `sendfile`. Other platforms fall back
+    to `shutil.copyfile`.
+
+    Args:
+        preserve_mtime: Sets the mtime of `dst` to the one of `src`.
+        replace: Unlinks `dst` first rather than overwriting it, so that other
+            hardlinks to it keep their content.
+
+    Returns:
+        The number of bytes copied.
+    """
+    if replace:
+        try:
+            os.unlink(dst)
+        except FileNotFoundError:
+            pass
+
+    with open(src, "rb") as reader:
+
+        stat = os.fstat(reader.fileno())
+
+        with open(dst, "wb") as writer:
+
+            devices = (stat.st_dev, os.fstat(writer.fileno()).st_dev)
+
+            if not _reflink(reader, writer, devices) and not _copy_range(reader, writer, stat.st_size, devices):
+                shutil.copyfileobj(reader, writer, _CHUNK_SIZE)
+
+    if preserve_mtime:
+        os.utime(dst, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    return stat.st_size
+
+
+def make_dirs(paths: Iterable[Path]) -> None:
+    """
+    Creates the folders `paths` and their parents, once each.
+
+    Folders are created in sorted order, so that a parent exists before its
+    children and nested folders don't walk up the tree again.
+    """
+    created = set()
+
+    for path in sorted(set(map(Path, paths))):
+
+        if path in created:
+            continue
+
+        if path.parent in created:
+            try:
+                os.mkdir(path)
+            except FileExistsError:
+                pass
+        else:
+            os.makedirs(path, exist_ok=True)
+
+        created.add(path)
+
+
+def copy_files(
+    pairs: Sequence[Tuple[Path, Path]], jobs: int = None, preserve_mtime: bool = True, replace: bool = False
+) -> int:
+    """
+    Copies a batch of files with `copy_file`, creating the destination folders
+    beforehand in one pass. Large batches are copied on a bounded thread pool.
+
+    Args:
+        pairs: Source and destination paths of each file.
+        jobs: Number of copy workers, `DEFAULT_COPY_JOBS` when unset.
+
+    Returns:
+        The number of bytes copied.
+    """
+    make_dirs(dst.parent for _, dst in pairs)
+
+    def copy(pair: Tuple[Path, Path]) -> int:
+        return copy_file(*pair, preserve_mtime=preserve_mtime, replace=replace)
+
+    if len(pairs) < PARALLEL_COPY_THRESHOLD or jobs == 1:
+        return sum(map(copy, pairs))
+
+    with ThreadPoolExecutor(max_workers=jobs or DEFAULT_COPY_JOBS) as executor:
+        return sum(executor.map(copy, pairs))
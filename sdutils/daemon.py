@@ -0,0 +1,364 @@
+"""
+Long-lived process running sdutils commands on behalf of thin clients.
+
+The daemon keeps everything memoized between commands: parsed configurations,
+include resolutions, prefab indexes, C# projects and Git states. These caches are
+invalidated from inotify events on the projects it served, on their Git folders and
+on the prefab library. Where inotify is unavailable, every cache is invalidated
+before each command, which still saves the interpreter startup and imports.
+
+Commands run with the environment variables of the client. A client whose 'appdata'
+differs, and thus the configuration and cache folders, runs its command in-process.
+
+Clients connect to a Unix socket, or to a local TCP port where Unix sockets are not
+supported. The address and an access token are published in `DAEMON_INFO_PATH`,
+see `client` for the other side.
+"""
+from __future__ import annotations
+
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+import threading
+import traceback
+import secrets
+import socket
+import hmac
+import json
+import sys
+import io
+import os
+
+from .config import USER_CACHE_DIR, USER_CONFIG_PATH
+from .client import DAEMON_INFO_PATH, NO_DAEMON_ENV, _read_message
+
+
+# Unix socket of the daemon, where supported
+DAEMON_SOCKET_PATH = Path(USER_CACHE_DIR, "daemon.sock")
+
+
+class _ClientStream(io.TextIOBase):
+    """
+    Text stream forwarding everything written to it to a client, as 'out' or 'err' messages.
+    """
+
+    def __init__(self, connection: socket.socket, kind: str, lock: threading.Lock):
+        self.connection = connection
+        self.kind = kind
+        self.lock = lock
+
+    @property
+    def encoding(self) -> str:
+        return "utf-8"
+
+    def writable(self) -> bool:
+        return True
+
+    def isatty(self) -> bool:
+        return False
+
+    def write(self, text: str) -> int:
+        if text:
+            _send(self.connection, {self.kind: text}, self.lock)
+
+        return len(text)
+
+
+def _send(connection: socket.socket, message: dict, lock: threading.Lock = None) -> None:
+    """
+    Sends a message to a client, ignoring clients which went away.
+    """
+    data = (json.dumps(message) + "\n").encode()
+
+    try:
+        if lock is None:
+            connection.sendall(data)
+        else:
+            with lock:
+                connection.sendall(data)
+
+    except OSError:
+        pass
+
+
+def _env_value(env: Dict[str, str], name: str) -> Optional[str]:
+    """
+    Returns an environment variable of a client, names being case-insensitive on Windows.
+    """
+    return next((value for key, value in env.items() if os.path.normcase(key) == os.path.normcase(name)), None)
+
+
+class Daemon:
+    """
+    Server side: accepts clients and runs their commands one at a time, as they
+    change the working directory and redirect the standard outputs.
+    """
+
+    def __init__(self):
+        self.token = secrets.token_hex(16)
+        self.server: Optional[socket.socket] = None
+        self.run_lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.watchers: Dict[Path, object] = dict()
+        self.checked: Set[Path] = set()
+        self.events = sys.platform.startswith("linux")
+
+    def _bind(self) -> dict:
+        """
+        Opens the listening socket, and returns the address clients connect to.
+        """
+        os.makedirs(USER_CACHE_DIR, exist_ok=True)
+
+        if hasattr(socket, "AF_UNIX"):
+            DAEMON_SOCKET_PATH.unlink(missing_ok=True)
+
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server.bind(str(DAEMON_SOCKET_PATH))
+            os.chmod(DAEMON_SOCKET_PATH, 0o600)
+            address = {"unix": str(DAEMON_SOCKET_PATH)}
+
+        else:
+            self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server.bind(("127.0.0.1", 0))
+            address = {"tcp": list(self.server.getsockname())}
+
+        self.server.listen()
+        return address
+
+    def serve(self) -> None:
+        """
+        Serves clients until a 'stop' request or Ctrl+C.
+        """
+        os.environ[NO_DAEMON_ENV] = "1"
+        address = self._bind()
+        infos = {**address, "token": self.token, "pid": os.getpid()}
+
+        fd = os.open(DAEMON_INFO_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+
+        with os.fdopen(fd, "w") as writer:
+            json.dump(infos, writer)
+
+        print(f"sdutils daemon listening on {address}, pid {os.getpid()}")
+
+        try:
+            while not self.stopping.is_set():
+
+                try:
+                    connection, _ = self.server.accept()
+                except OSError:
+                    break
+
+                threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+
+        except KeyboardInterrupt:
+            pass
+
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self.stopping.set()
+
+        if self.server is not None:
+            self.server.close()
+
+        for watcher in self.watchers.values():
+            watcher.close()
+
+        Path(DAEMON_INFO_PATH).unlink(missing_ok=True)
+
+        if hasattr(socket, "AF_UNIX"):
+            DAEMON_SOCKET_PATH.unlink(missing_ok=True)
+
+    def _handle(self, connection: socket.socket) -> None:
+        with connection, connection.makefile("r", encoding="utf-8") as reader:
+
+            try:
+                request = _read_message(reader)
+            except ValueError:
+                return
+
+            if request is None or not hmac.compare_digest(str(request.get("token")), self.token):
+                _send(connection, {"err": "invalid daemon token\n", "exit": 1})
+                return
+
+            match request.get("op"):
+                case "ping":
+                    _send(connection, {"exit": 0, "pid": os.getpid()})
+
+                case "stop":
+                    _send(connection, {"exit": 0})
+                    self.stopping.set()
+
+                    try:
+                        self.server.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+
+                    self.server.close()
+
+                case "run":
+                    env = request.get("env") or dict(os.environ)
+
+                    if _env_value(env, "appdata") != os.environ.get("appdata"):
+                        _send(connection, {"fallback": "the daemon runs with another 'appdata'"})
+                        return
+
+                    with self.run_lock:
+                        code = self._run(connection, Path(request["cwd"]), request["argv"], env)
+
+                    _send(connection, {"exit": code})
+
+    def _watch_roots(self, root: Path) -> List:
+        """
+        Lists what to watch for a project: its tree, its Git folder and refs, and its C# project.
+        """
+        from .commands.build import ModBuilder
+        from . import git
+
+        builder = ModBuilder(root)
+        roots = builder._watch_roots()
+
+        git_dir = git.get_repository(builder.root_dir).git_dir
+
+        if git_dir is not None:
+            roots.append((git_dir, False))
+            roots.append((Path(git_dir, "refs"), True))
+
+        return roots
+
+    def _watch(self, cwd: Path) -> None:
+        """
+        Starts watching the project of `cwd` and its dependencies, the first time they are served
+        and again once their configuration changed, as it may list new folders, such as prefabs.
+        """
+        from .commands.build import ModBuilder, invalidate_caches
+        from .dependencies import DependencyGraph
+        from .watch import InotifyWatcher
+
+        cwd = Path(cwd).resolve()
+
+        if cwd in self.checked or not Path(cwd, "sdutils.json").exists():
+            return
+
+        graph = DependencyGraph(ModBuilder(cwd))
+        self.checked.add(cwd)
+
+        for root in graph.nodes:
+
+            roots = self._watch_roots(root) + [(USER_CONFIG_PATH.parent, False)]
+
+            if root in self.watchers:
+                if not self.watchers[root].add_roots(roots):
+                    continue
+
+            else:
+                try:
+                    self.watchers[root] = InotifyWatcher(roots)
+                except OSError as e:
+                    print(f"WRN: can't watch '{root}', caches are now checked before each command: {e}")
+                    self.events = False
+                    return
+
+            # drops what was read while listing the roots, before the watcher existed
+            invalidate_caches([root])
+
+    def _invalidate(self) -> None:
+        """
+        Invalidates the caches touched by the file changes which happened since the last command.
+        """
+        from .commands.build import invalidate_caches
+
+        if not self.events:
+            invalidate_caches()
+            return
+
+        changes = set()
+
+        for watcher in self.watchers.values():
+            changes |= watcher.pending()
+
+        # archives written at the root of the projects by the commands themselves
+        changes = {
+            path for path in changes
+            if not (path.parent in self.watchers and path.name.endswith((".zip", ".zip.tmp")))
+        }
+
+        if any(path.name == "sdutils.json" for path in changes):
+            self.checked.clear()
+
+        if changes:
+            invalidate_caches(changes)
+
+    def _use_env(self, env: Dict[str, str]) -> None:
+        """
+        Replaces the environment variables of the daemon with the ones of a client, dropping
+        every cache when they changed, as C# projects and Git states depend on them.
+        """
+        from .commands.build import invalidate_caches
+
+        env = {**env, NO_DAEMON_ENV: "1"}
+
+        if env == dict(os.environ):
+            return
+
+        os.environ.clear()
+        os.environ.update(env)
+        invalidate_caches()
+        self.checked.clear()
+
+    def _run(self, connection: socket.socket, cwd: Path, argv: List[str], env: Dict[str, str]) -> int:
+        """
+        Runs a command line in `cwd` with the environment variables `env`, streaming its
+        outputs to the client.
+
+        Returns:
+            The exit code of the command.
+        """
+        from .cli import cli
+        import click
+
+        send_lock = threading.Lock()
+        stdout = _ClientStream(connection, "out", send_lock)
+        stderr = _ClientStream(connection, "err", send_lock)
+        previous_cwd = os.getcwd()
+
+        try:
+            os.chdir(cwd)
+
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+
+                try:
+                    self._use_env(env)
+                    self._invalidate()
+
+                    if self.events:
+                        self._watch(cwd)
+
+                    cli.main(args=argv, prog_name="sdutils", standalone_mode=False)
+                    return 0
+
+                except click.exceptions.Exit as e:
+                    return e.exit_code
+
+                except click.ClickException as e:
+                    e.show(file=stderr)
+                    return e.exit_code
+
+                except click.Abort:
+                    print("Aborted!", file=stderr)
+                    return 1
+
+                except SystemExit as e:
+                    if isinstance(e.code, int) or e.code is None:
+                        return e.code or 0
+
+                    print(e.code, file=stderr)
+                    return 1
+
+                except Exception:
+                    traceback.print_exc(file=stderr)
+                    return 1
+
+        finally:
+            os.chdir(previous_cwd)
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from .pipeline import run_graph
+
+
+class DependencyGraph:
+    """
+    Directed acyclic graph of a mod and all its transitive dependencies.
+
+    Every reachable 'sdutils.json' is loaded once, so that a dependency shared by
+    several mods appears as a single node. Nodes are builders, created from the
+    class of the root builder, and are identified by their resolved root directory.
+    """
+
+    def __init__(self, root):
+        """
+        Loads the dependency graph of the given root builder.
+
+        Raises:
+            SystemExit: If a dependency has no 'sdutils.json', or if the graph has a cycle.
+        """
+        self.root = root
+        self.nodes: Dict[Path, object] = {root.root_dir: root}
+        self.edges: Dict[Path, List[Path]] = dict()
+        self.order: List[Path] = list()
+
+        self._visit(root.root_dir, list())
+
+    def _load(self, path: Path):
+        """
+        Returns the builder of the mod located at `path`, loading it on first access.
+        """
+        if path not in self.nodes:
+
+            build_infos = Path(path, "sdutils.json")
+
+            if not build_infos.exists():
+                raise SystemExit(f"Can't find '{build_infos}'")
+
+            self.nodes[path] = type(self.root)(path)
+
+        return self.nodes[path]
+
+    def _visit(self, path: Path, stack: List[Path]):
+        """
+        Depth-first traversal filling `edges` and the topological `order`,
+        dependencies being placed before their dependents.
+        """
+        if path in stack:
+            cycle = stack[stack.index(path):] + [path]
+            names = " -> ".join(self.nodes[p].mod_name for p in cycle)
+            raise SystemExit(f"dependency cycle: {names}")
+
+        if path in self.edges:
+            return
+
+        builder = self._load(path)
+        self.edges[path] = [dep.resolve() for dep in builder.dependencies]
+
+        for dep in self.edges[path]:
+            self._load(dep)
+            self._visit(dep, stack + [path])
+
+        self.order.append(path)
+
+    @property
+    def dependencies(self) -> List:
+        """
+        All the builders of the graph except the root one, in topological order.
+        """
+        return [self.nodes[path] for path in self.order if path != self.root.root_dir]
+
+    def run(self, task: Callable[[object], None], jobs: int = 1) -> List:
+        """
+        Runs `task` once for every dependency of the root, in a pool of `jobs` workers.
+
+        A node is only submitted once all its own dependencies are done, so that
+        independent nodes run concurrently while the topological order is kept.
+        The first failure cancels the pending tasks and is raised again.
+
+        Returns:
+            The dependency builders, in topological order.
+        """
+        graph = {path: self.edges[path] for path in self.order if path != self.root.root_dir}
+        run_graph(graph, lambda path: task(self.nodes[path]), jobs)
+
+        return self.dependencies
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+from xml.etree import ElementTree
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import threading
+import hashlib
+import json
+import glob
+import os
+import re
+
+
+# Folders never searched for the implicit sources of SDK-style projects
+_IGNORED_DIRS = {"bin", "obj", "build"}
+
+# Files imported by MSBuild from the project folder or its nearest parent holding them
+_DIRECTORY_IMPORTS = ("Directory.Build.props", "Directory.Build.targets")
+
+_MACRO_PATTERN = re.compile(r"\$\((\w+)\)")
+
+
+class CsProject:
+    """
+    Minimal reader of a C# project file, listing what a compilation depends on.
+
+    Both legacy projects, listing their sources with `<Compile Include>` items,
+    and SDK-style projects, including every '*.cs' file implicitly, are handled.
+    The files imported by the project and the projects it references are listed
+    too, but not read further.
+    """
+
+    def __init__(self, path: Path, defaults: Dict[str, str] = None):
+        """
+        Args:
+            path: Path of the '.csproj' file.
+            defaults: Values of the `$(NAME)` macros, used when no environment variable defines them.
+        """
+        self.path = path
+        self.dir = path.parent
+        self.defaults = defaults
+        self.properties = {**(defaults or dict()), **os.environ}
+
+        self.root = ElementTree.parse(path).getroot()
+        self.is_sdk = "Sdk" in self.root.attrib
+        self._sources: Optional[List[Path]] = None
+
+    def _elements(self, tag: str) -> List[ElementTree.Element]:
+        """
+        Returns all the elements with the given tag, whatever their XML namespace.
+        """
+        return [e for e in self.root.iter() if e.tag.rsplit("}", 1)[-1] == tag]
+
+    def _expand(self, value: str) -> str:
+        """
+        Expands the `$(NAME)` macros of a value, and normalizes path separators.
+        """
+        value = _MACRO_PATTERN.sub(lambda match: self.properties.get(match.group(1), ""), value)
+        return value.replace("\\", "/")
+
+    def _property(self, name: str) -> Optional[str]:
+        """
+        Returns the first defined value of a project property.
+        """
+        for element in self._elements(name):
+            if element.text and element.text.strip():
+                return self._expand(element.text.strip())
+
+        return None
+
+    def sources(self) -> List[Path]:
+        """
+        Lists the C# source files compiled by the project, once per instance.
+        """
+        if self._sources is None:
+            self._sources = self._glob_sources()
+
+        return self._sources
+
+    def _glob_sources(self) -> List[Path]:
+        patterns = [self._expand(e.attrib["Include"]) for e in self._elements("Compile") if "Include" in e.attrib]
+
+        if self.is_sdk:
+            patterns.append("**/*.cs")
+
+        sources = set()
+
+        for pattern in patterns:
+            for element in glob.glob(pattern, root_dir=self.dir, recursive=True):
+
+                path = Path(self.dir, element).resolve()
+
+                if path.is_file() and not _IGNORED_DIRS.intersection(path.relative_to(self.dir.resolve()).parts[:-1]):
+                    sources.add(path)
+
+        return sorted(sources)
+
+    def references(self) -> List[Path]:
+        """
+        Lists the assemblies referenced through a `<HintPath>`, such as the game DLLs.
+        """
+        return [Path(self._expand(e.text.strip())) for e in self._elements("HintPath") if e.text]
+
+    def imports(self) -> List[Path]:
+        """
+        Lists the files imported by the project: its `<Import Project>` elements, and
+        the 'Directory.Build.props' and 'Directory.Build.targets' files found by MSBuild.
+        """
+        imports = [
+            Path(self.dir, self._expand(e.attrib["Project"])).resolve()
+            for e in self._elements("Import")
+            if "Project" in e.attrib and "Sdk" not in e.attrib
+        ]
+
+        for name in _DIRECTORY_IMPORTS:
+            for folder in [self.dir, *self.dir.parents]:
+
+                if Path(folder, name).is_file():
+                    imports.append(Path(folder, name))
+                    break
+
+        return imports
+
+    def project_references(self) -> List[Path]:
+        """
+        Lists the C# projects referenced through a `<ProjectReference>`, built along with this one.
+        """
+        return [
+            Path(self.dir, self._expand(e.attrib["Include"])).resolve()
+            for e in self._elements("ProjectReference")
+            if "Include" in e.attrib
+        ]
+
+    def output_assembly(self) -> Path:
+        """
+        Returns the path of the DLL produced by the project.
+        """
+        output_path = self._property("OutputPath") or "bin"
+        assembly_name = self._property("AssemblyName") or self.path.stem
+
+        return Path(self.dir, output_path, f"{assembly_name}.dll").resolve()
+
+    def fingerprint(self) -> str:
+        """
+        Computes a hash of every compilation input: the project file content, then
+        the path, size and mtime of each source file, imported file and referenced
+        assembly, and the fingerprints of the referenced projects. Missing files are
+        part of the hash too.
+        """
+        return self._fingerprint(set())
+
+    def _fingerprint(self, visited: set) -> str:
+        visited.add(self.path.resolve())
+        digest = hashlib.sha256(self.path.read_bytes())
+
+        for path in self.sources() + self.imports() + self.references():
+            try:
+                stat = path.stat()
+                digest.update(f"{path}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+            except OSError:
+                digest.update(f"{path}|missing\n".encode())
+
+        for path in self.project_references():
+
+            if path in visited:
+                continue
+
+            try:
+                digest.update(f"{path}|{get_project(path, self.defaults)._fingerprint(visited)}\n".encode())
+            except (OSError, ElementTree.ParseError):
+                digest.update(f"{path}|missing\n".encode())
+
+        return digest.hexdigest()
+
+
+_projects: Dict[Tuple[Path, Tuple], CsProject] = dict()
+_projects_lock = threading.Lock()
+
+
+def get_project(path: Path, defaults: Dict[str, str] = None) -> CsProject:
+    """
+    Returns the memoized reader of a C# project, parsed and globbed on first access.
+    """
+    key = (Path(path).resolve(), tuple(sorted((defaults or dict()).items())))
+
+    with _projects_lock:
+        if key not in _projects:
+            _projects[key] = CsProject(path, defaults)
+
+        return _projects[key]
+
+
+def invalidate(path: Path = None) -> None:
+    """
+    Forgets the memoized projects whose folder holds or is inside `path`, or all of them.
+    """
+    with _projects_lock:
+        for key in list(_projects):
+            project_dir = key[0].parent
+
+            if path is None or Path(path).is_relative_to(project_dir) or project_dir.is_relative_to(path):
+                del _projects[key]
+
+
+class CompileCache:
+    """
+    Remembers the fingerprint of the last successful compilation of a project,
+    in the MSBuild intermediate folder 'obj'.
+    """
+
+    def __init__(self, project: CsProject):
+        self.project = project
+        self.path = Path(project.dir, "obj", "sdutils-compile.json")
+
+    def _read(self) -> Optional[str]:
+        try:
+            with open(self.path, "rb") as reader:
+                return json.load(reader).get("fingerprint")
+
+        except (OSError, ValueError):
+            return None
+
+    def is_up_to_date(self, fingerprint: str) -> bool:
+        """
+        Tells if the project was already compiled from the same inputs,
+        and if its output assembly is still present.
+        """
+        return self._read() == fingerprint and self.project.output_assembly().exists()
+
+    def save(self, fingerprint: str) -> None:
+        os.makedirs(self.path.parent, exist_ok=True)
+
+        with open(self.path, "w") as writer:
+            json.dump({"fingerprint": fingerprint}, writer)
+
+    def clear(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+def build_command(csproj: Path, build_server: bool = True) -> List[str]:
+    """
+    Returns the 'dotnet build' command of a project.
+
+    Args:
+        build_server: Keep the MSBuild nodes and the compiler server alive once done,
+            so that the next builds skip their startup, as dotnet does by default.
+            Otherwise both are shut down with the build.
+    """
+    command = ["dotnet", "build", str(csproj)]
+
+    if not build_server:
+        command += ["-nodeReuse:false", "-p:UseSharedCompilation=false"]
+
+    return command
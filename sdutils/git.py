@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, List, Optional
+import subprocess
+import threading
+import hashlib
+
+
+class GitRepository:
+    """
+    Read-only view of a Git working tree, memoized for the whole run.
+
+    The commit hash is read straight from the '.git' folder (HEAD, loose refs
+    and packed-refs), without spawning any process. The working tree state comes
+    from a single 'git status --porcelain=v2' call, only made on first need.
+
+    Use `get_repository` to share instances between builders.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.work_tree, self.git_dir = _find_git_dir(path)
+        self.common_dir = _read_common_dir(self.git_dir)
+
+        self._lock = threading.Lock()
+        self._commit_hash: Optional[str] = None
+        self._commit_hash_read = False
+        self._status: Optional[List[str]] = None
+
+    @property
+    def commit_hash(self) -> Optional[str]:
+        """
+        SHA of the commit checked out, or None outside of a repository or before the first commit.
+        """
+        with self._lock:
+            if not self._commit_hash_read:
+                self._commit_hash = self._read_head()
+                self._commit_hash_read = True
+
+        return self._commit_hash
+
+    def _read_head(self) -> Optional[str]:
+        if self.git_dir is None:
+            return None
+
+        try:
+            head = Path(self.git_dir, "HEAD").read_text().strip()
+        except OSError:
+            return None
+
+        if not head.startswith("ref:"):
+            return head or None
+
+        return self._resolve_ref(head[4:].strip())
+
+    def _resolve_ref(self, ref: str) -> Optional[str]:
+        """
+        Resolves a ref name such as 'refs/heads/main', from its loose file first, then from packed-refs.
+        """
+        for root in (self.git_dir, self.common_dir):
+
+            loose = Path(root, ref)
+
+            if loose.is_file():
+                value = loose.read_text().strip()
+                return self._resolve_ref(value[4:].strip()) if value.startswith("ref:") else value
+
+        try:
+            with open(Path(self.common_dir, "packed-refs"), "r") as reader:
+                for line in reader:
+
+                    if line.startswith(("#", "^")):
+                        continue
+
+                    sha, _, name = line.strip().partition(" ")
+
+                    if name == ref:
+                        return sha
+
+        except OSError:
+            pass
+
+        return None
+
+    @property
+    def status(self) -> List[str]:
+        """
+        Lines of 'git status --porcelain=v2 --untracked-files=no', without the headers.
+        """
+        with self._lock:
+            if self._status is None:
+                self._status = self._read_status()
+
+        return self._status
+
+    def _read_status(self) -> List[str]:
+        if self.work_tree is None:
+            return list()
+
+        try:
+            result = subprocess.run(
+                ["git", "-C", str(self.work_tree), "status", "--porcelain=v2", "--untracked-files=no"],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+
+        except (OSError, subprocess.CalledProcessError):
+            return list()
+
+        return [line for line in result.stdout.splitlines() if line and not line.startswith("#")]
+
+    @property
+    def pending_modifications(self) -> int:
+        """
+        Number of staged plus unstaged changes of tracked files, a file changed
+        in both the index and the working tree counting twice.
+        """
+        count = 0
+
+        for line in self.status:
+            if line[0] in "12u":
+                xy = line.split(" ", 2)[1]
+                count += (xy[0] != ".") + (xy[1] != ".")
+
+        return count
+
+    @property
+    def is_dirty(self) -> bool:
+        return bool(self.status)
+
+    def fingerprint(self) -> str:
+        """
+        Hash identifying the working tree state: the commit hash alone when the tree
+        is clean, else combined with the status and the size and mtime of every
+        changed tracked file. Two dirty builds thus only match if no changed file
+        was touched in-between. Untracked files are left out, so that listing them
+        does not walk the whole tree.
+        """
+        if not self.is_dirty:
+            return str(self.commit_hash)
+
+        digest = hashlib.sha256(str(self.commit_hash).encode())
+
+        for line in self.status:
+
+            digest.update(line.encode() + b"\n")
+            path = Path(self.work_tree, _status_path(line))
+
+            try:
+                stat = path.stat()
+                digest.update(f"{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+            except OSError:
+                digest.update(b"missing\n")
+
+        return digest.hexdigest()
+
+
+# Number of fields before the path, by kind of 'git status --porcelain=v2' entry
+_STATUS_FIELDS = {"1": 8, "2": 9, "u": 10, "?": 1, "!": 1}
+
+
+def _status_path(line: str) -> str:
+    """
+    Extracts the path of a 'git status --porcelain=v2' entry, the new path for renames.
+    """
+    path = line.split(" ", _STATUS_FIELDS[line[0]])[-1]
+    return path.split("\t", 1)[0]
+
+
+def _find_git_dir(path: Path):
+    """
+    Looks for the '.git' entry of `path` or of one of its parents, following
+    the 'gitdir:' pointer files used by worktrees and submodules.
+
+    Returns:
+        The work tree and git directory, or (None, None) outside of a repository.
+    """
+    path = Path(path).resolve()
+
+    for work_tree in [path] + list(path.parents):
+
+        dot_git = Path(work_tree, ".git")
+
+        if dot_git.is_dir():
+            return work_tree, dot_git
+
+        if dot_git.is_file():
+            content = dot_git.read_text().strip()
+
+            if content.startswith("gitdir:"):
+                return work_tree, Path(work_tree, content[7:].strip()).resolve()
+
+    return None, None
+
+
+def _read_common_dir(git_dir: Optional[Path]) -> Optional[Path]:
+    """
+    Returns the folder holding the shared refs of a linked worktree, or `git_dir` itself.
+    """
+    if git_dir is None:
+        return None
+
+    common_dir = Path(git_dir, "commondir")
+
+    if common_dir.is_file():
+        return Path(git_dir, common_dir.read_text().strip()).resolve()
+
+    return git_dir
+
+
+_repositories: Dict[Path, GitRepository] = dict()
+_repositories_lock = threading.Lock()
+
+
+def get_repository(path: Path) -> GitRepository:
+    """
+    Returns the memoized view of the repository holding `path`, created on first access.
+    Paths of a same work tree share the same instance.
+    """
+    path = Path(path).resolve()
+    key = _find_git_dir(path)[0] or path
+
+    with _repositories_lock:
+        if key not in _repositories:
+            _repositories[key] = GitRepository(key)
+
+        return _repositories[key]
+
+
+def invalidate(path: Path = None) -> None:
+    """
+    Forgets the memoized repository holding `path`, or all of them, so that the
+    next access reads the commit and the working tree state again.
+    """
+    with _repositories_lock:
+        for key in list(_repositories):
+            if path is None or Path(path).is_relative_to(key) or key.is_relative_to(path):
+                del _repositories[key]
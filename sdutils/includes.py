@@ -0,0 +1,383 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import threading
+import fnmatch
+import hashlib
+import json
+import glob
+import os
+import re
+
+from .config import USER_CACHE_DIR
+
+
+# Bump when the cache layout changes, older caches are then discarded
+CACHE_VERSION = 2
+
+# Marker of a `**` pattern component, matching any number of folders
+_RECURSIVE = None
+
+# Patterns are case-insensitive where paths are, as with `glob`
+_FLAGS = re.IGNORECASE if os.path.normcase("A") == "a" else 0
+
+Component = Optional[Callable[[str], bool]]
+
+
+def _compile_component(component: str) -> Component:
+    """
+    Compiles one part of a glob pattern into a name predicate.
+
+    As with `glob`, wildcards don't match hidden names unless the part itself starts with a dot.
+    """
+    if component == "**":
+        return _RECURSIVE
+
+    match = re.compile(fnmatch.translate(component), _FLAGS).match
+    hidden = component.startswith(".")
+
+    return lambda name: (hidden or not name.startswith(".")) and match(name) is not None
+
+
+def _compile(pattern: str) -> List[Component]:
+    parts = [part for part in pattern.replace("\\", "/").split("/") if part not in ("", ".")]
+    return [_compile_component(part) for part in parts]
+
+
+def _matches(pattern: List[Component], parts: List[str]) -> bool:
+    """
+    Tells if the relative path `parts` matches the compiled `pattern` as a whole.
+    """
+    if not pattern:
+        return not parts
+
+    head = pattern[0]
+
+    if head is _RECURSIVE:
+        if _matches(pattern[1:], parts):
+            return True
+
+        return bool(parts) and not parts[0].startswith(".") and _matches(pattern, parts[1:])
+
+    return bool(parts) and head(parts[0]) and _matches(pattern[1:], parts[1:])
+
+
+def _may_match_below(pattern: List[Component], parts: List[str]) -> bool:
+    """
+    Tells if a path under the folder `parts` may match `pattern`, so that the folder has to be walked.
+    """
+    if not pattern:
+        return False
+
+    head = pattern[0]
+
+    if head is _RECURSIVE:
+        return True
+
+    if not parts:
+        return True
+
+    return head(parts[0]) and _may_match_below(pattern[1:], parts[1:])
+
+
+def _is_external(pattern: str) -> bool:
+    """
+    Tells if an 'include' pattern may match outside of the project folder.
+    """
+    pattern = pattern.replace("\\", "/")
+    return os.path.isabs(pattern) or ".." in pattern.split("/")
+
+
+@dataclass
+class DirListing:
+    """
+    Content of a walked folder of the project.
+
+    Attributes:
+        mtime: Last modification time of the folder when listed, in nanoseconds.
+        files: Sorted file names.
+        dirs: Sorted sub-folder names.
+    """
+    mtime: int
+    files: List[str]
+    dirs: List[str]
+
+
+class Exclusion:
+    """
+    An 'exclude' pattern of 'sdutils.json'.
+
+    A pattern without slash is matched against every file and folder name, such as
+    `*.psd` or `Thumbs.db`. Other patterns are matched against the whole path relative
+    to the project folder, such as `Resources/Ignore`. A trailing slash restricts the
+    pattern to folders. An excluded folder is not walked at all.
+    """
+
+    def __init__(self, pattern: str):
+        pattern = pattern.replace("\\", "/")
+
+        self.dirs_only = pattern.endswith("/")
+        pattern = pattern.strip("/")
+        self.anchored = "/" in pattern
+        self.pattern = _compile(pattern)
+
+    def matches(self, parts: List[str], is_dir: bool) -> bool:
+        if self.dirs_only and not is_dir:
+            return False
+
+        if self.anchored:
+            return _matches(self.pattern, parts)
+
+        return _matches(self.pattern, parts[-1:])
+
+
+class IncludeResolver:
+    """
+    Resolves the 'include' and 'exclude' patterns of a project into the files to package.
+
+    All patterns are matched during a single walk of the project folder, which only
+    enters the folders some pattern can match in, and never the excluded ones.
+
+    The result is cached along with the listing and mtime of every walked folder. As long
+    as these mtimes are unchanged, no file was added, removed or renamed there, so the
+    cached result is returned without walking. Otherwise, only the changed folders are
+    listed again. The cache is persisted in `USER_CACHE_DIR`.
+
+    Once checked, the result is trusted for the rest of the run, or until `invalidate`.
+
+    Use `get_resolver` to share instances within a run.
+    """
+
+    def __init__(self, root: Path, include: List[str], exclude: List[str] = ()):
+        self.root = Path(root).resolve()
+        self.include = list(include)
+        self.exclude = list(exclude)
+
+        self.patterns = [_compile(pattern) for pattern in self.include if not _is_external(pattern)]
+        self.external = [pattern for pattern in self.include if _is_external(pattern)]
+        self.exclusions = [Exclusion(pattern) for pattern in self.exclude]
+
+        digest = hashlib.sha1(str(self.root).encode()).hexdigest()[:12]
+        self.path = Path(USER_CACHE_DIR, f"includes-{digest}.json")
+        self.dirs: Dict[str, DirListing] = dict()
+        self.entries: Dict[str, str] = dict()
+        self.lock = threading.Lock()
+        self.verified = False
+
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "rb") as reader:
+                datas: dict = json.load(reader)
+
+        except (OSError, ValueError):
+            return
+
+        if datas.get("version") != CACHE_VERSION:
+            return
+
+        if datas.get("include") != self.include or datas.get("exclude") != self.exclude:
+            return
+
+        self.dirs = {name: DirListing(*listing) for name, listing in datas["dirs"].items()}
+        self.entries = datas["entries"]
+
+    def save(self) -> None:
+        datas = {
+            "version": CACHE_VERSION,
+            "include": self.include,
+            "exclude": self.exclude,
+            "dirs": {name: [listing.mtime, listing.files, listing.dirs] for name, listing in self.dirs.items()},
+            "entries": self.entries,
+        }
+
+        os.makedirs(self.path.parent, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+
+        with open(tmp_path, "w") as writer:
+            json.dump(datas, writer)
+
+        os.replace(tmp_path, self.path)
+
+    def _is_fresh(self) -> bool:
+        if not self.dirs:
+            return False
+
+        for name, listing in self.dirs.items():
+            try:
+                if Path(self.root, name).stat().st_mtime_ns != listing.mtime:
+                    return False
+
+            except OSError:
+                return False
+
+        return True
+
+    def _excluded(self, parts: List[str], is_dir: bool) -> bool:
+        return any(exclusion.matches(parts, is_dir) for exclusion in self.exclusions)
+
+    def _list_dir(self, parts: List[str], dirs: Dict[str, DirListing]) -> Optional[DirListing]:
+        """
+        Lists a folder of the project, reusing its cached listing when its mtime is unchanged.
+        """
+        name = "/".join(parts)
+        path = Path(self.root, *parts)
+
+        try:
+            mtime = path.stat().st_mtime_ns
+            listing = self.dirs.get(name)
+
+            if listing is None or listing.mtime != mtime:
+
+                files, sub_dirs = list(), list()
+
+                with os.scandir(path) as iterator:
+                    for entry in iterator:
+                        if entry.is_dir():
+                            sub_dirs.append(entry.name)
+                        elif entry.is_file():
+                            files.append(entry.name)
+
+                listing = DirListing(mtime, sorted(files), sorted(sub_dirs))
+
+        except OSError:
+            return None
+
+        dirs[name] = listing
+        return listing
+
+    def _walk(self) -> None:
+        """
+        Walks the project folder once, matching every pattern at the same time.
+
+        A folder matching a pattern is included with all its files, under its own
+        name, the same way files matching a pattern are included under their path.
+        """
+        dirs, entries = dict(), dict()
+
+        def visit(parts: List[str], anchors: List[Tuple[str, int]]) -> None:
+            listing = self._list_dir(parts, dirs)
+
+            if listing is None:
+                return
+
+            for name in listing.dirs:
+
+                entry_parts = parts + [name]
+
+                if self._excluded(entry_parts, True):
+                    continue
+
+                if any(_matches(pattern, entry_parts) for pattern in self.patterns):
+                    visit(entry_parts, anchors + [(name, len(entry_parts))])
+
+                elif anchors or any(_may_match_below(pattern, entry_parts) for pattern in self.patterns):
+                    visit(entry_parts, anchors)
+
+            for name in listing.files:
+
+                entry_parts = parts + [name]
+
+                if self._excluded(entry_parts, False):
+                    continue
+
+                rel = "/".join(entry_parts)
+
+                for prefix, depth in anchors:
+                    entries["/".join([prefix] + entry_parts[depth:])] = rel
+
+                if any(_matches(pattern, entry_parts) for pattern in self.patterns):
+                    entries[rel] = rel
+
+        visit(list(), list())
+
+        self.dirs = dirs
+        self.entries = entries
+
+    def _resolve_external(self) -> Dict[str, Path]:
+        """
+        Resolves the patterns reaching outside of the project folder, which are not cached.
+        """
+        entries = dict()
+
+        for include in self.external:
+            for element in glob.glob(include, recursive=True, root_dir=self.root):
+
+                path = Path(self.root, element)
+
+                if path.is_dir():
+                    for file in path.rglob("*"):
+                        name = Path(path.name, file.relative_to(path))
+
+                        if file.is_file() and not self._excluded(list(name.parts), False):
+                            entries[name.as_posix()] = file
+
+                elif not self._excluded([path.name], False):
+                    try:
+                        entries[path.relative_to(self.root).as_posix()] = path
+                    except ValueError:
+                        entries[path.name] = path
+
+        return entries
+
+    def resolve(self) -> Dict[str, Path]:
+        """
+        Returns the files to package.
+
+        Returns:
+            A mapping of POSIX paths relative to the build directory to source files.
+        """
+        with self.lock:
+
+            if not self.verified and not self._is_fresh():
+                self._walk()
+                self.save()
+
+            self.verified = True
+            entries = {name: Path(self.root, rel) for name, rel in self.entries.items()}
+
+        entries.update(self._resolve_external())
+
+        return entries
+
+    def invalidate(self) -> None:
+        """
+        Makes the next resolution check the project folder again.
+        """
+        self.verified = False
+
+
+_resolvers: Dict[Path, IncludeResolver] = dict()
+_resolvers_lock = threading.Lock()
+
+
+def get_resolver(root: Path, include: List[str], exclude: List[str] = ()) -> IncludeResolver:
+    """
+    Returns the memoized resolver of a project folder, created again when its patterns changed.
+    """
+    root = Path(root).resolve()
+
+    with _resolvers_lock:
+        resolver = _resolvers.get(root)
+
+        if resolver is None or resolver.include != list(include) or resolver.exclude != list(exclude):
+            resolver = _resolvers[root] = IncludeResolver(root, include, exclude)
+
+        return resolver
+
+
+def invalidate(path: Path = None) -> None:
+    """
+    Invalidates the resolvers of the project folders holding or inside `path`, or all of them.
+    """
+    with _resolvers_lock:
+        for root, resolver in _resolvers.items():
+            if path is None or _is_related(root, Path(path)):
+                resolver.invalidate()
+
+
+def _is_related(root: Path, path: Path) -> bool:
+    return path == root or path.is_relative_to(root) or root.is_relative_to(path)
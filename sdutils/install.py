@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, asdict
+from zipfile import ZipFile
+from pathlib import Path
+from typing import Dict, Iterable
+import shutil
+import json
+import os
+
+from . import copying
+
+
+# Name of the state file written at the root of an installed mod
+INSTALL_STATE_NAME = ".sdutils-install.json"
+
+
+@dataclass
+class InstalledFile:
+    """
+    State of an installed file, as written from the mod archive.
+
+    Attributes:
+        crc: CRC32 of the archive member the file was extracted from.
+        size: Size of the installed file, in bytes.
+        mtime: Last modification time of the installed file, in nanoseconds.
+    """
+    crc: int
+    size: int
+    mtime: int
+
+
+@dataclass
+class InstallReport:
+    """
+    Summary of an install into a game 'Mods' folder.
+    """
+    written: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    bytes: int = 0
+    mode: str = "sync"
+
+    def __str__(self) -> str:
+        if self.mode != "sync":
+            return f"{self.mode} to build directory"
+
+        return f"{self.written} written, {self.unchanged} unchanged, {self.removed} removed"
+
+
+def _load_state(dst: Path) -> Dict[str, InstalledFile]:
+    """
+    Reads the install state of a mod folder, or returns an empty state.
+    """
+    path = Path(dst, INSTALL_STATE_NAME)
+
+    if not path.exists():
+        return dict()
+
+    try:
+        with open(path, "rb") as reader:
+            datas: dict = json.load(reader)
+
+        return {name: InstalledFile(**entry) for name, entry in datas.items()}
+
+    except (OSError, ValueError, TypeError):
+        return dict()
+
+
+def _save_state(dst: Path, state: Dict[str, InstalledFile]) -> None:
+    """
+    Writes the install state of a mod folder.
+    """
+    with open(Path(dst, INSTALL_STATE_NAME), "w") as writer:
+        json.dump({name: asdict(entry) for name, entry in sorted(state.items())}, writer)
+
+
+def remove_path(path: Path) -> None:
+    """
+    Removes a file, a directory tree, or a link without following it.
+    """
+    if path.is_symlink():
+        path.unlink()
+
+    elif path.is_dir():
+        shutil.rmtree(path)
+
+    elif path.exists():
+        path.unlink()
+
+
+def _prune_empty_dirs(root: Path) -> None:
+    """
+    Removes the empty sub-directories of `root`, deepest first.
+    """
+    for dir_path, _, _ in os.walk(root, topdown=False):
+        if Path(dir_path) != root and not os.listdir(dir_path):
+            os.rmdir(dir_path)
+
+
+def _member_path(dst: Path, root: Path, name: str) -> Path:
+    """
+    Returns the install path of the archive member `name`, `root` being `dst` resolved.
+
+    Raises:
+        SystemExit: If the member would be written outside of `dst`, such as '../x' or '/x'.
+    """
+    path = Path(dst, name)
+
+    if Path(name).is_absolute() or Path(name).drive or not path.resolve().is_relative_to(root):
+        raise SystemExit(f"Error: archive member '{name}' is outside of the mod folder '{dst}'")
+
+    return path
+
+
+def sync_archive(archive: Path, dst: Path) -> InstallReport:
+    """
+    Installs the content of a mod archive into `dst`, writing only what changed.
+
+    An installed file is kept when its size and mtime still match the install
+    state and the archive member has the same CRC as when it was written.
+    Files of `dst` which are not part of the archive are deleted.
+
+    Raises:
+        SystemExit: If a member would be written outside of `dst`, before anything is written.
+    """
+    report = InstallReport()
+
+    if dst.is_symlink() or (dst.exists() and not dst.is_dir()):
+        remove_path(dst)
+
+    state = _load_state(dst)
+    new_state = dict()
+
+    with ZipFile(archive, "r") as zip_file:
+
+        root = dst.resolve()
+        members = [(info, _member_path(dst, root, info.filename)) for info in zip_file.infolist() if not info.is_dir()]
+
+        for info, path in members:
+
+            entry = state.get(info.filename)
+
+            if entry is not None and entry.crc == info.CRC and path.is_file():
+
+                stat = path.stat()
+
+                if stat.st_size == entry.size and stat.st_mtime_ns == entry.mtime:
+                    new_state[info.filename] = entry
+                    report.unchanged += 1
+                    continue
+
+            # unlink first, the installed file may be a hardlink to the build output
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.unlink(missing_ok=True)
+
+            with zip_file.open(info) as reader, open(path, "wb") as writer:
+                shutil.copyfileobj(reader, writer, 1024 * 1024)
+
+            stat = path.stat()
+            new_state[info.filename] = InstalledFile(info.CRC, stat.st_size, stat.st_mtime_ns)
+            report.written += 1
+            report.bytes += stat.st_size
+
+    for dir_path, _, files in os.walk(dst):
+        for file in files:
+
+            path = Path(dir_path, file)
+            name = path.relative_to(dst).as_posix()
+
+            if name != INSTALL_STATE_NAME and name not in new_state:
+                path.unlink()
+                report.removed += 1
+
+    _prune_empty_dirs(dst)
+    _save_state(dst, new_state)
+
+    return report
+
+
+def sync_tree(src: Path, dst: Path, exclude: Iterable[str] = ()) -> InstallReport:
+    """
+    Mirrors the directory `src` into `dst`, copying only the files whose size
+    or mtime differ, and deleting the files of `dst` missing from `src`.
+
+    Copies keep the source mtime, which is what the next comparison relies on.
+    They replace the installed files rather than overwriting them, and run on
+    the shared copy engine, see `copying.copy_files`.
+    Member names listed in `exclude` are neither copied nor deleted.
+    """
+    report = InstallReport()
+    exclude = set(exclude) | {INSTALL_STATE_NAME}
+    names = set()
+    to_copy = list()
+
+    if dst.is_symlink() or (dst.exists() and not dst.is_dir()):
+        remove_path(dst)
+
+    for dir_path, _, files in os.walk(src):
+        for file in files:
+
+            path = Path(dir_path, file)
+            name = path.relative_to(src).as_posix()
+
+            if name in exclude:
+                continue
+
+            names.add(name)
+            target = Path(dst, name)
+            stat = path.stat()
+
+            if target.is_file() and not target.is_symlink():
+                target_stat = target.stat()
+
+                if target_stat.st_size == stat.st_size and target_stat.st_mtime_ns == stat.st_mtime_ns:
+                    report.unchanged += 1
+                    continue
+
+            to_copy.append((path, target))
+
+    report.bytes = copying.copy_files(to_copy, replace=True)
+    report.written = len(to_copy)
+
+    for dir_path, _, files in os.walk(dst):
+        for file in files:
+
+            path = Path(dir_path, file)
+            name = path.relative_to(dst).as_posix()
+
+            if name not in names and name not in exclude:
+                path.unlink()
+                report.removed += 1
+
+    _prune_empty_dirs(dst)
+    Path(dst, INSTALL_STATE_NAME).unlink(missing_ok=True)
+
+    return report
+
+
+def link_tree(src: Path, dst: Path) -> InstallReport:
+    """
+    Makes `dst` point to the directory `src`, so that the installed mod is the build output.
+
+    A directory symlink is tried first. When symlinks are not permitted, the tree
+    is mirrored with one hardlink per file, which requires both folders to be on
+    the same volume.
+
+    Raises:
+        SystemExit: If neither symlinks nor hardlinks can be created.
+    """
+    remove_path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        os.symlink(src, dst, target_is_directory=True)
+        return InstallReport(mode="symlink")
+
+    except OSError:
+        pass
+
+    try:
+        for dir_path, _, files in os.walk(src):
+
+            target_dir = Path(dst, Path(dir_path).relative_to(src))
+            target_dir.mkdir(parents=True, exist_ok=True)
+
+            for file in files:
+                os.link(Path(dir_path, file), Path(target_dir, file))
+
+    except OSError as e:
+        remove_path(dst)
+        raise SystemExit(f"Can't link '{src}' into '{dst}': {e}")
+
+    return InstallReport(mode="hardlink")
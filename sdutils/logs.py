@@ -0,0 +1,428 @@
+"""
+Streaming analyzer of the game and dedicated server output logs.
+
+Logs are memory mapped and searched for the lines worth reporting: only these lines
+and the stack traces following them are decoded, whatever the size of the log. A
+checkpoint records the byte offset reached in each log, along with the mod loading
+state, so that the next run only reads the lines appended since.
+"""
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import hashlib
+import json
+import mmap
+import os
+import re
+
+from .config import USER_CACHE_DIR
+
+
+# Byte offsets reached in each analyzed log, with the mod loading state at that offset
+CHECKPOINTS_PATH = Path(USER_CACHE_DIR, "logs.json")
+
+# Bump when the checkpoint layout changes, older checkpoints are then dropped
+CHECKPOINT_VERSION = 1
+
+# Bytes hashed at the start of a log, telling it from a newer log written at the same path
+HEAD_SIZE = 4096
+
+# Names of the output logs, in the user data folder or in the game folder
+LOG_PATTERNS = ("output_log*.txt",)
+
+# Lines worth decoding: errors, exceptions, warnings, and the mod loader lines
+MARKER = re.compile(rb" (?:ERR |EXC |WRN |INF \[MODS\] )")
+
+# Timestamped log line: date, uptime in seconds, level and message
+LINE = re.compile(r"^\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d (\d+\.\d+) (\w{3}) (.*)$")
+
+# Start of a timestamped log line, lines without one continue the previous line
+TIMESTAMP = re.compile(rb"\d{4}-\d\d-\d\dT")
+
+# Lines of the mod loader opening the loading or the initialization of a mod
+MOD_LOADED = re.compile(r"^\[MODS\] Loaded Mod: (\S+)")
+MOD_INITIALIZING = re.compile(r"^\[MODS\] Initializing mod (?!code\b)(\S+)")
+
+# Information line of anything but the mod loader, ending the initialization of the last
+# initialized mod: the loader has no line of its own once done with the mods
+OTHER_INFO = re.compile(rb"^\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d (\d+\.\d+) INF (?!\[MODS\])", re.MULTILINE)
+
+# Explicit mod reference in a message, as in 'XML patch for "items.xml" from mod "MyMod"'
+MOD_REFERENCE = re.compile(r"""\bmod ['"]([^'"]+)['"]""", re.IGNORECASE)
+
+# Category of a reported line, from the first pattern found in its message
+CATEGORIES = (
+    ("harmony", re.compile(r"Harmony")),
+    ("xml", re.compile(r"\bXML\b|\.xml\b")),
+    ("mods", re.compile(r"^\[MODS\]")),
+)
+
+# Stack trace lines kept per reported line, and read at most after it
+STACK_KEPT = 20
+STACK_LIMIT = 200
+
+
+@dataclass
+class LogEntry:
+    """
+    A reported log line, along with its repetitions.
+
+    Attributes:
+        level: 'ERR', 'EXC' or 'WRN'.
+        category: 'harmony', 'xml', 'mods', or 'other'.
+        mod: Name of the mod the line is attributed to, if any.
+        message: Message of the line, without its date and uptime.
+        count: Number of occurrences.
+        uptime: Uptime of the first occurrence, in seconds.
+        stack: First lines of the stack trace of the first occurrence.
+    """
+    level: str
+    category: str
+    mod: Optional[str]
+    message: str
+    count: int = 1
+    uptime: Optional[float] = None
+    stack: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ModTiming:
+    """
+    Time spent by the mod loader on a mod: from each of its lines to the next loader line.
+
+    Attributes:
+        load: Loading time, in seconds.
+        init: Code initialization time, in seconds.
+    """
+    load: float = 0.0
+    init: float = 0.0
+
+
+@dataclass
+class LogState:
+    """
+    Mod loading state of a log at a byte offset, kept by checkpoints to resume from it.
+
+    Attributes:
+        load_order: Mods in the order they were loaded.
+        timings: Loader timings of each mod.
+        current: Mod being loaded or initialized, errors being attributed to it, until the
+            next loader line or, once initializing, the first information line of anything else.
+        phase: 'load' or 'init', when `current` is set.
+        since: Uptime of the last loader line of `current`.
+    """
+    load_order: List[str] = field(default_factory=list)
+    timings: Dict[str, ModTiming] = field(default_factory=dict)
+    current: Optional[str] = None
+    phase: Optional[str] = None
+    since: Optional[float] = None
+
+    @staticmethod
+    def from_dict(datas: dict) -> LogState:
+        state = LogState(**datas)
+        state.timings = {name: ModTiming(**timing) for name, timing in state.timings.items()}
+        return state
+
+
+@dataclass
+class LogReport:
+    """
+    Result of the analysis of a log, from a byte offset.
+
+    Attributes:
+        path: Path of the log.
+        start: Byte offset the analysis started from.
+        end: Byte offset reached, after the last complete line.
+        state: Mod loading state at `end`.
+        entries: Reported lines, by level and message.
+    """
+    path: Path
+    start: int = 0
+    end: int = 0
+    state: LogState = field(default_factory=LogState)
+    entries: Dict[Tuple[str, str], LogEntry] = field(default_factory=dict)
+
+    def by_mod(self) -> Dict[Optional[str], List[LogEntry]]:
+        """
+        Returns the reported lines grouped by mod, in load order, unattributed ones last.
+        """
+        order = {name: index for index, name in enumerate(self.state.load_order)}
+        groups: Dict[Optional[str], List[LogEntry]] = dict()
+
+        for entry in self.entries.values():
+            groups.setdefault(entry.mod, list()).append(entry)
+
+        return dict(sorted(groups.items(), key=lambda item: (item[0] is None, order.get(item[0], len(order)), item[0] or "")))
+
+
+class LogAnalyzer:
+    """
+    Scans output logs for errors, exceptions and warnings, grouped by mod, and for the
+    loading timings of each mod.
+
+    A reported line is attributed to the mod it names explicitly, else to the first mod
+    whose name appears in the line or its stack trace, else to the mod being loaded.
+    """
+
+    def __init__(self, mods: Dict[str, Iterable[str]] = None):
+        """
+        Args:
+            mods: Names of the known mods, such as the project and its dependencies, with
+                their aliases (e.g. the C# assembly name) found in stack traces.
+        """
+        self.aliases: Dict[str, str] = dict()
+
+        for name, aliases in (mods or dict()).items():
+            for alias in (name, *aliases):
+                self.aliases[alias] = name
+
+        self._names_pattern: Optional[re.Pattern] = None
+        self._names_order: Optional[List[str]] = None
+
+    def _names(self, state: LogState) -> re.Pattern:
+        """
+        Returns a pattern matching the known mod names and the mods loaded so far.
+        """
+        if self._names_order != state.load_order:
+            names = sorted(set(self.aliases) | set(state.load_order), key=len, reverse=True)
+            self._names_pattern = re.compile(r"\b(" + "|".join(map(re.escape, names)) + r")\b") if names else None
+            self._names_order = list(state.load_order)
+
+        return self._names_pattern
+
+    def _attribute(self, message: str, stack: List[str], state: LogState) -> Optional[str]:
+        match = MOD_REFERENCE.search(message)
+
+        if match:
+            return self.aliases.get(match.group(1), match.group(1))
+
+        names = self._names(state)
+
+        if names is not None:
+            for line in (message, *stack):
+                match = names.search(line)
+
+                if match:
+                    return self.aliases.get(match.group(1), match.group(1))
+
+        return state.current
+
+    @staticmethod
+    def _end_phase(uptime: Optional[float], state: LogState) -> None:
+        """
+        Ends the loading or the initialization of the current mod, adding its duration to its timings.
+        """
+        if state.current is not None and uptime is not None and state.since is not None:
+            timing = state.timings.setdefault(state.current, ModTiming())
+            setattr(timing, state.phase, getattr(timing, state.phase) + max(0.0, uptime - state.since))
+
+        state.current = state.phase = state.since = None
+
+    def _loader_line(self, message: str, uptime: Optional[float], state: LogState) -> None:
+        """
+        Updates the mod loading state from a line of the mod loader.
+        """
+        self._end_phase(uptime, state)
+
+        match = MOD_LOADED.match(message)
+
+        if match:
+            name = self.aliases.get(match.group(1), match.group(1))
+
+            if name not in state.load_order:
+                state.load_order.append(name)
+
+            state.current, state.phase = name, "load"
+
+        else:
+            match = MOD_INITIALIZING.match(message)
+
+            if match:
+                state.current, state.phase = self.aliases.get(match.group(1), match.group(1)), "init"
+
+        if state.current is not None:
+            state.since = uptime
+
+    def analyze(self, path: Path, start: int = 0, state: LogState = None) -> LogReport:
+        """
+        Scans a log from the byte offset `start` up to its last complete line.
+
+        Args:
+            path: Path of the log.
+            start: Byte offset to start from, at the start of a line.
+            state: Mod loading state at `start`, as returned by a previous analysis.
+        """
+        report = LogReport(Path(path), start, start, state or LogState())
+
+        with open(path, "rb") as reader:
+            size = os.fstat(reader.fileno()).st_size
+
+            if size <= start:
+                return report
+
+            with mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                report.end = data.rfind(b"\n", start, size) + 1 or start
+                self._scan(data, report)
+
+        return report
+
+    def _scan(self, data: mmap.mmap, report: LogReport) -> None:
+        state = report.state
+        end = report.end
+        consumed = report.start
+
+        for match in MARKER.finditer(data, report.start, end):
+            if match.start() < consumed:
+                continue
+
+            line_start = data.rfind(b"\n", 0, match.start()) + 1
+            line_end = data.find(b"\n", match.end() - 1, end)
+
+            if state.phase == "init":
+                self._end_init(data, consumed, line_start, state)
+            consumed = line_end + 1
+
+            line = data[line_start:line_end].rstrip(b"\r").decode("utf-8", errors="replace")
+            parsed = LINE.match(line)
+
+            if parsed is None:
+                level, message, uptime = match.group().strip()[:3].decode(), line, None
+            else:
+                level, message, uptime = parsed.group(2), parsed.group(3), float(parsed.group(1))
+
+            if level == "INF":
+                self._loader_line(message, uptime, state)
+                continue
+
+            stack = list()
+            lines = 0
+
+            while consumed < end and lines < STACK_LIMIT and not TIMESTAMP.match(data, consumed):
+                next_end = data.find(b"\n", consumed, end)
+                stack_line = data[consumed:next_end].rstrip(b"\r")
+                consumed = next_end + 1
+                lines += 1
+
+                if stack_line.strip() and len(stack) < STACK_KEPT:
+                    stack.append(stack_line.decode("utf-8", errors="replace"))
+
+            key = (level, message)
+            entry = report.entries.get(key)
+
+            if entry is not None:
+                entry.count += 1
+                continue
+
+            category = next((name for name, pattern in CATEGORIES if pattern.search(message)), "other")
+            mod = self._attribute(message, stack, state)
+            report.entries[key] = LogEntry(level, category, mod, message, uptime=uptime, stack=stack)
+
+        if state.phase == "init":
+            self._end_init(data, consumed, end, state)
+
+    def _end_init(self, data: mmap.mmap, start: int, end: int, state: LogState) -> None:
+        """
+        Ends the initialization of the current mod at the first information line of anything
+        but the mod loader between the byte offsets `start` and `end`, if any.
+        """
+        other = OTHER_INFO.search(data, start, end)
+
+        if other is not None:
+            self._end_phase(float(other.group(1)), state)
+
+
+class LogCheckpoints:
+    """
+    Persistent byte offsets reached in each analyzed log.
+
+    A checkpoint is only resumed if the log still starts with the same bytes and did not
+    shrink, so that a new log written at the same path is analyzed from its start.
+    """
+
+    def __init__(self, path: Path = CHECKPOINTS_PATH):
+        self.path = path
+        self.logs: Dict[str, dict] = dict()
+
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "rb") as reader:
+                datas: dict = json.load(reader)
+
+        except (OSError, ValueError):
+            return
+
+        if datas.get("version") != CHECKPOINT_VERSION:
+            return
+
+        self.logs = datas["logs"]
+
+    def save(self) -> None:
+        datas = {
+            "version": CHECKPOINT_VERSION,
+            "logs": self.logs,
+        }
+
+        os.makedirs(self.path.parent, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+
+        with open(tmp_path, "w") as writer:
+            json.dump(datas, writer)
+
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _head(path: Path, length: int) -> str:
+        with open(path, "rb") as reader:
+            return hashlib.sha1(reader.read(length)).hexdigest()
+
+    def get(self, path: Path) -> Tuple[int, Optional[LogState]]:
+        """
+        Returns the byte offset to resume the analysis of a log from, with the mod loading
+        state at this offset, or (0, None) if the log is new.
+        """
+        checkpoint = self.logs.get(str(Path(path).resolve()))
+
+        if checkpoint is None:
+            return 0, None
+
+        try:
+            if os.path.getsize(path) < checkpoint["offset"]:
+                return 0, None
+
+            if self._head(path, checkpoint["head_size"]) != checkpoint["head"]:
+                return 0, None
+
+        except OSError:
+            return 0, None
+
+        return checkpoint["offset"], LogState.from_dict(checkpoint["state"])
+
+    def set(self, report: LogReport) -> None:
+        head_size = min(HEAD_SIZE, report.end)
+
+        self.logs[str(report.path.resolve())] = {
+            "offset": report.end,
+            "head": self._head(report.path, head_size),
+            "head_size": head_size,
+            "state": asdict(report.state),
+        }
+
+
+def find_logs(*dirs: Path) -> List[Path]:
+    """
+    Returns the output logs found in the given folders, most recently modified first.
+    """
+    logs = list()
+
+    for dir in dirs:
+        if dir is None or not Path(dir).is_dir():
+            continue
+
+        for pattern in LOG_PATTERNS:
+            logs.extend(Path(dir).glob(pattern))
+
+    return sorted(set(logs), key=lambda path: path.stat().st_mtime, reverse=True)
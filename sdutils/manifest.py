@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict
+import hashlib
+import json
+import os
+
+from .config import USER_CACHE_DIR
+
+
+# Name of the manifest file formerly persisted at the root of the build directory
+LEGACY_MANIFEST_NAME = ".sdutils-manifest.json"
+
+# Bump when the manifest layout changes, older manifests are then discarded
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class ManifestEntry:
+    """
+    Snapshot of a source file, as it was when last copied into the build directory.
+
+    Attributes:
+        source: Absolute path of the source file.
+        size: Size of the source file, in bytes.
+        mtime: Last modification time of the source file, in nanoseconds.
+        sha256: Hex digest of the source file content.
+    """
+    source: str
+    size: int
+    mtime: int
+    sha256: str
+
+
+def file_digest(path: Path) -> str:
+    """
+    Computes the SHA256 hex digest of a file, reading it by chunks.
+    """
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as reader:
+        for chunk in iter(lambda: reader.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    """
+    Persisted index of the files copied into a build directory.
+
+    Keys are the POSIX paths of the files relative to the build directory,
+    values describe the source file they were copied from.
+
+    The manifest is persisted in `USER_CACHE_DIR` rather than in the build directory,
+    so that a mod installed as a link to the build directory does not expose it.
+    """
+
+    def __init__(self, build_dir: Path):
+        self.build_dir = build_dir
+        digest = hashlib.sha1(str(Path(build_dir).resolve()).encode()).hexdigest()[:12]
+        self.path = Path(USER_CACHE_DIR, f"manifest-{digest}.json")
+        self.entries: Dict[str, ManifestEntry] = dict()
+
+    @classmethod
+    def load(cls, build_dir: Path) -> BuildManifest:
+        """
+        Loads the manifest of a build directory.
+
+        A missing, unreadable or outdated manifest results in an empty one,
+        which makes the next sync copy every file.
+        """
+        manifest = cls(build_dir)
+
+        if not manifest.path.exists():
+            return manifest
+
+        try:
+            with open(manifest.path, "rb") as reader:
+                datas: dict = json.load(reader)
+
+        except (OSError, ValueError):
+            print(f"WRN: ignoring unreadable manifest '{manifest.path}'")
+            return manifest
+
+        if datas.get("version") != MANIFEST_VERSION:
+            return manifest
+
+        manifest.entries = {
+            name: ManifestEntry(**entry) for name, entry in datas["files"].items()
+        }
+
+        return manifest
+
+    def save(self) -> None:
+        """
+        Writes the manifest, and deletes the one a previous version left in the build directory.
+        """
+        datas = {
+            "version": MANIFEST_VERSION,
+            "files": {name: asdict(entry) for name, entry in sorted(self.entries.items())},
+        }
+
+        os.makedirs(self.path.parent, exist_ok=True)
+
+        with open(self.path, "w") as writer:
+            json.dump(datas, writer, indent=1)
+
+        Path(self.build_dir, LEGACY_MANIFEST_NAME).unlink(missing_ok=True)
+
+    def is_up_to_date(self, name: str, src: Path, stat: os.stat_result) -> bool:
+        """
+        Tells if the file `name` of the build directory still matches `src`.
+
+        Size and mtime are checked first, the content hash is only computed
+        when they differ, so that a touched but unchanged file is not copied again.
+        The entry is refreshed in place when only the mtime changed.
+        """
+        entry = self.entries.get(name)
+
+        if entry is None or entry.source != str(src):
+            return False
+
+        if not Path(self.build_dir, name).exists():
+            return False
+
+        if entry.size == stat.st_size and entry.mtime == stat.st_mtime_ns:
+            return True
+
+        if entry.size != stat.st_size:
+            return False
+
+        sha256 = file_digest(src)
+
+        if sha256 != entry.sha256:
+            return False
+
+        entry.mtime = stat.st_mtime_ns
+        return True
+
+    def record(self, name: str, src: Path, stat: os.stat_result) -> None:
+        """
+        Registers `src` as the source of the file `name` of the build directory.
+        """
+        self.entries[name] = ManifestEntry(
+            source=str(src),
+            size=stat.st_size,
+            mtime=stat.st_mtime_ns,
+            sha256=file_digest(src),
+        )
+
+
+@dataclass
+class SyncReport:
+    """
+    Summary of an incremental sync of the build directory.
+    """
+    copied: int = 0
+    skipped: int = 0
+    removed: int = 0
+    bytes: int = 0
+
+    def __str__(self) -> str:
+        return f"{self.copied} copied, {self.skipped} unchanged, {self.removed} removed"
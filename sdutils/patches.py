@@ -0,0 +1,746 @@
+"""
+Validation of the XPath patches of mods against the vanilla game configuration.
+
+The game applies the `Config/*.xml` files of every mod, in load order, as patches of
+the XML files of `Data/Config`: each command (`set`, `append`, `remove`...) edits the
+nodes its `xpath` selects. A command selecting nothing is only reported in the game
+log, so broken patches go unnoticed until testing in game.
+
+Vanilla files weigh megabytes, and most commands select a single entry of them by its
+name, as `/items/item[@name='gunPistol']/...`. The byte range of every top-level entry
+is indexed once per game version, in `USER_CACHE_DIR`, and only the entries commands
+select are parsed. Documents are parsed whole for the other commands only.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from xml.parsers import expat
+import xml.etree.ElementTree as ET
+import threading
+import hashlib
+import copy
+import json
+import os
+
+from . import xpath
+from .config import USER_CACHE_DIR
+
+
+# Bump when the vanilla index or the validation cache layouts change
+CACHE_VERSION = 1
+
+# Commands whose target nodes are moved or deleted, as opposed to edited in place
+_STRUCTURAL_COMMANDS = {"insertAfter", "insertBefore", "remove"}
+
+# Axes which stay within the subtree of their context node
+_LOCAL_AXES = {"child", "attribute", "self", "descendant", "descendant-or-self"}
+
+Key = Tuple[str, str]
+
+
+@dataclass
+class PatchIssue:
+    """
+    A patch command which can't be applied.
+    """
+    mod: str
+    file: str
+    line: int
+    command: str
+    xpath: str
+    message: str
+
+    def __str__(self) -> str:
+        location = f"{self.mod}/Config/{self.file}:{self.line}:"
+
+        if not self.command:
+            return f"{location} {self.message}"
+
+        target = f'<{self.command} xpath="{self.xpath}">' if self.xpath else f"<{self.command}>"
+        return f"{location} {target} {self.message}"
+
+
+@dataclass
+class PatchReport:
+    """
+    Summary of the validation of a mod and its dependencies.
+    """
+    files: int = 0
+    commands: int = 0
+    issues: List[PatchIssue] = field(default_factory=list)
+    cached: bool = False
+    preview: int = 0
+
+    def __str__(self) -> str:
+        text = f"{self.commands} commands in {self.files} files, {len(self.issues)} issues"
+
+        if self.cached:
+            text += " (cached)"
+
+        if self.preview:
+            text += f", {self.preview} merged files previewed"
+
+        return text
+
+
+@dataclass
+class FileIndex:
+    """
+    Index of a vanilla XML file.
+
+    Attributes:
+        mtime: Last modification time of the file when indexed, in nanoseconds.
+        size: Size of the file when indexed, in bytes.
+        root: Tag and attributes of the root element.
+        entries: Tag, 'name' attribute, and byte range of each child of the root element.
+    """
+    mtime: int
+    size: int
+    root: List
+    entries: List[List]
+
+
+def _index_file(path: Path) -> FileIndex:
+    """
+    Lists the byte range of the children of the root element of an XML file, in one pass.
+    A range spans from the start tag of a child to the start tag of the next one.
+    """
+    stat = path.stat()
+
+    with open(path, "rb") as reader:
+        data = reader.read()
+
+    parser = expat.ParserCreate()
+    depth = 0
+    root = list()
+    entries = list()
+
+    def start(tag: str, attributes: dict):
+        nonlocal depth
+
+        if depth == 0:
+            root.extend((tag, attributes))
+
+        elif depth == 1:
+            if entries:
+                entries[-1][3] = parser.CurrentByteIndex
+
+            entries.append([tag, attributes.get("name"), parser.CurrentByteIndex, None])
+
+        depth += 1
+
+    def end(tag: str):
+        nonlocal depth
+        depth -= 1
+
+        if depth == 0 and entries:
+            entries[-1][3] = parser.CurrentByteIndex
+
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.Parse(data, True)
+
+    return FileIndex(stat.st_mtime_ns, stat.st_size, root, entries)
+
+
+class VanillaIndex:
+    """
+    Persisted index of the vanilla XML files of a game, see `FileIndex`.
+    Files are indexed on first use, and indexed again when their mtime or size changed.
+    """
+
+    def __init__(self, config_dir: Path):
+        self.config_dir = Path(config_dir).resolve()
+
+        digest = hashlib.sha1(str(self.config_dir).encode()).hexdigest()[:12]
+        self.path = Path(USER_CACHE_DIR, f"vanilla-{digest}.json")
+        self.files: Dict[str, FileIndex] = dict()
+        self.lock = threading.Lock()
+        self.dirty = False
+
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "rb") as reader:
+                datas: dict = json.load(reader)
+
+        except (OSError, ValueError):
+            return
+
+        if datas.get("version") != CACHE_VERSION:
+            return
+
+        self.files = {name: FileIndex(*entry) for name, entry in datas["files"].items()}
+
+    def save(self) -> None:
+        with self.lock:
+            if not self.dirty:
+                return
+
+            datas = {
+                "version": CACHE_VERSION,
+                "files": {name: [index.mtime, index.size, index.root, index.entries] for name, index in self.files.items()},
+            }
+
+            os.makedirs(self.path.parent, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+
+            with open(tmp_path, "w") as writer:
+                json.dump(datas, writer)
+
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+
+    def get(self, name: str) -> Optional[FileIndex]:
+        """
+        Returns the index of a vanilla file, given its path relative to the config folder,
+        or None if the game has no such file.
+        """
+        path = Path(self.config_dir, name)
+
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+
+        with self.lock:
+            index = self.files.get(name)
+
+            if index is None or index.mtime != stat.st_mtime_ns or index.size != stat.st_size:
+                index = self.files[name] = _index_file(path)
+                self.dirty = True
+
+            return index
+
+
+_indexes: Dict[Path, VanillaIndex] = dict()
+_indexes_lock = threading.Lock()
+
+
+def get_index(config_dir: Path) -> VanillaIndex:
+    """
+    Returns the memoized index of a game config folder.
+    """
+    config_dir = Path(config_dir).resolve()
+
+    with _indexes_lock:
+        if config_dir not in _indexes:
+            _indexes[config_dir] = VanillaIndex(config_dir)
+
+        return _indexes[config_dir]
+
+
+def _is_local(expression) -> bool:
+    """
+    Tells if an expression only looks at the subtree of its context node.
+    """
+    if isinstance(expression, xpath.Path):
+        return (
+            not expression.absolute
+            and (expression.filter is None or _is_local(expression.filter))
+            and all(step.axis in _LOCAL_AXES and all(map(_is_local, step.predicates)) for step in expression.steps)
+        )
+
+    if isinstance(expression, xpath.Filter):
+        return _is_local(expression.primary) and all(map(_is_local, expression.predicates))
+
+    if isinstance(expression, xpath.Binary):
+        return _is_local(expression.left) and _is_local(expression.right)
+
+    if isinstance(expression, xpath.Call):
+        return all(map(_is_local, expression.arguments))
+
+    if isinstance(expression, xpath.Negate):
+        return _is_local(expression.operand)
+
+    return True
+
+
+class PatchedDocument:
+    """
+    A vanilla XML file, as patched by the commands applied so far.
+
+    The document starts as its bare root element. Commands selecting a top-level entry
+    by name, and editing nodes within it, only parse that entry from its byte range.
+    Any other command makes the whole file parsed, the entries parsed so far replacing
+    their vanilla version.
+    """
+
+    def __init__(self, path: Path, index: FileIndex):
+        self.path = path
+        self.index = index
+        self.root = ET.Element(index.root[0], index.root[1])
+        self.full = False
+        self.loaded: Dict[Key, ET.Element] = dict()
+        self.ranges: Dict[Key, Tuple[int, int]] = dict()
+
+        duplicates = set()
+
+        for tag, name, start, end in index.entries:
+            if name is not None:
+                if (tag, name) in self.ranges:
+                    duplicates.add((tag, name))
+
+                self.ranges[(tag, name)] = (start, end)
+
+        for key in duplicates:
+            del self.ranges[key]
+
+        self.duplicates = duplicates
+
+    def _load_entry(self, key: Key) -> Optional[ET.Element]:
+        if key in self.loaded:
+            return self.loaded[key]
+
+        start, end = self.ranges[key]
+
+        with open(self.path, "rb") as reader:
+            reader.seek(start)
+            data = reader.read(end - start)
+
+        # the range may end with comments or blanks, parsed along within a wrapper
+        element = ET.fromstring(b"<_>" + data + b"</_>")[0]
+
+        self.root.append(element)
+        self.loaded[key] = element
+
+        return element
+
+    def load(self) -> ET.Element:
+        """
+        Parses the whole file, keeping the entries patched so far. Returns the root element.
+        """
+        if self.full:
+            return self.root
+
+        root = ET.parse(self.path).getroot()
+
+        root[:] = [
+            self.loaded.get((child.tag, child.get("name")), child) if child.get("name") is not None else child
+            for child in root
+        ]
+
+        self.root = root
+        self.full = True
+        self.loaded.clear()
+
+        return root
+
+    def _entry_query(self, expression, structural: bool) -> Optional[Tuple[Key, List]]:
+        """
+        Splits an expression of the form `/root/tag[@name='value']/...` into the key of the
+        top-level entry it selects and its remaining steps, when these stay within the entry.
+        """
+        if not isinstance(expression, xpath.Path) or not expression.absolute or expression.filter is not None:
+            return None
+
+        steps = expression.steps
+
+        if len(steps) < 2 or (structural and len(steps) == 2):
+            return None
+
+        first, second = steps[0], steps[1]
+
+        if first.axis != "child" or first.test not in (self.root.tag, "*") or first.predicates:
+            return None
+
+        if second.axis != "child" or second.test in ("*", "node()", "text()") or len(second.predicates) != 1:
+            return None
+
+        equals = xpath.attribute_equals(second.predicates[0])
+
+        if equals is None or equals[0] != "name":
+            return None
+
+        if not _is_local(xpath.Path(False, steps[2:])):
+            return None
+
+        return (second.test, equals[1]), steps[2:]
+
+    def select(self, expression: str, structural: bool = False) -> List[xpath.Node]:
+        """
+        Returns the nodes selected by an XPath expression.
+
+        Args:
+            structural: The nodes are to be moved or deleted.
+
+        Raises:
+            xpath.XPathError: If the expression is malformed or doesn't select nodes.
+        """
+        compiled = xpath.compile(expression)
+
+        if not self.full:
+            query = self._entry_query(compiled, structural)
+
+            if query is None or query[0] in self.duplicates:
+                self.load()
+
+            else:
+                key, steps = query
+
+                if key not in self.ranges:
+                    return []
+
+                entry = self._load_entry(key)
+
+                if not steps:
+                    return [entry]
+
+                return xpath.select(xpath.Path(False, steps), self.root, entry)
+
+        return xpath.select(compiled, self.root)
+
+    def renamed(self) -> bool:
+        """
+        Tells if a parsed entry was renamed, so that its key can't be trusted anymore.
+        """
+        return any(element.get("name") != key[1] or element.tag != key[0] for key, element in self.loaded.items())
+
+
+def _parse_patch(path: Path) -> Tuple[ET.Element, Dict[int, int]]:
+    """
+    Parses a patch file, along with the line of each element.
+
+    Returns:
+        The root element, and the line number of the elements by their `id`.
+
+    Raises:
+        expat.ExpatError: If the file is not well-formed.
+    """
+    builder = ET.TreeBuilder()
+    parser = expat.ParserCreate()
+    lines = dict()
+
+    def start(tag: str, attributes: dict):
+        lines[id(builder.start(tag, attributes))] = parser.CurrentLineNumber
+
+    parser.StartElementHandler = start
+    parser.EndElementHandler = builder.end
+    parser.CharacterDataHandler = builder.data
+    parser.buffer_text = True
+
+    with open(path, "rb") as reader:
+        parser.ParseFile(reader)
+
+    return builder.close(), lines
+
+
+def _csv(value: str, text: str, delimiter: str, operation: str) -> str:
+    values = [item.strip() for item in value.split(delimiter) if item.strip()]
+    changes = [item.strip() for item in text.split(delimiter) if item.strip()]
+
+    if operation == "remove":
+        values = [item for item in values if item not in changes]
+    else:
+        values += [item for item in changes if item not in values]
+
+    return delimiter.join(values)
+
+
+class PatchSession:
+    """
+    Applies the patches of a list of mods, in load order, to the vanilla documents.
+    """
+
+    def __init__(self, config_dir: Path):
+        self.config_dir = Path(config_dir)
+        self.index = get_index(config_dir)
+        self.documents: Dict[str, Optional[PatchedDocument]] = dict()
+        self.mods: List[str] = list()
+        self.report = PatchReport()
+
+    def document(self, name: str) -> Optional[PatchedDocument]:
+        if name not in self.documents:
+            index = self.index.get(name)
+            self.documents[name] = None if index is None else PatchedDocument(Path(self.config_dir, name), index)
+
+        return self.documents[name]
+
+    def apply_mod(self, mod: str, files: Dict[str, Path]) -> None:
+        """
+        Applies the patch files of a mod, given by path relative to its 'Config' folder.
+        """
+        self.mods.append(mod)
+
+        for name, path in sorted(files.items()):
+            self.report.files += 1
+            self._apply_file(mod, name, path)
+
+    def _issue(self, mod: str, name: str, line: int, command: ET.Element, message: str) -> None:
+        self.report.issues.append(PatchIssue(mod, name, line, command.tag, command.get("xpath", ""), message))
+
+    def _apply_file(self, mod: str, name: str, path: Path) -> None:
+        try:
+            patch, lines = _parse_patch(path)
+        except expat.ExpatError as e:
+            self.report.issues.append(PatchIssue(mod, name, e.lineno, "", "", f"malformed XML: {expat.ErrorString(e.code)}"))
+            return
+
+        document = self.document(name)
+
+        if document is None:
+            self.report.issues.append(PatchIssue(mod, name, 1, patch.tag, "", "no such vanilla file"))
+            return
+
+        for command in patch:
+            self._apply_command(mod, name, document, command, lines)
+
+    def _condition(self, condition: str) -> Optional[bool]:
+        """
+        Evaluates the condition of a 'conditional' command, None when it is not supported.
+        """
+        condition = condition.strip()
+        negated = condition.startswith("!") or condition.startswith("not ")
+
+        if negated:
+            condition = condition.lstrip("!").removeprefix("not ").strip()
+
+        if condition.startswith("mod_loaded(") and condition.endswith(")"):
+            loaded = condition[len("mod_loaded("):-1].strip("'\" ") in self.mods
+            return loaded != negated
+
+        return None
+
+    def _apply_command(self, mod: str, name: str, document: PatchedDocument, command: ET.Element, lines: Dict[int, int]) -> None:
+        line = lines.get(id(command), 0)
+
+        if command.tag == "conditional":
+            for branch in command:
+
+                condition = True if branch.tag == "else" else self._condition(branch.get("cond", ""))
+
+                # branches depending on the game state are not validated
+                if condition is None:
+                    return
+
+                if condition:
+                    for child in branch:
+                        self._apply_command(mod, name, document, child, lines)
+                    return
+
+            return
+
+        expression = command.get("xpath")
+
+        if expression is None:
+            self._issue(mod, name, line, command, "has no 'xpath' attribute")
+            return
+
+        self.report.commands += 1
+
+        try:
+            nodes = document.select(expression, command.tag in _STRUCTURAL_COMMANDS)
+        except xpath.XPathError as e:
+            self._issue(mod, name, line, command, f"invalid xpath: {e}")
+            return
+
+        if not nodes:
+            self._issue(mod, name, line, command, "selects nothing")
+            return
+
+        message = self._edit(document, command, nodes)
+
+        if message is not None:
+            self._issue(mod, name, line, command, message)
+
+        if not document.full and document.renamed():
+            document.load()
+
+    def _edit(self, document: PatchedDocument, command: ET.Element, nodes: List[xpath.Node]) -> Optional[str]:
+        """
+        Applies a command to the nodes it selected, as the game does.
+
+        Returns:
+            A description of the problem, if the command can't apply to these nodes.
+        """
+        text = command.text or ""
+        attributes = [node for node in nodes if isinstance(node, xpath.Attribute)]
+        elements = [node for node in nodes if isinstance(node, ET.Element)]
+
+        match command.tag:
+            case "set":
+                for node in attributes:
+                    node.element.set(node.name, text)
+
+                for node in elements:
+                    node.text = text
+
+                for node in nodes:
+                    if isinstance(node, xpath.Text):
+                        node.element.text = text
+
+            case "setattribute":
+                attribute = command.get("name")
+
+                if attribute is None or not elements:
+                    return "needs a 'name' attribute and elements to set it on"
+
+                for node in elements:
+                    node.set(attribute, text)
+
+            case "append" | "prepend":
+                for node in attributes:
+                    value = node.value + text if command.tag == "append" else text + node.value
+                    node.element.set(node.name, value)
+
+                for node in elements:
+                    children = [copy.deepcopy(child) for child in command]
+
+                    if command.tag == "append":
+                        node.extend(children)
+                    else:
+                        node[0:0] = children
+
+            case "insertAfter" | "insertBefore":
+                context = xpath.Context(document.root)
+
+                for node in elements:
+                    parent = context.parent(node)
+
+                    if not isinstance(parent, ET.Element):
+                        return "can't insert siblings of the root element"
+
+                    position = list(parent).index(node) + (1 if command.tag == "insertAfter" else 0)
+                    parent[position:position] = [copy.deepcopy(child) for child in command]
+
+            case "remove":
+                context = xpath.Context(document.root)
+
+                for node in attributes:
+                    node.element.attrib.pop(node.name, None)
+
+                for node in elements:
+                    parent = context.parent(node)
+
+                    if not isinstance(parent, ET.Element):
+                        return "can't remove the root element"
+
+                    parent.remove(node)
+
+            case "removeattribute":
+                for node in attributes:
+                    node.element.attrib.pop(node.name, None)
+
+                attribute = command.get("name")
+
+                if attribute is not None:
+                    for node in elements:
+                        node.attrib.pop(attribute, None)
+
+            case "csv":
+                if not attributes:
+                    return "must select attributes"
+
+                delimiter = command.get("delim", ",")
+
+                for node in attributes:
+                    node.element.set(node.name, _csv(node.value, text, delimiter, command.get("op", "add")))
+
+            case _:
+                return "is not a known command"
+
+        return None
+
+    def write_preview(self, dst: Path) -> int:
+        """
+        Writes the merged version of every patched file into `dst`.
+
+        Returns:
+            The number of files written.
+        """
+        count = 0
+
+        for name, document in self.documents.items():
+
+            if document is None:
+                continue
+
+            root = document.load()
+            path = Path(dst, name)
+            os.makedirs(path.parent, exist_ok=True)
+
+            ET.indent(root)
+            ET.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
+            count += 1
+
+        return count
+
+
+def _stat_key(path: Path) -> Optional[List[int]]:
+    try:
+        stat = path.stat()
+        return [stat.st_mtime_ns, stat.st_size]
+    except OSError:
+        return None
+
+
+def validate(config_dir: Path, mods: List[Tuple[str, Dict[str, Path]]], cache_name: str, preview: Path = None) -> PatchReport:
+    """
+    Applies the patches of a list of mods in load order, reporting the commands which fail.
+
+    The report is cached until a patch file or a patched vanilla file changes, so that
+    validating unchanged patches only costs their `stat`.
+
+    Args:
+        config_dir: The vanilla 'Data/Config' folder.
+        mods: Name and patch files of each mod, in load order. Patch files are given by
+            path relative to the 'Config' folder of the mod.
+        cache_name: Name of the cached report, unique per validated mod.
+        preview: Folder receiving the merged files, if set.
+    """
+    config_dir = Path(config_dir).resolve()
+    names = sorted({name for _, files in mods for name in files})
+
+    key = hashlib.sha1(json.dumps([
+        CACHE_VERSION,
+        str(config_dir),
+        [[mod, [[name, str(path), _stat_key(path)] for name, path in sorted(files.items())]] for mod, files in mods],
+        [[name, _stat_key(Path(config_dir, name))] for name in names],
+    ]).encode()).hexdigest()
+
+    digest = hashlib.sha1(cache_name.encode()).hexdigest()[:12]
+    cache_path = Path(USER_CACHE_DIR, f"patches-{digest}.json")
+
+    if preview is None:
+        try:
+            with open(cache_path, "rb") as reader:
+                datas: dict = json.load(reader)
+
+            if datas.get("key") == key:
+                return PatchReport(
+                    files=datas["files"],
+                    commands=datas["commands"],
+                    issues=[PatchIssue(*issue) for issue in datas["issues"]],
+                    cached=True,
+                )
+
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    session = PatchSession(config_dir)
+
+    for mod, files in mods:
+        session.apply_mod(mod, files)
+
+    if preview is not None:
+        session.report.preview = session.write_preview(preview)
+
+    session.index.save()
+
+    report = session.report
+    datas = {
+        "key": key,
+        "files": report.files,
+        "commands": report.commands,
+        "issues": [[i.mod, i.file, i.line, i.command, i.xpath, i.message] for i in report.issues],
+    }
+
+    os.makedirs(cache_path.parent, exist_ok=True)
+
+    with open(cache_path, "w") as writer:
+        json.dump(datas, writer)
+
+    return report
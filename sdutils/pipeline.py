@@ -0,0 +1,173 @@
+"""
+Task graphs running the steps of a command concurrently.
+
+Each step starts as soon as the steps it depends on are done, so that independent
+steps, such as compiling the mod and closing the running game, overlap. Once run, the
+critical path tells which chain of steps the command actually waited for.
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Hashable, Iterable, List, Optional
+import time
+
+from .profiling import Span, span
+
+
+def run_graph(graph: Dict[Hashable, Iterable[Hashable]], function: Callable[[Hashable], object], jobs: int = 1) -> None:
+    """
+    Calls `function` on every node of a directed acyclic graph, in a pool of `jobs` workers.
+
+    A node is only submitted once all the nodes it depends on are done, so that
+    independent nodes run concurrently while the topological order is kept. The first
+    failure cancels the nodes not started yet, waits for the running ones, and is
+    raised again.
+
+    Args:
+        graph: Nodes, in submission order, with the nodes each one depends on. Nodes
+            outside of the graph are not waited for.
+    """
+    pending = list(graph)
+    done = {node for after in graph.values() for node in after if node not in graph}
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+
+        running = dict()
+
+        while pending or running:
+
+            for node in [n for n in pending if set(graph[n]) <= done]:
+                running[executor.submit(function, node)] = node
+                pending.remove(node)
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in finished:
+                node = running.pop(future)
+
+                if future.exception() is not None:
+                    for other in running:
+                        other.cancel()
+                    raise future.exception()
+
+                done.add(node)
+
+
+@dataclass
+class Task:
+    """
+    A step of a pipeline.
+
+    Attributes:
+        name: Name of the step, also used as its span name.
+        function: Work of the step.
+        after: Names of the steps to wait for before starting this one.
+        start: Start time, from `time.perf_counter`, once started.
+        end: End time, once done.
+    """
+    name: str
+    function: Callable[[], object]
+    after: List[str] = field(default_factory=list)
+    start: Optional[float] = None
+    end: Optional[float] = None
+
+    @property
+    def duration(self) -> float:
+        if self.start is None or self.end is None:
+            return 0.0
+
+        return self.end - self.start
+
+
+class Pipeline:
+    """
+    Directed acyclic graph of tasks, run on a pool of threads.
+
+    Tasks can only depend on tasks added before them, so that the graph has no cycle.
+
+    Example:
+        pipeline = Pipeline("start")
+        pipeline.add("build", builder.build)
+        pipeline.add("shut down", builder.shut_down)
+        pipeline.add("install", builder.install_local, after=["build", "shut down"])
+        pipeline.run()
+        print(pipeline.summary())
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.tasks: Dict[str, Task] = dict()
+
+    def add(self, name: str, function: Callable[[], object], after: Iterable[str] = ()) -> Task:
+        """
+        Adds a task running `function` once the tasks named in `after` are done.
+
+        Raises:
+            ValueError: If a task of `after` was not added yet.
+        """
+        after = list(after)
+        unknown = [other for other in after if other not in self.tasks]
+
+        if unknown:
+            raise ValueError(f"Unknown tasks: {unknown}")
+
+        self.tasks[name] = Task(name, function, after)
+
+        return self.tasks[name]
+
+    def _execute(self, task: Task, parent: Span) -> None:
+        with span(task.name, parent):
+            task.start = time.perf_counter()
+
+            try:
+                task.function()
+            finally:
+                task.end = time.perf_counter()
+
+    def run(self) -> None:
+        """
+        Runs every task once its dependencies are done, independent ones concurrently.
+        The first failure cancels the tasks not started yet, waits for the running ones,
+        and is raised again.
+        """
+        graph = {name: task.after for name, task in self.tasks.items()}
+
+        with span(self.name) as parent:
+            run_graph(graph, lambda name: self._execute(self.tasks[name], parent), len(graph))
+
+    def critical_path(self) -> List[Task]:
+        """
+        Returns the chain of tasks which ended last: the task ending last, preceded by its
+        dependency ending last, and so on. Shortening any other task would not shorten the run.
+        """
+        finished = [task for task in self.tasks.values() if task.end is not None]
+
+        if not finished:
+            return list()
+
+        task = max(finished, key=lambda t: t.end)
+        path = [task]
+
+        while task.after:
+            task = max((self.tasks[name] for name in task.after), key=lambda t: t.end or 0.0)
+            path.append(task)
+
+        return path[::-1]
+
+    def summary(self) -> str:
+        """
+        Formats the critical path, along with the wall time of the run and the time the
+        tasks would have taken one after the other.
+        """
+        path = self.critical_path()
+
+        if not path:
+            return "critical path: none"
+
+        finished = [task for task in self.tasks.values() if task.end is not None]
+        wall = max(t.end for t in finished) - min(t.start for t in finished)
+        work = sum(t.duration for t in finished)
+        steps = " > ".join(f"{task.name} {task.duration:.1f}s" for task in path)
+
+        return f"critical path: {steps} | {wall:.1f}s wall, {work:.1f}s sequential"
@@ -0,0 +1,346 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Tuple
+import threading
+import fnmatch
+import hashlib
+import bisect
+import glob
+import json
+import os
+
+from .config import USER_CACHE_DIR
+from . import copying
+
+
+# Bump when the index layout changes, older indexes are then rebuilt
+INDEX_VERSION = 1
+
+
+@dataclass
+class DirListing:
+    """
+    Indexed content of one directory of the prefab library.
+
+    Attributes:
+        mtime: Last modification time of the directory when listed, in nanoseconds.
+        files: Sorted file names, with their size and mtime when listed.
+        dirs: Sorted sub-directory names.
+    """
+    mtime: int
+    files: Dict[str, Tuple[int, int]]
+    dirs: List[str]
+
+
+class PrefabIndex:
+    """
+    Persistent index of a prefab library folder, such as `PATH_PREFABS`.
+
+    The index lists every directory of the library. It is refreshed incrementally:
+    a directory is only listed again when its own mtime changed, which happens
+    whenever a file or folder is added, removed or renamed in it.
+
+    Use `get_index` to share instances within a run.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root).resolve()
+        digest = hashlib.sha1(str(self.root).encode()).hexdigest()[:12]
+        self.path = Path(USER_CACHE_DIR, f"prefabs-{digest}.json")
+        self.dirs: Dict[str, DirListing] = dict()
+        self.lock = threading.Lock()
+        self.refreshed = False
+
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "rb") as reader:
+                datas: dict = json.load(reader)
+
+        except (OSError, ValueError):
+            return
+
+        if datas.get("version") != INDEX_VERSION or datas.get("root") != str(self.root):
+            return
+
+        self.dirs = {
+            name: DirListing(entry["mtime"], {k: tuple(v) for k, v in entry["files"].items()}, entry["dirs"])
+            for name, entry in datas["dirs"].items()
+        }
+
+    def save(self) -> None:
+        datas = {
+            "version": INDEX_VERSION,
+            "root": str(self.root),
+            "dirs": {
+                name: {"mtime": listing.mtime, "files": listing.files, "dirs": listing.dirs}
+                for name, listing in self.dirs.items()
+            },
+        }
+
+        os.makedirs(self.path.parent, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+
+        with open(tmp_path, "w") as writer:
+            json.dump(datas, writer)
+
+        os.replace(tmp_path, self.path)
+
+    def refresh(self) -> int:
+        """
+        Brings the index up to date with the library, then saves it if anything changed.
+
+        Returns:
+            The number of directories listed again.
+        """
+        with self.lock:
+
+            dirs = dict()
+            listed = self._refresh_dir("", dirs)
+            changed = listed > 0 or dirs.keys() != self.dirs.keys()
+            self.dirs = dirs
+            self.refreshed = True
+
+            if changed:
+                self.save()
+
+            return listed
+
+    def _refresh_dir(self, name: str, dirs: Dict[str, DirListing]) -> int:
+        path = Path(self.root, name)
+
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            return 0
+
+        listing = self.dirs.get(name)
+        listed = 0
+
+        if listing is None or listing.mtime != mtime:
+
+            files, sub_dirs = dict(), list()
+
+            for entry in os.scandir(path):
+                if entry.is_dir():
+                    sub_dirs.append(entry.name)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+
+            files = dict(sorted(files.items(), key=lambda item: os.path.normcase(item[0])))
+            listing = DirListing(mtime, files, sorted(sub_dirs, key=os.path.normcase))
+            listed = 1
+
+        dirs[name] = listing
+
+        for sub_dir in listing.dirs:
+            listed += self._refresh_dir(_join(name, sub_dir), dirs)
+
+        return listed
+
+    def _tree_files(self, name: str) -> List[str]:
+        """
+        Lists the files of an indexed directory and of its sub-directories, relative to the library.
+        """
+        listing = self.dirs.get(name)
+
+        if listing is None:
+            return list()
+
+        files = [_join(name, file) for file in listing.files]
+
+        for sub_dir in listing.dirs:
+            files.extend(self._tree_files(_join(name, sub_dir)))
+
+        return files
+
+    def match(self, element: str) -> Dict[str, str]:
+        """
+        Resolves a 'prefabs' entry of 'sdutils.json', like `glob(f"{element}*")` would.
+
+        The last part of `element` is a name prefix, looked up with a binary search
+        in the sorted listing of its directory. Entries with wildcards are matched
+        part by part against the indexed listings, with the `glob` semantics. Matching
+        folders are expanded to all their files.
+
+        Returns:
+            A mapping of paths relative to the destination 'Prefabs' folder to
+            paths relative to the library.
+        """
+        if not self.refreshed:
+            self.refresh()
+
+        element = element.replace("\\", "/").lstrip("/")
+
+        if glob.has_magic(element):
+            found = self._glob(f"{element}*")
+        else:
+            dir_name, _, prefix = element.rpartition("/")
+            dir_name = dir_name.strip("/")
+            listing = self.dirs.get(dir_name)
+
+            if listing is None:
+                return dict()
+
+            found = [(dir_name, name, False) for name in _prefixed(listing.files, prefix)]
+            found += [(dir_name, name, True) for name in _prefixed(listing.dirs, prefix)]
+
+        matches = dict()
+
+        for dir_name, name, is_dir in found:
+
+            if not is_dir:
+                matches[name] = _join(dir_name, name)
+                continue
+
+            base = _join(dir_name, name)
+
+            for file in self._tree_files(base):
+                matches[name + file[len(base):]] = file
+
+        return matches
+
+    def _glob(self, pattern: str) -> List[Tuple[str, str, bool]]:
+        """
+        Matches a pattern against the indexed listings as `glob.glob` would, without `**`.
+
+        Returns:
+            The directory, name and kind (True for folders) of each matching entry.
+        """
+        *parts, last = [part for part in pattern.split("/") if part]
+        dir_names = [""]
+
+        for part in parts:
+            dir_names = [
+                _join(dir_name, name)
+                for dir_name in dir_names
+                for name in self._glob_names(self.dirs[dir_name].dirs, part)
+            ]
+
+        found = list()
+
+        for dir_name in dir_names:
+            listing = self.dirs[dir_name]
+            found += [(dir_name, name, False) for name in self._glob_names(listing.files, last)]
+            found += [(dir_name, name, True) for name in self._glob_names(listing.dirs, last)]
+
+        return found
+
+    @staticmethod
+    def _glob_names(names, part: str) -> List[str]:
+        """
+        Returns the names matching one part of a pattern, case-insensitively on Windows,
+        hidden names being left out unless the part starts with a dot, as with `glob`.
+        """
+        if not glob.has_magic(part):
+            return [name for name in names if os.path.normcase(name) == os.path.normcase(part)]
+
+        return [name for name in fnmatch.filter(names, part) if not name.startswith(".") or part.startswith(".")]
+
+
+def _join(dir_name: str, name: str) -> str:
+    return f"{dir_name}/{name}" if dir_name else name
+
+
+def _prefixed(names, prefix: str) -> List[str]:
+    """
+    Returns the names starting with `prefix`, from a sequence of names sorted by
+    `os.path.normcase`, so that matching is case-insensitive on Windows as with `glob`.
+    Hidden names are left out, as `glob` would.
+    """
+    names = list(names)
+    prefix = os.path.normcase(prefix)
+    start = bisect.bisect_left(names, prefix, key=os.path.normcase)
+    result = list()
+
+    for name in names[start:]:
+
+        if not os.path.normcase(name).startswith(prefix):
+            break
+
+        if not name.startswith("."):
+            result.append(name)
+
+    return result
+
+
+_indexes: Dict[Path, PrefabIndex] = dict()
+_indexes_lock = threading.Lock()
+
+
+def get_index(root: Path) -> PrefabIndex:
+    """
+    Returns the memoized index of a prefab library, loaded on first access.
+    """
+    root = Path(root).resolve()
+
+    with _indexes_lock:
+        if root not in _indexes:
+            _indexes[root] = PrefabIndex(root)
+
+        return _indexes[root]
+
+
+def invalidate(path: Path = None) -> None:
+    """
+    Makes the indexes of the libraries holding or inside `path`, or all of them,
+    refresh again on their next use.
+    """
+    with _indexes_lock:
+        for root, index in _indexes.items():
+            if path is None or Path(path).is_relative_to(root) or root.is_relative_to(path):
+                index.refreshed = False
+
+
+def sync_files(files: Dict[str, Path], dst: Path, jobs: int = None) -> Tuple[int, int, int, int]:
+    """
+    Mirrors a set of files into the folder `dst`, copying only the files whose size or
+    mtime differ, and deleting the files of `dst` which are not part of the set.
+    Copies go through the shared copy engine, see `copying.copy_files`.
+
+    Args:
+        files: A mapping of paths relative to `dst` to source files.
+
+    Returns:
+        The number of files copied, unchanged and removed, then the number of bytes copied.
+    """
+    to_copy = list()
+    unchanged = removed = 0
+
+    for name, src in files.items():
+
+        target = Path(dst, name)
+        stat = src.stat()
+
+        try:
+            target_stat = target.stat()
+
+            if target_stat.st_size == stat.st_size and target_stat.st_mtime_ns == stat.st_mtime_ns:
+                unchanged += 1
+                continue
+
+        except OSError:
+            pass
+
+        to_copy.append((src, target))
+
+    copied_bytes = copying.copy_files(to_copy, jobs)
+
+    if dst.exists():
+        for dir_path, _, dir_files in os.walk(dst, topdown=False):
+            for file in dir_files:
+
+                path = Path(dir_path, file)
+
+                if path.relative_to(dst).as_posix() not in files:
+                    path.unlink()
+                    removed += 1
+
+            if dir_path != str(dst) and not os.listdir(dir_path):
+                os.rmdir(dir_path)
+
+    return len(to_copy), unchanged, removed, copied_bytes
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional
+import functools
+import threading
+import json
+import time
+import os
+
+import click
+
+from .utils import format_bytes
+
+
+@dataclass
+class Span:
+    """
+    A timed phase of a command, nested in the phase running when it started on the same thread.
+
+    Attributes:
+        name: Name of the phase, such as 'compile' or 'archive'.
+        start: Start time, from `time.perf_counter`, in seconds.
+        end: End time, or None while running.
+        thread: Identifier of the thread running the phase.
+        files: Number of files the phase read, wrote or copied.
+        bytes: Number of bytes the phase moved.
+        children: Phases started within this one.
+    """
+    name: str
+    start: float
+    end: Optional[float] = None
+    thread: int = 0
+    files: int = 0
+    bytes: int = 0
+    children: List[Span] = field(default_factory=list)
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+
+class Tracer:
+    """
+    Records nested spans of work, when enabled through `--profile`.
+
+    Disabled tracers still yield spans, so that instrumented code can set their
+    counters unconditionally, but nothing is kept.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.roots: List[Span] = list()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def _stack(self) -> List[Span]:
+        if not hasattr(self.local, "stack"):
+            self.local.stack = list()
+
+        return self.local.stack
+
+    def current(self) -> Span:
+        """
+        Returns the innermost running span of this thread, or a throwaway one.
+        """
+        stack = self._stack()
+        return stack[-1] if stack else Span("", time.perf_counter())
+
+    @contextmanager
+    def span(self, name: str, parent: Span = None) -> Iterator[Span]:
+        """
+        Times the enclosed block as a span child of the current span of this thread.
+
+        Work handed over to another thread can pass the span it belongs to as `parent`.
+        """
+        span = Span(name, time.perf_counter(), thread=threading.get_ident())
+
+        if not self.enabled:
+            yield span
+            return
+
+        stack = self._stack()
+        parent = parent or (stack[-1] if stack else None)
+
+        if parent is not None:
+            with self.lock:
+                parent.children.append(span)
+        else:
+            with self.lock:
+                self.roots.append(span)
+
+        stack.append(span)
+
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter()
+            stack.pop()
+
+    def summary(self) -> str:
+        """
+        Formats the recorded spans as an indented table: wall time, files and bytes.
+        """
+        lines = [f"{'phase':<48} {'wall':>10} {'files':>8} {'bytes':>12}"]
+
+        def add(span: Span, depth: int):
+            name = f"{'  ' * depth}{span.name}"
+            lines.append(f"{name:<48} {span.duration * 1000:>8.1f}ms {span.files or '':>8} {format_bytes(span.bytes):>12}")
+
+            for child in span.children:
+                add(child, depth + 1)
+
+        for root in sorted(self.roots, key=lambda span: span.start):
+            add(root, 0)
+
+        return "\n".join(lines)
+
+    def write_chrome_trace(self, path: str) -> None:
+        """
+        Writes the recorded spans as Chrome trace events, to open with 'chrome://tracing' or Perfetto.
+        """
+        events = list()
+        origin = min((span.start for span in self.roots), default=0)
+
+        def add(span: Span):
+            events.append({
+                "name": span.name,
+                "cat": "sdutils",
+                "ph": "X",
+                "ts": (span.start - origin) * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": os.getpid(),
+                "tid": span.thread,
+                "args": {"files": span.files, "bytes": span.bytes},
+            })
+
+            for child in span.children:
+                add(child)
+
+        for root in self.roots:
+            add(root)
+
+        with open(path, "w") as writer:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, writer)
+
+
+# Global tracer of the running command
+TRACER = Tracer()
+
+
+def span(name: str, parent: Span = None):
+    """
+    Shortcut for `TRACER.span`.
+    """
+    return TRACER.span(name, parent)
+
+
+def current_span() -> Span:
+    """
+    Shortcut for `TRACER.current`, to set the counters of the running span.
+    """
+    return TRACER.current()
+
+
+def traced(name: str):
+    """
+    Decorator running each call of the decorated function in a span named `name`.
+    """
+    def decorator(function):
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with TRACER.span(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def profile_option(command):
+    """
+    Click decorator adding the `--profile` and `--trace` options to a command.
+
+    With `--profile`, the phases of the command are timed and a summary table is
+    printed once done. `--trace` also writes them as a Chrome trace file.
+    """
+    @click.option("--profile", is_flag=True, help="Print the time spent in each phase.")
+    @click.option("--trace", type=click.Path(dir_okay=False), help="Write the phases to a Chrome trace file.")
+    @functools.wraps(command)
+    def wrapper(*args, profile: bool, trace: str, **kwargs):
+
+        if not (profile or trace):
+            return command(*args, **kwargs)
+
+        TRACER.enabled = True
+        TRACER.roots.clear()
+
+        try:
+            with TRACER.span(command.__name__.removeprefix("cmd_")):
+                return command(*args, **kwargs)
+
+        finally:
+            TRACER.enabled = False
+            print(TRACER.summary())
+
+            if trace:
+                TRACER.write_chrome_trace(trace)
+
+    return wrapper
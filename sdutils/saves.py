@@ -0,0 +1,464 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import threading
+import json
+import time
+import os
+
+from . import copying
+from .config import USER_CACHE_DIR
+from .install import remove_path
+from .manifest import file_digest
+from .trash import Trash
+from .utils import format_bytes
+
+
+# Folder of the snapshot store: content-addressed file objects, and one manifest per snapshot
+SAVES_STORE_DIR = Path(USER_CACHE_DIR, "saves")
+
+# Bump when the snapshot manifest layout changes, older snapshots are then ignored
+SNAPSHOT_VERSION = 1
+
+
+@dataclass
+class SnapshotFile:
+    """
+    A file of a snapshotted save.
+
+    Attributes:
+        sha256: Hex digest of the file content, naming its object in the store.
+        size: Size of the file, in bytes.
+        mtime: Last modification time of the file, in nanoseconds.
+    """
+    sha256: str
+    size: int
+    mtime: int
+
+
+@dataclass
+class Snapshot:
+    """
+    Manifest of a save snapshot: the paths of its files relative to the save folder,
+    and the store objects holding their content.
+    """
+    world: str
+    save: str
+    name: str
+    created: float
+    files: Dict[str, SnapshotFile] = field(default_factory=dict)
+    dirs: List[str] = field(default_factory=list)
+
+    @property
+    def size(self) -> int:
+        return sum(entry.size for entry in self.files.values())
+
+    @property
+    def objects(self) -> set:
+        return {entry.sha256 for entry in self.files.values()}
+
+    def __str__(self) -> str:
+        created = datetime.fromtimestamp(self.created).strftime("%Y-%m-%d %H:%M:%S")
+        return f"{self.world}/{self.save}/{self.name} ({created}, {len(self.files)} files, {format_bytes(self.size) or '0B'})"
+
+
+@dataclass
+class RestoreReport:
+    """
+    Summary of a snapshot restore.
+    """
+    written: int = 0
+    linked: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.written} written, {self.linked} linked, {self.unchanged} unchanged,"
+            f" {self.removed} removed in {self.seconds:.2f}s"
+        )
+
+
+def save_dir(user_dir: Path, world: str, save: str) -> Path:
+    """
+    Returns the folder of a save, in the game user data folder.
+    """
+    return Path(user_dir, "Saves", world, save)
+
+
+class SaveStore:
+    """
+    Content-addressed store of save snapshots.
+
+    File contents are stored once under their SHA256, whatever the number of snapshots
+    and saves holding them. A snapshot only hashes the files whose size or mtime changed
+    since the previous snapshot of the same save.
+
+    A restore only writes the files of the save which differ from the snapshot, through
+    reflinks on copy-on-write filesystems (see `copying.copy_file`), or hardlinks when
+    asked to. Files of the save which are not part of the snapshot are moved to a `Trash`.
+    """
+
+    def __init__(self, root: Path = SAVES_STORE_DIR):
+        self.root = Path(root)
+        self.objects_dir = Path(self.root, "objects")
+        self.snapshots_dir = Path(self.root, "snapshots")
+
+    def object_path(self, sha256: str) -> Path:
+        return Path(self.objects_dir, sha256[:2], sha256)
+
+    def _snapshot_path(self, world: str, save: str, name: str) -> Path:
+        return Path(self.snapshots_dir, world, save, f"{name}.json")
+
+    def _read_snapshot(self, path: Path) -> Optional[Snapshot]:
+        try:
+            with open(path, "rb") as reader:
+                datas: dict = json.load(reader)
+
+        except (OSError, ValueError):
+            return None
+
+        if datas.get("version") != SNAPSHOT_VERSION:
+            return None
+
+        return Snapshot(
+            world=datas["world"],
+            save=datas["save"],
+            name=datas["name"],
+            created=datas["created"],
+            files={name: SnapshotFile(*entry) for name, entry in datas["files"].items()},
+            dirs=datas["dirs"],
+        )
+
+    def _write_snapshot(self, snapshot: Snapshot) -> None:
+        datas = {
+            "version": SNAPSHOT_VERSION,
+            "world": snapshot.world,
+            "save": snapshot.save,
+            "name": snapshot.name,
+            "created": snapshot.created,
+            "files": {name: [entry.sha256, entry.size, entry.mtime] for name, entry in sorted(snapshot.files.items())},
+            "dirs": sorted(snapshot.dirs),
+        }
+
+        path = self._snapshot_path(snapshot.world, snapshot.save, snapshot.name)
+        os.makedirs(path.parent, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+
+        with open(tmp_path, "w") as writer:
+            json.dump(datas, writer)
+
+        os.replace(tmp_path, path)
+
+    def list(self, world: str = None, save: str = None) -> List[Snapshot]:
+        """
+        Lists the snapshots of a save, of a world, or all of them, oldest first.
+        """
+        pattern = f"{world or '*'}/{save or '*'}/*.json"
+        snapshots = [self._read_snapshot(path) for path in self.snapshots_dir.glob(pattern)]
+
+        return sorted((snapshot for snapshot in snapshots if snapshot is not None), key=lambda s: s.created)
+
+    def get(self, world: str, save: str, name: str = None) -> Snapshot:
+        """
+        Returns a snapshot of a save, the latest one when `name` is not set.
+
+        Raises:
+            SystemExit: If there is no such snapshot.
+        """
+        if name is not None:
+            snapshot = self._read_snapshot(self._snapshot_path(world, save, name))
+        else:
+            snapshots = self.list(world, save)
+            snapshot = snapshots[-1] if snapshots else None
+
+        if snapshot is None:
+            raise SystemExit(f"Error: no snapshot '{name or 'latest'}' of save '{world}/{save}'")
+
+        return snapshot
+
+    def _store_object(self, src: Path, sha256: str) -> int:
+        """
+        Copies a file into the store, unless an object with the same content exists.
+
+        Returns:
+            The number of bytes stored.
+        """
+        path = self.object_path(sha256)
+
+        if path.exists():
+            return 0
+
+        os.makedirs(path.parent, exist_ok=True)
+        tmp_path = path.with_name(f"{sha256}.{os.getpid()}-{threading.get_ident()}.tmp")
+
+        size = copying.copy_file(src, tmp_path)
+        os.replace(tmp_path, path)
+
+        return size
+
+    def snapshot(self, src_dir: Path, world: str, save: str, name: str = None, jobs: int = None) -> Tuple[Snapshot, int]:
+        """
+        Snapshots a save folder into the store.
+
+        Args:
+            src_dir: Folder of the save.
+            name: Name of the snapshot, its creation date by default. An existing snapshot is replaced.
+            jobs: Number of files hashed and stored concurrently.
+
+        Returns:
+            The snapshot, and the number of bytes added to the store.
+
+        Raises:
+            SystemExit: If the save folder does not exist.
+        """
+        if not src_dir.is_dir():
+            raise SystemExit(f"Error: save folder not found: '{src_dir}'")
+
+        created = time.time()
+        name = name or datetime.fromtimestamp(created).strftime("%Y%m%d-%H%M%S")
+
+        previous = self.list(world, save)
+        known = previous[-1].files if previous else dict()
+
+        snapshot = Snapshot(world, save, name, created)
+        stats: Dict[str, os.stat_result] = dict()
+
+        for dir_path, dir_names, file_names in os.walk(src_dir):
+
+            rel_dir = Path(dir_path).relative_to(src_dir)
+
+            for dir_name in dir_names:
+                snapshot.dirs.append(Path(rel_dir, dir_name).as_posix())
+
+            for file_name in file_names:
+                stats[Path(rel_dir, file_name).as_posix()] = os.stat(Path(dir_path, file_name))
+
+        def store(item: Tuple[str, os.stat_result]) -> Tuple[str, SnapshotFile, int]:
+            rel, stat = item
+            entry = known.get(rel)
+
+            if entry is None or entry.size != stat.st_size or entry.mtime != stat.st_mtime_ns:
+                entry = SnapshotFile(file_digest(Path(src_dir, rel)), stat.st_size, stat.st_mtime_ns)
+
+            return rel, entry, self._store_object(Path(src_dir, rel), entry.sha256)
+
+        with ThreadPoolExecutor(max_workers=jobs or copying.DEFAULT_COPY_JOBS) as executor:
+            results = list(executor.map(store, stats.items()))
+
+        snapshot.files = {rel: entry for rel, entry, _ in results}
+        self._write_snapshot(snapshot)
+
+        return snapshot, sum(size for _, _, size in results)
+
+    def restore(
+        self, snapshot: Snapshot, dst_dir: Path, trash: Trash = None, link: bool = False, jobs: int = None
+    ) -> RestoreReport:
+        """
+        Restores a snapshot into a save folder, writing only the files which differ from it.
+
+        A file of the save is kept when its size and mtime match the snapshot, or when it
+        is still a hardlink to the store object. Other files are replaced, and the files
+        which are not part of the snapshot are removed.
+
+        Args:
+            dst_dir: Folder of the save, created if missing.
+            trash: Trash receiving the removed files, deleted right away when not set.
+            link: Hardlinks the files to the store objects rather than copying them. The game
+                must then not modify the restored files in place, as it would modify the store.
+            jobs: Number of files written concurrently.
+
+        Raises:
+            SystemExit: If an object of the snapshot is missing or was modified.
+        """
+        start = time.perf_counter()
+        report = RestoreReport()
+        to_write: List[Tuple[str, SnapshotFile]] = list()
+
+        for rel, entry in snapshot.files.items():
+
+            path = Path(dst_dir, rel)
+            object_path = self.object_path(entry.sha256)
+
+            try:
+                object_stat = object_path.stat()
+            except OSError:
+                raise SystemExit(f"Error: snapshot '{snapshot.name}' is missing the content of '{rel}', take it again")
+
+            if object_stat.st_size != entry.size:
+                raise SystemExit(f"Error: snapshot '{snapshot.name}' content of '{rel}' was modified, take it again")
+
+            try:
+                stat = path.stat()
+
+                if stat.st_ino == object_stat.st_ino and stat.st_dev == object_stat.st_dev:
+                    report.unchanged += 1
+                    continue
+
+                if not link and stat.st_size == entry.size and stat.st_mtime_ns == entry.mtime:
+                    report.unchanged += 1
+                    continue
+
+            except OSError:
+                pass
+
+            to_write.append((rel, entry))
+
+        copying.make_dirs([Path(dst_dir, rel) for rel in snapshot.dirs] + [Path(dst_dir, rel).parent for rel, _ in to_write])
+
+        def write(item: Tuple[str, SnapshotFile]) -> bool:
+            rel, entry = item
+            path = Path(dst_dir, rel)
+            object_path = self.object_path(entry.sha256)
+
+            if link:
+                path.unlink(missing_ok=True)
+
+                try:
+                    os.link(object_path, path)
+                    return True
+                except OSError:
+                    pass
+
+            copying.copy_file(object_path, path, preserve_mtime=False, replace=True)
+            os.utime(path, ns=(entry.mtime, entry.mtime))
+
+            return False
+
+        with ThreadPoolExecutor(max_workers=jobs or copying.DEFAULT_COPY_JOBS) as executor:
+            for (_, entry), linked in zip(to_write, executor.map(write, to_write)):
+
+                if linked:
+                    report.linked += 1
+                else:
+                    report.written += 1
+                    report.bytes += entry.size
+
+        dirs = set(snapshot.dirs)
+
+        for dir_path, dir_names, file_names in os.walk(dst_dir):
+
+            rel_dir = Path(dir_path).relative_to(dst_dir)
+
+            for file_name in file_names:
+                if Path(rel_dir, file_name).as_posix() not in snapshot.files:
+                    self._remove(Path(dir_path, file_name), trash)
+                    report.removed += 1
+
+            for dir_name in list(dir_names):
+                if Path(rel_dir, dir_name).as_posix() not in dirs:
+                    self._remove(Path(dir_path, dir_name), trash)
+                    dir_names.remove(dir_name)
+                    report.removed += 1
+
+        report.seconds = time.perf_counter() - start
+        return report
+
+    @staticmethod
+    def _remove(path: Path, trash: Optional[Trash]) -> None:
+        if trash is not None:
+            trash.discard(path)
+            return
+
+        remove_path(path)
+
+    def delete(self, snapshot: Snapshot) -> None:
+        """
+        Deletes a snapshot manifest, its objects are freed by `collect`.
+        """
+        path = self._snapshot_path(snapshot.world, snapshot.save, snapshot.name)
+        path.unlink(missing_ok=True)
+
+        for folder in (path.parent, path.parent.parent):
+            try:
+                os.rmdir(folder)
+            except OSError:
+                break
+
+    def prune(self, keep: int, world: str = None, save: str = None) -> List[Snapshot]:
+        """
+        Deletes the snapshots of each save but its `keep` latest ones, their objects
+        are freed by `collect`.
+
+        Returns:
+            The deleted snapshots.
+        """
+        by_save: Dict[Tuple[str, str], List[Snapshot]] = dict()
+
+        for snapshot in self.list(world, save):
+            by_save.setdefault((snapshot.world, snapshot.save), list()).append(snapshot)
+
+        deleted = list()
+
+        for snapshots in by_save.values():
+            for snapshot in snapshots[:max(0, len(snapshots) - keep)]:
+                self.delete(snapshot)
+                deleted.append(snapshot)
+
+        return deleted
+
+    def collect(self) -> Tuple[int, int]:
+        """
+        Deletes the objects which no snapshot references.
+
+        Returns:
+            The number of objects deleted and the number of bytes freed.
+        """
+        referenced = set()
+
+        for snapshot in self.list():
+            referenced |= snapshot.objects
+
+        count = freed = 0
+
+        if not self.objects_dir.is_dir():
+            return count, freed
+
+        for entry in os.scandir(self.objects_dir):
+            for object_entry in os.scandir(entry.path):
+
+                if object_entry.name in referenced:
+                    continue
+
+                freed += object_entry.stat().st_size
+                os.unlink(object_entry.path)
+                count += 1
+
+        return count, freed
+
+    def usage(self) -> Tuple[int, int]:
+        """
+        Returns the number of objects in the store and their size on disk.
+        """
+        count = size = 0
+
+        if not self.objects_dir.is_dir():
+            return count, size
+
+        for entry in os.scandir(self.objects_dir):
+            for object_entry in os.scandir(entry.path):
+                count += 1
+                size += object_entry.stat().st_size
+
+        return count, size
+
+    def exclusive_size(self, snapshot: Snapshot, snapshots: List[Snapshot]) -> int:
+        """
+        Returns the size of the objects only `snapshot` references among `snapshots`,
+        the space pruning it would free.
+        """
+        shared = set()
+
+        for other in snapshots:
+            if other is not snapshot:
+                shared |= other.objects
+
+        sizes = {entry.sha256: entry.size for entry in snapshot.files.values()}
+        return sum(size for sha256, size in sizes.items() if sha256 not in shared)
+
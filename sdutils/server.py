@@ -0,0 +1,471 @@
+"""
+Supervisor of local dedicated server instances.
+
+A single instance runs the server executable with the server's own `serverconfig.xml`
+and user data folder, while several instances each get their own configuration, ports
+and user data folder. Every instance writes its log to a known file. The supervisor follows these
+logs as they grow, detects readiness and fatal mod loading errors from their lines,
+and records the time each start took to get ready.
+"""
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+import xml.etree.ElementTree as ET
+import subprocess
+import signal
+import json
+import time
+import sys
+import os
+import re
+
+from .config import USER_CACHE_DIR
+
+
+# Folder holding a configuration, user data and log folder per server instance
+SERVERS_DIR = Path(USER_CACHE_DIR, "servers")
+
+# Time-to-ready of every server start, one JSON object per line
+HISTORY_PATH = Path(SERVERS_DIR, "history.jsonl")
+
+# Executables of the dedicated server, by platform
+SERVER_EXECUTABLES = ("7DaysToDieServer.exe", "7DaysToDieServer.x86_64")
+
+# Log lines telling that the server accepts players
+READY_PATTERNS = (
+    r"\bStartGame done\b",
+)
+
+# Log lines telling that a mod or the game configuration failed to load
+FATAL_PATTERNS = (
+    r"\bERR \[MODS\]",
+    r"\bERR XML loader:",
+    r"Loading and parsing '[^']*' failed",
+    r"\bEXC\b.*Exception",
+    r"\bCrash!!!",
+)
+
+# Port properties of 'serverconfig.xml' and their default values, shifted by `PORT_STRIDE` for each instance
+PORT_PROPERTIES = {"ServerPort": 26900, "TelnetPort": 8081, "ControlPanelPort": 8080, "WebDashboardPort": 8080}
+
+# Ports between instances, the game also using a few ports above 'ServerPort'
+PORT_STRIDE = 10
+
+# Arguments of the server executable, as set by 'startdedicated.bat'
+SERVER_ARGUMENTS = ("-quit", "-batchmode", "-nographics", "-dedicated")
+
+
+@dataclass
+class ServerStart:
+    """
+    Outcome of a server instance start.
+
+    Attributes:
+        instance: Name of the instance.
+        port: 'ServerPort' of the instance.
+        status: 'ready', 'fatal', 'exited', 'timeout' or 'interrupted'.
+        seconds: Time from the launch to readiness, or to the failure.
+        errors: Fatal log lines.
+        warnings: Number of warning and error log lines before readiness.
+        log: Path of the log file.
+        started: Launch date, as a Unix timestamp.
+        mod: Name of the tested mod.
+        commit: Commit hash of the tested mod.
+    """
+    instance: str
+    port: int
+    status: str = "starting"
+    seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)
+    warnings: int = 0
+    log: str = ""
+    started: float = 0.0
+    mod: Optional[str] = None
+    commit: Optional[str] = None
+
+    def __str__(self) -> str:
+        text = f"{self.instance} (port {self.port}): {self.status} in {self.seconds:.1f}s"
+
+        if self.warnings:
+            text += f", {self.warnings} warnings"
+
+        return text
+
+
+class LogTail:
+    """
+    Reads the lines appended to a log file since the last read, as `tail -f` does.
+    A file which does not exist yet reads as empty.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.offset = 0
+        self.partial = b""
+
+    def read_lines(self) -> List[str]:
+        try:
+            with open(self.path, "rb") as reader:
+                reader.seek(self.offset)
+                data = reader.read()
+
+        except OSError:
+            return []
+
+        self.offset += len(data)
+        lines = (self.partial + data).split(b"\n")
+        self.partial = lines.pop()
+
+        return [line.rstrip(b"\r").decode("utf-8", errors="replace") for line in lines]
+
+
+def find_executable(server_dir: Path) -> Path:
+    """
+    Returns the server executable of a dedicated server installation.
+
+    Raises:
+        SystemExit: If there is none.
+    """
+    for name in SERVER_EXECUTABLES:
+        path = Path(server_dir, name)
+
+        if path.exists():
+            return path
+
+    raise SystemExit(f"Error: no server executable found in '{server_dir}'")
+
+
+def _read_properties(root: ET.Element) -> Dict[str, ET.Element]:
+    return {element.get("name"): element for element in root.iter("property")}
+
+
+def read_server_port(config: Path) -> int:
+    """
+    Returns the 'ServerPort' of a 'serverconfig.xml', or the default one.
+    """
+    try:
+        value = _read_properties(ET.parse(config).getroot())["ServerPort"].get("value", "")
+    except (OSError, ET.ParseError, KeyError):
+        return PORT_PROPERTIES["ServerPort"]
+
+    return int(value) if value.isdigit() else PORT_PROPERTIES["ServerPort"]
+
+
+def write_instance_config(base_config: Path, dst: Path, index: int, port: int, user_dir: Path) -> None:
+    """
+    Writes the 'serverconfig.xml' of an instance: the base configuration of the server,
+    with ports shifted by the instance index and a user data folder of its own.
+
+    Ports missing from the base configuration are shifted from their default value,
+    so that no two instances share one.
+    """
+    if base_config.exists():
+        root = ET.parse(base_config).getroot()
+    else:
+        root = ET.Element("ServerSettings")
+
+    properties = _read_properties(root)
+
+    def set_property(name: str, value: str):
+        if name not in properties:
+            properties[name] = ET.SubElement(root, "property", name=name)
+
+        properties[name].set("value", value)
+
+    for name, default in PORT_PROPERTIES.items():
+        value = properties[name].get("value", "") if name in properties else ""
+        set_property(name, str((int(value) if value.isdigit() else default) + index * PORT_STRIDE))
+
+    set_property("ServerPort", str(port))
+    set_property("UserDataFolder", str(user_dir))
+
+    os.makedirs(dst.parent, exist_ok=True)
+    ET.ElementTree(root).write(dst, encoding="utf-8", xml_declaration=True)
+
+
+class ServerInstance:
+    """
+    A server process, along with its configuration, user data folder and log file.
+
+    A shared instance runs with the configuration and user data folder of the server
+    itself, an isolated one with copies of its own.
+    """
+
+    def __init__(self, name: str, index: int, port: int, isolated: bool = True):
+        self.name = name
+        self.index = index
+        self.port = port
+        self.isolated = isolated
+        self.dir = Path(SERVERS_DIR, name)
+        self.config_path = Path(self.dir, "serverconfig.xml")
+        self.user_dir = Path(self.dir, "UserData")
+        self.log_path = Path(self.dir, "output_log.txt")
+        self.state_path = Path(self.dir, "instance.json")
+        self.process: Optional[subprocess.Popen] = None
+        self.tail = LogTail(self.log_path)
+        self.start = ServerStart(name, port, log=str(self.log_path))
+
+    def launch(self, server_dir: Path, executable: Path) -> None:
+        # an instance of the same name still running from a previous command
+        _stop_pid(self.state_path)
+
+        if self.isolated:
+            write_instance_config(Path(server_dir, "serverconfig.xml"), self.config_path, self.index, self.port, self.user_dir)
+            os.makedirs(self.user_dir, exist_ok=True)
+
+        else:
+            self.config_path = Path(server_dir, "serverconfig.xml")
+            os.makedirs(self.dir, exist_ok=True)
+
+        # a fresh log, so that the lines of a previous run are not matched again
+        self.log_path.unlink(missing_ok=True)
+
+        command = [str(executable), "-logfile", str(self.log_path), *SERVER_ARGUMENTS, f"-configfile={self.config_path}"]
+
+        with open(Path(self.dir, "console.txt"), "wb") as console:
+            self.process = subprocess.Popen(
+                command,
+                cwd=server_dir,
+                stdin=subprocess.DEVNULL,
+                stdout=console,
+                stderr=subprocess.STDOUT,
+            )
+
+        self.start.started = time.time()
+
+        with open(self.state_path, "w") as writer:
+            json.dump({"pid": self.process.pid, "port": self.port, "log": str(self.log_path)}, writer)
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+        self.state_path.unlink(missing_ok=True)
+
+
+class ServerSupervisor:
+    """
+    Launches server instances, then follows their logs until each is ready or failed.
+    """
+
+    def __init__(
+        self,
+        server_dir: Path,
+        executable: Path = None,
+        ready: Iterable[str] = READY_PATTERNS,
+        fatal: Iterable[str] = FATAL_PATTERNS,
+        on_line: Callable[[ServerInstance, str], None] = None,
+    ):
+        """
+        Args:
+            server_dir: Dedicated server installation, holding its 'Mods' folder.
+            executable: Server executable, found in `server_dir` by default.
+            ready: Patterns of the log line telling that a server is ready.
+            fatal: Patterns of the log lines telling that a server failed to load.
+            on_line: Called with every log line, as it is written.
+        """
+        self.server_dir = Path(server_dir)
+        self.executable = executable or find_executable(self.server_dir)
+        self.ready = re.compile("|".join(ready))
+        self.fatal = re.compile("|".join(fatal))
+        self.on_line = on_line
+        self.instances: List[ServerInstance] = list()
+
+    def launch(self, count: int = 1, port: int = None, prefix: str = "server") -> List[ServerInstance]:
+        """
+        Launches `count` instances, with ports `PORT_STRIDE` apart from `port`.
+
+        A single instance on the port of the server configuration runs with the server's
+        own configuration and user data, which the game saves commands work on. Several
+        instances, or another port, get copies of their own under `SERVERS_DIR`.
+
+        Args:
+            port: 'ServerPort' of the first instance, the one of the server configuration by default.
+        """
+        base_port = read_server_port(Path(self.server_dir, "serverconfig.xml"))
+        isolated = count > 1 or port not in (None, base_port)
+        port = port or base_port
+
+        for index in range(count):
+            name = prefix if count == 1 else f"{prefix}-{index + 1}"
+            instance = ServerInstance(name, index, port + index * PORT_STRIDE, isolated)
+            instance.launch(self.server_dir, self.executable)
+            self.instances.append(instance)
+
+        return self.instances
+
+    def _read(self, instance: ServerInstance) -> None:
+        """
+        Processes the new log lines of a starting instance, updating its status.
+        """
+        start = instance.start
+
+        for line in instance.tail.read_lines():
+
+            if self.on_line is not None:
+                self.on_line(instance, line)
+
+            if start.status != "starting":
+                continue
+
+            if self.fatal.search(line):
+                start.errors.append(line)
+                start.status = "fatal"
+
+            elif self.ready.search(line):
+                start.status = "ready"
+
+            elif " WRN " in line or " ERR " in line:
+                start.warnings += 1
+
+            if start.status != "starting":
+                start.seconds = time.time() - start.started
+
+    def wait(self, timeout: float = 300, interval: float = 0.05) -> List[ServerStart]:
+        """
+        Follows the logs of the launched instances until every one is ready, failed, or
+        timed out. Failed instances are stopped.
+
+        Returns:
+            The outcome of each start.
+        """
+        deadline = time.monotonic() + timeout
+        pending = list(self.instances)
+
+        try:
+            while pending:
+
+                for instance in list(pending):
+                    self._read(instance)
+                    start = instance.start
+
+                    if start.status == "starting" and instance.process.poll() is not None:
+                        self._read(instance)
+
+                        if start.status == "starting":
+                            start.status = "exited"
+                            start.seconds = time.time() - start.started
+                            start.errors.append(f"exited with code {instance.process.returncode}")
+
+                    if start.status == "starting" and time.monotonic() > deadline:
+                        start.status = "timeout"
+                        start.seconds = time.time() - start.started
+
+                    if start.status != "starting":
+                        pending.remove(instance)
+
+                        if start.status != "ready":
+                            instance.stop()
+
+                if pending:
+                    time.sleep(interval)
+
+        except KeyboardInterrupt:
+            for instance in pending:
+                instance.start.status = "interrupted"
+                instance.start.seconds = time.time() - instance.start.started
+                instance.stop()
+
+        return [instance.start for instance in self.instances]
+
+    def follow(self, interval: float = 0.2) -> None:
+        """
+        Keeps following the logs of the running instances, until they all exit or Ctrl+C.
+        """
+        try:
+            while any(i.process.poll() is None for i in self.instances if i.start.status == "ready"):
+                for instance in self.instances:
+                    self._read(instance)
+
+                time.sleep(interval)
+
+        except KeyboardInterrupt:
+            pass
+
+        for instance in self.instances:
+            self._read(instance)
+
+            if instance.process.poll() is not None:
+                instance.state_path.unlink(missing_ok=True)
+
+    def stop(self) -> None:
+        for instance in self.instances:
+            instance.stop()
+
+
+def record(starts: Iterable[ServerStart]) -> None:
+    """
+    Appends server starts to the history.
+    """
+    os.makedirs(HISTORY_PATH.parent, exist_ok=True)
+
+    with open(HISTORY_PATH, "a") as writer:
+        for start in starts:
+            writer.write(json.dumps(asdict(start)) + "\n")
+
+
+def history(limit: int = None) -> List[ServerStart]:
+    """
+    Reads the recorded server starts, oldest first.
+    """
+    starts = list()
+
+    try:
+        with open(HISTORY_PATH, "r") as reader:
+            for line in reader:
+                try:
+                    starts.append(ServerStart(**json.loads(line)))
+                except (ValueError, TypeError):
+                    pass
+
+    except OSError:
+        pass
+
+    return starts[-limit:] if limit else starts
+
+
+def _stop_pid(state_path: Path) -> bool:
+    """
+    Stops the process of an instance state file, then deletes the file.
+
+    Returns:
+        True if a process was stopped.
+    """
+    try:
+        with open(state_path, "rb") as reader:
+            pid = json.load(reader)["pid"]
+
+    except (OSError, ValueError, KeyError):
+        return False
+
+    state_path.unlink(missing_ok=True)
+
+    try:
+        if sys.platform == "win32":
+            return subprocess.run(["taskkill", "/F", "/PID", str(pid)], capture_output=True).returncode == 0
+
+        os.kill(pid, signal.SIGTERM)
+        return True
+
+    except OSError:
+        return False
+
+
+def stop_instances() -> int:
+    """
+    Stops the instances started by previous commands, from their state files.
+
+    Returns:
+        The number of instances stopped.
+    """
+    if not SERVERS_DIR.is_dir():
+        return 0
+
+    return sum(_stop_pid(state_path) for state_path in SERVERS_DIR.glob("*/instance.json"))
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Tuple
+import threading
+import uuid
+import time
+import os
+
+from .utils import format_bytes
+
+
+# Name of the trash folder, created next to the discarded paths so that moving them is a rename
+TRASH_DIR_NAME = ".sdutils-trash"
+
+
+@dataclass
+class TrashReport:
+    """
+    Summary of the deletions run in the background by a `Trash`.
+
+    Attributes:
+        discarded: Number of files and folders moved to the trash.
+        files: Number of files deleted.
+        bytes: Number of bytes freed.
+        seconds: Wall time of the background deletion.
+        blocking: Time the caller spent moving paths to the trash.
+    """
+    discarded: int = 0
+    files: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    blocking: float = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.discarded} discarded, {self.files} files, {format_bytes(self.bytes) or '0B'} freed"
+            f" in {self.seconds:.2f}s, {self.blocking * 1000:.0f}ms blocking"
+        )
+
+
+def _delete(path: Path) -> Tuple[int, int]:
+    """
+    Deletes a file or a folder tree.
+
+    Returns:
+        The number of files deleted and their total size.
+    """
+    files = size = 0
+
+    if not path.is_dir() or path.is_symlink():
+        size = path.lstat().st_size
+        path.unlink()
+        return 1, size
+
+    for dir_path, dir_names, file_names in os.walk(path, topdown=False):
+
+        for name in file_names:
+            file = os.path.join(dir_path, name)
+
+            try:
+                size += os.lstat(file).st_size
+                os.unlink(file)
+                files += 1
+            except OSError:
+                pass
+
+        for name in dir_names:
+            try:
+                os.rmdir(os.path.join(dir_path, name))
+            except OSError:
+                pass
+
+    try:
+        os.rmdir(path)
+    except OSError:
+        pass
+
+    return files, size
+
+
+class Trash:
+    """
+    Deletes files and folders off the critical path.
+
+    Discarded paths are first renamed into a trash folder of their volume, which is
+    near-instant and makes them disappear at once. Their deletion then runs on a
+    thread pool, which the caller only waits for once done with everything else.
+    Leftovers of interrupted runs found in the trash folder are deleted too.
+    """
+
+    def __init__(self, root: Path, jobs: int = None):
+        """
+        Args:
+            root: Folder holding the trash folder, on the same volume as the discarded paths.
+            jobs: Number of concurrent deletions.
+        """
+        self.path = Path(root, TRASH_DIR_NAME)
+        self.executor = ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="sdutils-trash")
+        self.futures: List[Future] = list()
+        self.report = TrashReport()
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+
+        if self.path.is_dir():
+            for entry in os.scandir(self.path):
+                self._schedule(Path(entry.path))
+
+    def _schedule(self, path: Path) -> None:
+        self.futures.append(self.executor.submit(self._delete, path))
+
+    def _delete(self, path: Path) -> None:
+        files, size = _delete(path)
+
+        with self.lock:
+            self.report.files += files
+            self.report.bytes += size
+
+    def discard(self, path: Path) -> bool:
+        """
+        Moves a file or folder to the trash, then schedules its deletion.
+
+        Paths which can't be moved, such as on another volume than the trash, are deleted
+        in place before returning, so that the caller can write at `path` right after.
+
+        Returns:
+            False if `path` does not exist.
+        """
+        start = time.perf_counter()
+
+        if not os.path.lexists(path):
+            return False
+
+        os.makedirs(self.path, exist_ok=True)
+        target = Path(self.path, f"{uuid.uuid4().hex[:12]}-{Path(path).name}")
+
+        try:
+            os.rename(path, target)
+        except OSError:
+            self._delete(Path(path))
+        else:
+            self._schedule(target)
+
+        self.report.discarded += 1
+        self.report.blocking += time.perf_counter() - start
+
+        return True
+
+    def wait(self) -> TrashReport:
+        """
+        Waits for all the scheduled deletions, then removes the trash folder if empty.
+
+        Raises:
+            OSError: If a deletion failed.
+        """
+        self.executor.shutdown(wait=True)
+
+        for future in self.futures:
+            future.result()
+
+        try:
+            os.rmdir(self.path)
+        except OSError:
+            pass
+
+        self.report.seconds = time.perf_counter() - self.start
+        return self.report
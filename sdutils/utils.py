@@ -1,6 +1,7 @@
 from pathlib import Path
 from typing import Optional
-import subprocess
+
+from . import git
 
 
 def get_commit_hash(repo_path: Path) -> Optional[str]:
@@ -10,16 +11,19 @@ def get_commit_hash(repo_path: Path) -> Optional[str]:
     if repo_path is None:
         raise ValueError("Null repo_path")
 
-    try:
+    return git.get_repository(repo_path).commit_hash
+
 
-        result = subprocess.run(
-            ["git", "-C", repo_path, "rev-parse", "HEAD"],
-            capture_output=True,
-            text=True,
-            check=True,
-        )
+def format_bytes(size: int) -> str:
+    """
+    Formats a size in bytes for humans (e.g., 1536 -> '1.5KB'), or '' for 0.
+    """
+    if not size:
+        return ""
 
-        return result.stdout.strip()
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
 
-    except Exception:
-        return None
+    return f"{size:.1f}GB"
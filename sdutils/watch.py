@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+import ctypes.util
+import ctypes
+import select
+import struct
+import time
+import sys
+import os
+
+
+# Folder names never watched, as they only hold generated or editor files
+IGNORED_DIRS = {".git", ".vs", ".vscode", "bin", "obj", "build"}
+
+# A watched root: a directory, and whether its sub-directories are watched too
+WatchRoot = Tuple[Path, bool]
+
+
+class Watcher:
+    """
+    Base class of the file system watchers used by `sdutils watch` and the daemon.
+    """
+
+    def __init__(self, roots: Iterable[WatchRoot]):
+        self.roots = [(path.resolve(), recursive) for path, recursive in roots if path.is_dir()]
+
+    def wait(self, debounce: float) -> Set[Path]:
+        """
+        Blocks until something changes under the watched roots, then keeps collecting
+        changes until none happened for `debounce` seconds.
+
+        Returns:
+            The changed paths, files or directories.
+        """
+        raise NotImplementedError()
+
+    def pending(self) -> Set[Path]:
+        """
+        Returns the changes which happened since the last call, without blocking.
+        """
+        raise NotImplementedError()
+
+    def close(self) -> None:
+        pass
+
+
+def _walk_dirs(root: Path, recursive: bool) -> Iterable[Path]:
+    """
+    Yields `root` and, if recursive, all its sub-directories except the ignored ones.
+    """
+    yield root
+
+    if not recursive:
+        return
+
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return
+
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False) and entry.name not in IGNORED_DIRS:
+            yield from _walk_dirs(Path(entry.path), True)
+
+
+class PollingWatcher(Watcher):
+    """
+    Portable watcher comparing snapshots of (mtime, size) built with `os.scandir`.
+    """
+
+    def __init__(self, roots: Iterable[WatchRoot], interval: float = 0.25):
+        super().__init__(roots)
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = dict()
+
+        for root, recursive in self.roots:
+            for dir_path in _walk_dirs(root, recursive):
+                try:
+                    for entry in os.scandir(dir_path):
+                        if entry.is_file(follow_symlinks=False):
+                            stat = entry.stat(follow_symlinks=False)
+                            snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+                except OSError:
+                    continue
+
+        return snapshot
+
+    def _poll(self) -> Set[Path]:
+        snapshot = self._scan()
+        previous, self.snapshot = self.snapshot, snapshot
+
+        changed = {path for path in snapshot.keys() ^ previous.keys()}
+        changed.update(path for path in snapshot.keys() & previous.keys() if snapshot[path] != previous[path])
+
+        return {Path(path) for path in changed}
+
+    def pending(self) -> Set[Path]:
+        return self._poll()
+
+    def wait(self, debounce: float) -> Set[Path]:
+        changes = set()
+
+        while not changes:
+            time.sleep(self.interval)
+            changes = self._poll()
+
+        quiet_since = time.monotonic()
+
+        while time.monotonic() - quiet_since < debounce:
+            time.sleep(min(self.interval, debounce))
+            new_changes = self._poll()
+
+            if new_changes:
+                changes |= new_changes
+                quiet_since = time.monotonic()
+
+        return changes
+
+
+# inotify constants, see <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+_IN_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyWatcher(Watcher):
+    """
+    Linux watcher based on inotify, through ctypes.
+
+    A queue overflow is reported as a change of every watched root, so that the
+    caller falls back to a full resync.
+    """
+
+    def __init__(self, roots: Iterable[WatchRoot]):
+        super().__init__(roots)
+
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.watches: Dict[int, Tuple[Path, bool]] = dict()
+
+        for root, recursive in self.roots:
+            self._add_tree(root, recursive)
+
+    def add_roots(self, roots: Iterable[WatchRoot]) -> List[WatchRoot]:
+        """
+        Starts watching the given roots too, skipping the ones already watched.
+
+        Returns:
+            The roots newly watched.
+        """
+        added = [root for root in Watcher(roots).roots if root not in self.roots]
+
+        for root, recursive in added:
+            self.roots.append((root, recursive))
+            self._add_tree(root, recursive)
+
+        return added
+
+    def _add_tree(self, root: Path, recursive: bool) -> None:
+        for dir_path in _walk_dirs(root, recursive):
+
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dir_path), _IN_MASK)
+
+            if wd >= 0:
+                self.watches[wd] = (dir_path, recursive)
+
+    def _read_events(self) -> Set[Path]:
+        changes = set()
+        buffer = os.read(self.fd, 64 * 1024)
+        offset = 0
+
+        while offset < len(buffer):
+
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            name = buffer[offset + _EVENT_HEADER.size: offset + _EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += _EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                changes.update(root for root, _ in self.roots)
+                continue
+
+            if wd not in self.watches:
+                continue
+
+            dir_path, recursive = self.watches[wd]
+            path = Path(dir_path, os.fsdecode(name)) if name else dir_path
+
+            if mask & IN_ISDIR and path.name in IGNORED_DIRS:
+                continue
+
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and recursive:
+                self._add_tree(path, True)
+
+            changes.add(path)
+
+        return changes
+
+    def wait(self, debounce: float) -> Set[Path]:
+        select.select([self.fd], [], [])
+        changes = self._read_events()
+
+        while select.select([self.fd], [], [], debounce)[0]:
+            changes |= self._read_events()
+
+        return changes
+
+    def pending(self) -> Set[Path]:
+        changes = set()
+
+        while select.select([self.fd], [], [], 0)[0]:
+            changes |= self._read_events()
+
+        return changes
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def create_watcher(roots: List[WatchRoot], poll: bool = False) -> Watcher:
+    """
+    Returns an inotify watcher on Linux, or a polling watcher elsewhere or when `poll` is set.
+    """
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError):
+            print("WRN: inotify unavailable, falling back to polling")
+
+    return PollingWatcher(roots)
@@ -0,0 +1,944 @@
+"""
+XPath 1.0 evaluator over `xml.etree.ElementTree` elements.
+
+`ElementTree` only supports a small XPath subset, while the patches of 7 Days to Die
+mods are evaluated by the game with full XPath 1.0: absolute paths, attribute nodes,
+`contains()` and `starts-with()`, boolean operators and so on. This module covers the
+whole language but namespaces, processing instructions and comments, which the game
+configuration files don't use.
+
+Attribute and text nodes are returned as `Attribute` and `Text` instances, which
+refer to their owner element.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple, Union
+import xml.etree.ElementTree as ET
+import math
+import re
+
+
+class XPathError(ValueError):
+    """
+    Raised for a malformed expression, or an expression which can't be evaluated.
+    """
+
+
+@dataclass(frozen=True)
+class Attribute:
+    """
+    An attribute node.
+    """
+    element: ET.Element = field(compare=False)
+    name: str
+    element_id: int = field(default=0, repr=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "element_id", id(self.element))
+
+    @property
+    def value(self) -> str:
+        return self.element.get(self.name, "")
+
+
+@dataclass(frozen=True)
+class Text:
+    """
+    The text node of an element.
+    """
+    element: ET.Element = field(compare=False)
+    element_id: int = field(default=0, repr=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "element_id", id(self.element))
+
+
+class Document:
+    """
+    The root node of a document, whose single child is the root element.
+    """
+
+    def __init__(self, root: ET.Element):
+        self.root = root
+
+
+Node = Union[ET.Element, Attribute, Text, Document]
+Value = Union[List[Node], str, float, bool]
+
+
+# --- Tokenizer ---
+
+_TOKEN_RE = re.compile(
+    r"""
+    \s*(?:
+        (?P<literal>"[^"]*"|'[^']*')
+      | (?P<number>\d+(?:\.\d*)?|\.\d+)
+      | (?P<op>//|::|\.\.|!=|<=|>=|[/\[\]()@,|.*=<>+-])
+      | (?P<variable>\$[\w.-]+)
+      | (?P<name>[A-Za-z_][\w.-]*(?::[A-Za-z_][\w.-]*)?)
+    )
+    """,
+    re.VERBOSE,
+)
+
+_NODE_TYPES = {"node", "text", "comment", "processing-instruction"}
+
+_NODE_TESTS = {f"{node_type}()" for node_type in _NODE_TYPES}
+
+_AXES = {
+    "ancestor", "ancestor-or-self", "attribute", "child", "descendant", "descendant-or-self",
+    "following", "following-sibling", "parent", "preceding", "preceding-sibling", "self",
+}
+
+
+def _tokenize(expression: str) -> List[Tuple[str, str]]:
+    tokens = list()
+    position = 0
+    expression = expression.rstrip()
+
+    while position < len(expression):
+        match = _TOKEN_RE.match(expression, position)
+
+        if match is None or match.end() == position:
+            raise XPathError(f"unexpected character at {position}: '{expression[position:position + 10]}'")
+
+        kind = match.lastgroup
+        value = match.group(kind)
+
+        # '*' and names are operators when they follow an operand, as 'a * b' or '@x and @y'
+        if tokens and kind in ("name", "op") and value in ("*", "and", "or", "div", "mod"):
+            previous_kind, previous = tokens[-1]
+
+            if not (previous_kind == "op" and previous in ("@", "::", "(", "[", ",", "/", "//", "|", "+", "-", "=", "!=", "<", "<=", ">", ">=")) \
+                    and previous_kind != "operator":
+                kind = "operator"
+
+        tokens.append((kind, value))
+        position = match.end()
+
+    return tokens
+
+
+# --- AST ---
+
+@dataclass
+class Step:
+    axis: str
+    test: str
+    predicates: List = field(default_factory=list)
+
+
+@dataclass
+class Path:
+    """
+    A location path, optionally applied to the result of a filter expression.
+    """
+    absolute: bool
+    steps: List[Step]
+    filter: Optional[object] = None
+
+
+@dataclass
+class Filter:
+    primary: object
+    predicates: List
+
+
+@dataclass
+class Literal:
+    value: Union[str, float]
+
+
+@dataclass
+class Call:
+    name: str
+    arguments: List
+
+
+@dataclass
+class Binary:
+    operator: str
+    left: object
+    right: object
+
+
+@dataclass
+class Negate:
+    operand: object
+
+
+class _Parser:
+    """
+    Recursive descent parser of the XPath 1.0 grammar.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.index = 0
+
+    def peek(self, offset: int = 0) -> Tuple[Optional[str], Optional[str]]:
+        if self.index + offset < len(self.tokens):
+            return self.tokens[self.index + offset]
+
+        return None, None
+
+    def next(self) -> Tuple[str, str]:
+        token = self.peek()
+
+        if token[0] is None:
+            raise XPathError(f"unexpected end of expression: '{self.expression}'")
+
+        self.index += 1
+        return token
+
+    def accept(self, value: str) -> bool:
+        if self.peek()[1] == value and self.peek()[0] in ("op", "operator"):
+            self.index += 1
+            return True
+
+        return False
+
+    def expect(self, value: str) -> None:
+        if not self.accept(value):
+            raise XPathError(f"expected '{value}' in '{self.expression}'")
+
+    def parse(self):
+        expression = self.parse_or()
+
+        if self.peek()[0] is not None:
+            raise XPathError(f"unexpected '{self.peek()[1]}' in '{self.expression}'")
+
+        return expression
+
+    def _binary(self, parse_operand: Callable, operators: Tuple[str, ...]):
+        left = parse_operand()
+
+        while self.peek()[1] in operators and self.peek()[0] in ("op", "operator"):
+            operator = self.next()[1]
+            left = Binary(operator, left, parse_operand())
+
+        return left
+
+    def parse_or(self):
+        return self._binary(self.parse_and, ("or",))
+
+    def parse_and(self):
+        return self._binary(self.parse_equality, ("and",))
+
+    def parse_equality(self):
+        return self._binary(self.parse_relational, ("=", "!="))
+
+    def parse_relational(self):
+        return self._binary(self.parse_additive, ("<", "<=", ">", ">="))
+
+    def parse_additive(self):
+        return self._binary(self.parse_multiplicative, ("+", "-"))
+
+    def parse_multiplicative(self):
+        return self._binary(self.parse_unary, ("*", "div", "mod"))
+
+    def parse_unary(self):
+        if self.accept("-"):
+            return Negate(self.parse_unary())
+
+        return self._binary(self.parse_path, ("|",))
+
+    def _is_primary(self) -> bool:
+        kind, value = self.peek()
+
+        if kind in ("literal", "number", "variable") or (kind == "op" and value == "("):
+            return True
+
+        # a function call, unless it is a node type test such as 'text()'
+        return kind == "name" and self.peek(1)[1] == "(" and value not in _NODE_TYPES
+
+    def parse_path(self):
+        if self._is_primary():
+            primary = self.parse_primary()
+            predicates = self.parse_predicates()
+            expression = Filter(primary, predicates) if predicates else primary
+
+            if self.peek()[1] in ("/", "//") and self.peek()[0] == "op":
+                return Path(False, self.parse_relative_steps(leading=True), expression)
+
+            return expression
+
+        if self.accept("/"):
+            if self._starts_step():
+                return Path(True, self.parse_relative_steps())
+
+            return Path(True, [])
+
+        if self.peek() == ("op", "//"):
+            return Path(True, self.parse_relative_steps(leading=True))
+
+        return Path(False, self.parse_relative_steps())
+
+    def _starts_step(self) -> bool:
+        kind, value = self.peek()
+        return kind == "name" or (kind == "op" and value in ("@", ".", "..", "*"))
+
+    def parse_relative_steps(self, leading: bool = False) -> List[Step]:
+        steps = list()
+
+        if not leading:
+            steps.append(self.parse_step())
+
+        while self.peek()[0] == "op" and self.peek()[1] in ("/", "//"):
+            if self.next()[1] == "//":
+                steps.append(Step("descendant-or-self", "node()"))
+
+            steps.append(self.parse_step())
+
+        return steps
+
+    def parse_step(self) -> Step:
+        if self.accept("."):
+            return Step("self", "node()")
+
+        if self.accept(".."):
+            return Step("parent", "node()")
+
+        axis = "child"
+
+        if self.accept("@"):
+            axis = "attribute"
+
+        elif self.peek()[0] == "name" and self.peek(1) == ("op", "::"):
+            axis = self.next()[1]
+            self.next()
+
+            if axis not in _AXES:
+                raise XPathError(f"unknown axis '{axis}' in '{self.expression}'")
+
+        kind, value = self.next()
+
+        if kind == "op" and value == "*" or kind == "operator" and value == "*":
+            test = "*"
+
+        elif kind == "name" and value in _NODE_TYPES and self.peek()[1] == "(":
+            self.expect("(")
+
+            if self.peek()[0] == "literal":
+                self.next()
+
+            self.expect(")")
+            test = f"{value}()"
+
+        elif kind == "name" or kind == "operator" and value in ("and", "or", "div", "mod"):
+            test = value
+
+        else:
+            raise XPathError(f"expected a node test, got '{value}' in '{self.expression}'")
+
+        return Step(axis, test, self.parse_predicates())
+
+    def parse_predicates(self) -> List:
+        predicates = list()
+
+        while self.accept("["):
+            predicates.append(self.parse_or())
+            self.expect("]")
+
+        return predicates
+
+    def parse_primary(self):
+        kind, value = self.next()
+
+        if kind == "literal":
+            return Literal(value[1:-1])
+
+        if kind == "number":
+            return Literal(float(value))
+
+        if kind == "variable":
+            raise XPathError(f"variables are not supported: '{value}'")
+
+        if value == "(":
+            expression = self.parse_or()
+            self.expect(")")
+            return expression
+
+        self.expect("(")
+        arguments = list()
+
+        if not self.accept(")"):
+            arguments.append(self.parse_or())
+
+            while self.accept(","):
+                arguments.append(self.parse_or())
+
+            self.expect(")")
+
+        if value not in _FUNCTIONS:
+            raise XPathError(f"unknown function '{value}()' in '{self.expression}'")
+
+        return Call(value, arguments)
+
+
+@lru_cache(maxsize=4096)
+def compile(expression: str):
+    """
+    Parses an XPath expression, once per distinct expression.
+
+    Raises:
+        XPathError: If the expression is malformed.
+    """
+    return _Parser(expression).parse()
+
+
+# --- Evaluation ---
+
+class Context:
+    """
+    Evaluation context of a document: knows the parent of every element, computed on
+    first need since only the reverse axes use it.
+    """
+
+    def __init__(self, root: ET.Element):
+        self.document = Document(root)
+        self._parents: Optional[Dict[int, ET.Element]] = None
+
+    def parent(self, node: Node) -> Optional[Node]:
+        if isinstance(node, (Attribute, Text)):
+            return node.element
+
+        if isinstance(node, Document):
+            return None
+
+        if node is self.document.root:
+            return self.document
+
+        if self._parents is None:
+            self._parents = {id(child): parent for parent in self.document.root.iter() for child in parent}
+
+        return self._parents.get(id(node))
+
+
+def _children(node: Node) -> List[Node]:
+    if isinstance(node, Document):
+        return [node.root]
+
+    if isinstance(node, ET.Element):
+        children: List[Node] = [Text(node)] if node.text and node.text.strip() else []
+        children.extend(child for child in node if isinstance(child.tag, str))
+        return children
+
+    return []
+
+
+def _descendants(node: Node) -> List[Node]:
+    result = list()
+
+    for child in _children(node):
+        result.append(child)
+        result.extend(_descendants(child))
+
+    return result
+
+
+def _siblings(context: Context, node: Node) -> Tuple[List[Node], int]:
+    parent = context.parent(node)
+
+    if parent is None or isinstance(node, (Attribute, Text)):
+        return [], -1
+
+    siblings = _children(parent)
+    return siblings, next(i for i, sibling in enumerate(siblings) if sibling is node)
+
+
+def _axis(context: Context, node: Node, axis: str) -> List[Node]:
+    match axis:
+        case "child":
+            return _children(node)
+
+        case "attribute":
+            return [Attribute(node, name) for name in node.attrib] if isinstance(node, ET.Element) else []
+
+        case "self":
+            return [node]
+
+        case "descendant":
+            return _descendants(node)
+
+        case "descendant-or-self":
+            return [node] + _descendants(node)
+
+        case "parent":
+            parent = context.parent(node)
+            return [] if parent is None else [parent]
+
+        case "ancestor" | "ancestor-or-self":
+            result = [node] if axis == "ancestor-or-self" else []
+            parent = context.parent(node)
+
+            while parent is not None:
+                result.append(parent)
+                parent = context.parent(parent)
+
+            return result
+
+        case "following-sibling":
+            siblings, index = _siblings(context, node)
+            return siblings[index + 1:] if index >= 0 else []
+
+        case "preceding-sibling":
+            siblings, index = _siblings(context, node)
+            return list(reversed(siblings[:index])) if index >= 0 else []
+
+        case "following" | "preceding":
+            order = _descendants(context.document)
+            ancestors = {id(n) for n in _axis(context, node, "ancestor-or-self")}
+            index = next((i for i, n in enumerate(order) if n is node), None)
+
+            if index is None:
+                return []
+
+            if axis == "following":
+                after = order[index + 1:]
+                return [n for n in after if not any(d is n for d in _descendants(node))]
+
+            return [n for n in reversed(order[:index]) if id(n) not in ancestors]
+
+    raise XPathError(f"unknown axis '{axis}'")
+
+
+def _test(node: Node, axis: str, test: str) -> bool:
+    if test == "node()":
+        return True
+
+    if test == "text()":
+        return isinstance(node, Text)
+
+    if test in ("comment()", "processing-instruction()"):
+        return False
+
+    if axis == "attribute":
+        return isinstance(node, Attribute) and (test == "*" or node.name == test)
+
+    return isinstance(node, ET.Element) and (test == "*" or node.tag == test)
+
+
+def string_value(node: Node) -> str:
+    """
+    Returns the XPath string-value of a node.
+    """
+    if isinstance(node, Attribute):
+        return node.value
+
+    if isinstance(node, Text):
+        return node.element.text or ""
+
+    if isinstance(node, Document):
+        node = node.root
+
+    return "".join(node.itertext())
+
+
+def _unique(nodes: List[Node]) -> List[Node]:
+    seen, result = set(), list()
+
+    for node in nodes:
+        key = node if isinstance(node, (Attribute, Text)) else id(node)
+
+        if key not in seen:
+            seen.add(key)
+            result.append(node)
+
+    return result
+
+
+def _to_string(value: Value) -> str:
+    if isinstance(value, list):
+        return string_value(value[0]) if value else ""
+
+    if isinstance(value, bool):
+        return "true" if value else "false"
+
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+
+        if value.is_integer():
+            return str(int(value))
+
+    return str(value)
+
+
+def _to_number(value: Value) -> float:
+    if isinstance(value, bool):
+        return 1.0 if value else 0.0
+
+    if isinstance(value, float):
+        return value
+
+    try:
+        return float(_to_string(value).strip())
+    except ValueError:
+        return math.nan
+
+
+def _to_boolean(value: Value) -> bool:
+    if isinstance(value, list):
+        return bool(value)
+
+    if isinstance(value, float):
+        return value != 0 and not math.isnan(value)
+
+    return bool(value)
+
+
+def _compare(operator: str, left: Value, right: Value) -> bool:
+    if isinstance(left, list) and isinstance(right, list):
+        rights = [string_value(node) for node in right]
+        return any(_compare(operator, string_value(node), value) for node in left for value in rights)
+
+    if isinstance(left, list):
+        if isinstance(right, bool):
+            return _compare(operator, _to_boolean(left), right)
+
+        return any(_compare(operator, string_value(node), right) for node in left)
+
+    if isinstance(right, list):
+        mirrored = {"<": ">", "<=": ">=", ">": "<", ">=": "<="}.get(operator, operator)
+        return _compare(mirrored, right, left)
+
+    if operator in ("=", "!="):
+        if isinstance(left, bool) or isinstance(right, bool):
+            equal = _to_boolean(left) == _to_boolean(right)
+        elif isinstance(left, float) or isinstance(right, float):
+            equal = _to_number(left) == _to_number(right)
+        else:
+            equal = left == right
+
+        return equal if operator == "=" else not equal
+
+    left, right = _to_number(left), _to_number(right)
+
+    match operator:
+        case "<":
+            return left < right
+        case "<=":
+            return left <= right
+        case ">":
+            return left > right
+        case ">=":
+            return left >= right
+
+
+@dataclass
+class _Focus:
+    node: Node
+    position: int
+    size: int
+
+
+def _node_name(arguments: List[Value], focus: _Focus) -> str:
+    nodes = arguments[0] if arguments else [focus.node]
+
+    if not nodes:
+        return ""
+
+    node = nodes[0]
+
+    if isinstance(node, Attribute):
+        return node.name
+
+    return node.tag if isinstance(node, ET.Element) else ""
+
+
+def _substring(value: str, start: float, length: float = math.inf) -> str:
+    first = round(start)
+
+    if math.isnan(first) or math.isnan(length):
+        return ""
+
+    last = first + round(length) if length != math.inf else math.inf
+    return "".join(char for i, char in enumerate(value, 1) if first <= i < last)
+
+
+def _translate(value: str, source: str, target: str) -> str:
+    table = {ord(char): (target[i] if i < len(target) else None) for i, char in reversed(list(enumerate(source)))}
+    return value.translate(table)
+
+
+_FUNCTIONS: Dict[str, Callable] = {
+    "last": lambda args, focus: float(focus.size),
+    "position": lambda args, focus: float(focus.position),
+    "count": lambda args, focus: float(len(args[0])),
+    "name": _node_name,
+    "local-name": _node_name,
+    "string": lambda args, focus: _to_string(args[0]) if args else string_value(focus.node),
+    "concat": lambda args, focus: "".join(_to_string(arg) for arg in args),
+    "contains": lambda args, focus: _to_string(args[1]) in _to_string(args[0]),
+    "starts-with": lambda args, focus: _to_string(args[0]).startswith(_to_string(args[1])),
+    "ends-with": lambda args, focus: _to_string(args[0]).endswith(_to_string(args[1])),
+    "substring-before": lambda args, focus: _to_string(args[0]).partition(_to_string(args[1]))[0] if _to_string(args[1]) in _to_string(args[0]) else "",
+    "substring-after": lambda args, focus: _to_string(args[0]).partition(_to_string(args[1]))[2] if _to_string(args[1]) in _to_string(args[0]) else "",
+    "substring": lambda args, focus: _substring(_to_string(args[0]), *[_to_number(arg) for arg in args[1:]]),
+    "string-length": lambda args, focus: float(len(_to_string(args[0]) if args else string_value(focus.node))),
+    "normalize-space": lambda args, focus: " ".join((_to_string(args[0]) if args else string_value(focus.node)).split()),
+    "translate": lambda args, focus: _translate(*[_to_string(arg) for arg in args]),
+    "lower-case": lambda args, focus: _to_string(args[0]).lower(),
+    "upper-case": lambda args, focus: _to_string(args[0]).upper(),
+    "not": lambda args, focus: not _to_boolean(args[0]),
+    "true": lambda args, focus: True,
+    "false": lambda args, focus: False,
+    "boolean": lambda args, focus: _to_boolean(args[0]),
+    "number": lambda args, focus: _to_number(args[0] if args else [focus.node]),
+    "sum": lambda args, focus: sum(_to_number(string_value(node)) for node in args[0]),
+    "floor": lambda args, focus: float(math.floor(_to_number(args[0]))),
+    "ceiling": lambda args, focus: float(math.ceil(_to_number(args[0]))),
+    "round": lambda args, focus: float(math.floor(_to_number(args[0]) + 0.5)),
+}
+
+
+def attribute_equals(predicate) -> Optional[Tuple[str, str]]:
+    """
+    Recognizes the predicates of the form `@name='value'`, the most common ones, which
+    are then checked without going through the evaluator.
+    """
+    if not isinstance(predicate, Binary) or predicate.operator != "=":
+        return None
+
+    left, right = predicate.left, predicate.right
+
+    if isinstance(left, Literal):
+        left, right = right, left
+
+    if (
+        isinstance(left, Path) and not left.absolute and left.filter is None and len(left.steps) == 1
+        and left.steps[0].axis == "attribute" and left.steps[0].test != "*" and not left.steps[0].predicates
+        and isinstance(right, Literal) and isinstance(right.value, str)
+    ):
+        return left.steps[0].test, right.value
+
+    return None
+
+
+def _filter(context: Context, nodes: List[Node], predicates: List) -> List[Node]:
+    for predicate in predicates:
+        equals = attribute_equals(predicate)
+
+        if equals is not None:
+            name, value = equals
+            nodes = [node for node in nodes if isinstance(node, ET.Element) and node.get(name) == value]
+            continue
+
+        kept = list()
+
+        for position, node in enumerate(nodes, 1):
+            value = _evaluate(context, predicate, _Focus(node, position, len(nodes)))
+
+            if isinstance(value, float) and not isinstance(value, bool):
+                if value == position:
+                    kept.append(node)
+
+            elif _to_boolean(value):
+                kept.append(node)
+
+        nodes = kept
+
+    return nodes
+
+
+def _candidates(context: Context, node: Node, step: Step) -> List[Node]:
+    if step.axis == "child" and step.test not in _NODE_TESTS and isinstance(node, ET.Element):
+        return [child for child in node if child.tag == step.test or step.test == "*" and isinstance(child.tag, str)]
+
+    if step.axis == "attribute" and step.test not in _NODE_TESTS and step.test != "*":
+        return [Attribute(node, step.test)] if isinstance(node, ET.Element) and step.test in node.attrib else []
+
+    return [n for n in _axis(context, node, step.axis) if _test(n, step.axis, step.test)]
+
+
+def _evaluate_steps(context: Context, nodes: List[Node], steps: List[Step]) -> List[Node]:
+    index = 0
+
+    while index < len(steps):
+        step = steps[index]
+        result = list()
+
+        # '//name' walks the tree once with `iter`, rather than listing every descendant
+        if (
+            step.axis == "descendant-or-self" and step.test == "node()" and not step.predicates
+            and index + 1 < len(steps) and steps[index + 1].axis == "child"
+            and steps[index + 1].test not in _NODE_TESTS and not _is_positional(steps[index + 1].predicates)
+        ):
+            step = steps[index + 1]
+            index += 2
+
+            for node in nodes:
+                if isinstance(node, (Attribute, Text)):
+                    continue
+
+                element = node.root if isinstance(node, Document) else node
+                candidates = [
+                    n for n in element.iter(None if step.test == "*" else step.test)
+                    if isinstance(n.tag, str) and (n is not element or isinstance(node, Document))
+                ]
+                result.extend(_filter(context, candidates, step.predicates))
+
+            nodes = _unique(result)
+            continue
+
+        index += 1
+
+        for node in nodes:
+            result.extend(_filter(context, _candidates(context, node, step), step.predicates))
+
+        nodes = _unique(result) if len(nodes) > 1 or step.axis.startswith(("descendant", "ancestor")) else result
+
+    return nodes
+
+
+_NUMERIC_FUNCTIONS = {"last", "position", "count", "number", "sum", "floor", "ceiling", "round", "string-length"}
+
+
+def _uses_position(expression) -> bool:
+    if isinstance(expression, Call):
+        return expression.name in ("last", "position") or any(map(_uses_position, expression.arguments))
+
+    if isinstance(expression, Binary):
+        return _uses_position(expression.left) or _uses_position(expression.right)
+
+    if isinstance(expression, Negate):
+        return True
+
+    return False
+
+
+def _is_positional(predicates: List) -> bool:
+    """
+    Tells if predicates may depend on the position of the nodes, which `//name` can't shortcut.
+    """
+    for predicate in predicates:
+
+        if isinstance(predicate, Literal) and isinstance(predicate.value, float):
+            return True
+
+        if isinstance(predicate, Call) and predicate.name in _NUMERIC_FUNCTIONS:
+            return True
+
+        if isinstance(predicate, Binary) and predicate.operator in ("+", "-", "*", "div", "mod"):
+            return True
+
+        if _uses_position(predicate):
+            return True
+
+    return False
+
+
+def _evaluate(context: Context, expression, focus: _Focus) -> Value:
+    if isinstance(expression, Literal):
+        return expression.value
+
+    if isinstance(expression, Path):
+        if expression.filter is not None:
+            start = _evaluate(context, expression.filter, focus)
+
+            if not isinstance(start, list):
+                raise XPathError("a path can only follow a node-set")
+
+        elif expression.absolute:
+            start = [context.document]
+
+        else:
+            start = [focus.node]
+
+        return _evaluate_steps(context, start, expression.steps)
+
+    if isinstance(expression, Filter):
+        nodes = _evaluate(context, expression.primary, focus)
+
+        if not isinstance(nodes, list):
+            raise XPathError("predicates can only filter a node-set")
+
+        return _filter(context, nodes, expression.predicates)
+
+    if isinstance(expression, Call):
+        arguments = [_evaluate(context, argument, focus) for argument in expression.arguments]
+        return _FUNCTIONS[expression.name](arguments, focus)
+
+    if isinstance(expression, Negate):
+        return -_to_number(_evaluate(context, expression.operand, focus))
+
+    if isinstance(expression, Binary):
+        operator = expression.operator
+
+        if operator == "or":
+            return _to_boolean(_evaluate(context, expression.left, focus)) or _to_boolean(_evaluate(context, expression.right, focus))
+
+        if operator == "and":
+            return _to_boolean(_evaluate(context, expression.left, focus)) and _to_boolean(_evaluate(context, expression.right, focus))
+
+        left = _evaluate(context, expression.left, focus)
+        right = _evaluate(context, expression.right, focus)
+
+        if operator == "|":
+            if not isinstance(left, list) or not isinstance(right, list):
+                raise XPathError("'|' only joins node-sets")
+
+            return _unique(left + right)
+
+        if operator in ("=", "!=", "<", "<=", ">", ">="):
+            return _compare(operator, left, right)
+
+        left, right = _to_number(left), _to_number(right)
+
+        match operator:
+            case "+":
+                return left + right
+            case "-":
+                return left - right
+            case "*":
+                return left * right
+            case "div":
+                return left / right if right else math.copysign(math.inf, left) if left else math.nan
+            case "mod":
+                return math.fmod(left, right) if right else math.nan
+
+    raise XPathError(f"can't evaluate {expression!r}")
+
+
+def evaluate(expression, root: ET.Element, node: Node = None, context: Context = None) -> Value:
+    """
+    Evaluates an XPath expression against a document.
+
+    Args:
+        expression: The expression, as a string or as compiled by `compile`.
+        root: Root element of the document.
+        node: Context node of relative paths, the document node by default.
+        context: Context to reuse between evaluations on an unchanged document.
+
+    Returns:
+        A list of nodes in document order, or a string, number or boolean.
+
+    Raises:
+        XPathError: If the expression is malformed.
+    """
+    if context is None:
+        context = Context(root)
+
+    if isinstance(expression, str):
+        expression = compile(expression)
+
+    return _evaluate(context, expression, _Focus(node or context.document, 1, 1))
+
+
+def select(expression, root: ET.Element, node: Node = None, context: Context = None) -> List[Node]:
+    """
+    Evaluates an XPath expression which must return a node-set.
+
+    Raises:
+        XPathError: If the expression is malformed or doesn't return nodes.
+    """
+    result = evaluate(expression, root, node, context)
+
+    if not isinstance(result, list):
+        raise XPathError(f"'{expression}' does not select nodes")
+
+    return result